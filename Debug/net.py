@@ -7,22 +7,44 @@ optional DNS lookups. No packet sniffing, no drivers.
 
 Outputs JSON lines with details: timestamp, event (open/close/status_change),
 proto, family, local/remote endpoints, pid, process name, and optional rDNS.
+--format=bin writes the compact binary format from netbin.py instead.
+The connection table comes from psutil; on Linux --backend=proc (the "auto"
+default there) parses /proc/net directly, see netconn.py.
+Reverse DNS runs in background threads: names already cached are attached to
+the event, others follow later as separate "rdns" events keyed by IP.
+--adaptive polls faster while connections churn or right after a marker and
+backs off while the table is stable; each event then carries "interval".
+--flight-recorder=SECONDS keeps events in memory and only writes the window
+around an F2 marker, a signal or the stop.
+--collector=HOST:PORT additionally streams every event to netstream.py, which
+merges several hosts into one time-ordered log per session.
+--process/--pid/--port-range/--remote-cidr (and --tcp-only/--udp-only) drop
+other sockets straight off the connection table, before any per-socket work.
 
 Recommended to run with Administrator privileges to see system-wide connections.
 """
 
 import argparse
+import cProfile
+import gzip
 import ipaddress
 import json
 import os
 import platform
+import pstats
+import queue
+import shutil
+import signal
 import socket
+import sqlite3
 import sys
 import threading
 import time
+from array import array
+from collections import OrderedDict, deque
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 try:
     import msvcrt  # Windows console keyboard
     HAS_MSVCRT = True
@@ -43,6 +65,26 @@ try:
 except Exception:
     HAS_DNSPYTHON = False
 
+# Optional faster JSON encoder and zstd compression for rotated segments
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+try:
+    import zstandard  # type: ignore
+    HAS_ZSTD = True
+except Exception:
+    HAS_ZSTD = False
+
+from netbin import BinEncoder
+from netconn import BACKENDS, make_backend
+from netstream import CollectorClient, parse_address
+
+# Signal that makes --flight-recorder dump: Ctrl+Break in a Windows console
+FLIGHT_SIGNAL = getattr(signal, "SIGBREAK", None) or getattr(signal, "SIGUSR1", None)
+
 
 def now_iso() -> str:
     return datetime.utcnow().isoformat(timespec="seconds") + "Z"
@@ -90,34 +132,538 @@ def safe_get(fn):
         return None
 
 
+_UNSET = object()
+
+
+class ProcessCache:
+    """Process name/exe per PID, with PID reuse detected through create_time.
+
+    Entries are [create_time, name, exe, psutil.Process, checked], ordered
+    oldest-use first and capped at `size`. An entry only answers a lookup
+    once its create_time has been confirmed in the current tick: a hit on an
+    entry last confirmed in an earlier tick costs one psutil.Process(pid)
+    (which reads the create time) and is replaced if the PID was reused or
+    dropped if it is gone. The poll loop calls maybe_refresh() once per tick,
+    which starts a new tick and, every `refresh_interval` seconds (0 =
+    never), lists every process in one psutil.process_iter() pass (pid, name,
+    create_time): that confirms all entries at once, replaces reused ones,
+    drops gone ones and adds processes not cached yet while there is room.
+    exe() (the expensive query on Windows) is made once per process, on its
+    first lookup. lookup() returns the same dict as safe_proc_info().
+    """
+
+    def __init__(self, size: int = 2048, refresh_interval: float = 5.0):
+        self.size = max(1, size)
+        self.refresh_interval = refresh_interval
+        self._entries: "OrderedDict[int, list]" = OrderedDict()
+        self._last_refresh = float("-inf")
+        # bumped by maybe_refresh(); -1 until then, so no hit goes unchecked
+        self._tick = -1
+        self._lookup_secs = 0.0
+        self._refresh_secs = 0.0
+        self.stats = {"hits": 0, "misses": 0, "exe_queries": 0, "reused": 0, "gone": 0, "evicted": 0,
+                      "refreshes": 0, "checks": 0}
+
+    def _put(self, pid: int, entry: list) -> None:
+        self._entries[pid] = entry
+        self._entries.move_to_end(pid)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def _load(self, pid: int) -> Optional[list]:
+        try:
+            p = psutil.Process(pid)
+            entry = [p.create_time(), safe_get(p.name), _UNSET, p, self._tick]
+        except Exception:
+            return None
+        self._put(pid, entry)
+        return entry
+
+    def _check(self, pid: int, entry: list) -> Optional[list]:
+        """Confirm a cached entry still describes the process behind `pid`."""
+        self.stats["checks"] += 1
+        try:
+            p = psutil.Process(pid)
+            created = p.create_time()
+        except Exception:
+            del self._entries[pid]
+            self.stats["gone"] += 1
+            return None
+        if created != entry[0]:
+            self.stats["reused"] += 1
+            entry = [created, safe_get(p.name), _UNSET, p, self._tick]
+            self._entries[pid] = entry
+        else:
+            entry[4] = self._tick
+        self._entries.move_to_end(pid)
+        return entry
+
+    def refresh(self) -> float:
+        """One process_iter() pass; returns the seconds it took."""
+        t = time.perf_counter()
+        seen: Dict[int, object] = {}
+        try:
+            for p in psutil.process_iter(attrs=["pid", "name", "create_time"]):
+                seen[p.info["pid"]] = p
+        except Exception:
+            return 0.0
+        entries = self._entries
+        for pid in list(entries):
+            p = seen.pop(pid, None)
+            if p is None:
+                del entries[pid]
+                self.stats["gone"] += 1
+            elif p.info["create_time"] != entries[pid][0]:
+                entries[pid] = [p.info["create_time"], p.info["name"], _UNSET, p, self._tick]
+                self.stats["reused"] += 1
+            else:
+                entries[pid][4] = self._tick
+        for pid, p in seen.items():
+            if len(entries) >= self.size:
+                break
+            entries[pid] = [p.info["create_time"], p.info["name"], _UNSET, p, self._tick]
+            entries.move_to_end(pid, last=False)  # listed, not used yet: first in line for eviction
+        self.stats["refreshes"] += 1
+        self._last_refresh = time.monotonic()
+        secs = time.perf_counter() - t
+        self._refresh_secs += secs
+        return secs
+
+    def maybe_refresh(self) -> float:
+        """Start a new tick; run refresh() when it is due."""
+        self._tick += 1
+        if self.refresh_interval > 0 and time.monotonic() - self._last_refresh >= self.refresh_interval:
+            return self.refresh()
+        return 0.0
+
+    def lookup(self, pid: Optional[int]) -> Dict[str, Optional[str]]:
+        info = {"pid": pid, "name": None, "exe": None}
+        if pid is None or pid < 0:
+            return info
+        t = time.perf_counter()
+        entry = self._entries.get(pid)
+        if entry is None:
+            self.stats["misses"] += 1
+            entry = self._load(pid)
+        else:
+            self.stats["hits"] += 1
+            if entry[4] != self._tick or self._tick < 0:
+                entry = self._check(pid, entry)
+            else:
+                self._entries.move_to_end(pid)
+        if entry is not None:
+            if entry[2] is _UNSET:
+                self.stats["exe_queries"] += 1
+                entry[2] = safe_get(entry[3].exe)
+            info["name"] = entry[1]
+            info["exe"] = entry[2]
+        self._lookup_secs += time.perf_counter() - t
+        return info
+
+    def snapshot(self) -> dict:
+        looked_up = self.stats["hits"] + self.stats["misses"]
+        out = dict(self.stats, entries=len(self._entries))
+        out["hit_rate"] = round(self.stats["hits"] / looked_up, 4) if looked_up else None
+        out["lookup_us"] = round(self._lookup_secs / looked_up * 1e6, 2) if looked_up else None
+        out["refresh_ms"] = round(self._refresh_secs / self.stats["refreshes"] * 1000.0, 3) if self.stats["refreshes"] else None
+        return out
+
+
+class ProcessMatcher:
+    """The set of PIDs whose process name contains one of `needles`.
+
+    Kept up to date incrementally: refresh() lists processes once (pid,
+    name, create_time) and only tests names of PIDs that are new or were
+    reused since the last pass; PIDs that are gone are forgotten. A PID that
+    shows up in between is decided on first sight with a single
+    psutil.Process() and remembered, so per connection a match costs one
+    dict lookup.
+    """
+
+    def __init__(self, needles: List[str], refresh_interval: float = 5.0):
+        self.needles = tuple(n.lower() for n in needles if n)
+        self.refresh_interval = refresh_interval
+        # pid -> (create_time, matches)
+        self._known: Dict[int, Tuple[Optional[float], bool]] = {}
+        self._last_refresh = float("-inf")
+        self.stats = {"refreshes": 0, "decided": 0, "late": 0}
+
+    def _matches(self, name: Optional[str]) -> bool:
+        name = (name or "").lower()
+        return any(n in name for n in self.needles)
+
+    def refresh(self) -> float:
+        t = time.perf_counter()
+        known = self._known
+        fresh: Dict[int, Tuple[Optional[float], bool]] = {}
+        try:
+            for p in psutil.process_iter(attrs=["pid", "name", "create_time"]):
+                pid, created = p.info["pid"], p.info["create_time"]
+                old = known.get(pid)
+                if old is not None and old[0] == created:
+                    fresh[pid] = old
+                else:
+                    fresh[pid] = (created, self._matches(p.info["name"]))
+                    self.stats["decided"] += 1
+        except Exception:
+            return 0.0
+        self._known = fresh
+        self.stats["refreshes"] += 1
+        self._last_refresh = time.monotonic()
+        return time.perf_counter() - t
+
+    def maybe_refresh(self) -> float:
+        if self.refresh_interval > 0 and time.monotonic() - self._last_refresh >= self.refresh_interval:
+            return self.refresh()
+        return 0.0
+
+    def __contains__(self, pid: Optional[int]) -> bool:
+        hit = self._known.get(pid)
+        if hit is None:
+            if pid is None or pid < 0:
+                return False
+            # started since the last refresh
+            try:
+                proc = psutil.Process(pid)
+                hit = (proc.create_time(), self._matches(proc.name()))
+            except Exception:
+                hit = (None, False)
+            self._known[pid] = hit
+            self.stats["decided"] += 1
+            self.stats["late"] += 1
+        return hit[1]
+
+    def pids(self) -> List[int]:
+        return sorted(pid for pid, (_, hit) in self._known.items() if hit)
+
+
+def parse_port_ranges(specs: List[str]) -> List[Tuple[int, int]]:
+    """"443", "25200-25300" and comma-separated lists of those -> [(lo, hi)]."""
+    out = []
+    for spec in specs:
+        for part in spec.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            lo, _, hi = part.partition("-")
+            a, b = int(lo), int(hi or lo)
+            if not (0 <= a <= b <= 0xFFFF):
+                raise ValueError(f"bad port range {part!r}")
+            out.append((a, b))
+    return out
+
+
+class ConnFilter:
+    """Connection filters compiled once into a predicate over raw table rows.
+
+    The predicate runs on what backend.connections() returns, before address
+    unpacking, key construction, process lookups or rDNS, so filtered-out
+    sockets never reach the ConnTable (and never produce close events).
+    Checks run cheapest first and only the ones asked for are compiled in:
+
+      proto    socket type (--tcp-only/--udp-only)
+      pid      --pid values or a ProcessMatcher for --process (either matches)
+      port     local or remote port inside a --port-range, via a 64K bitmap
+      remote   remote IP inside a --remote-cidr; sockets without a remote
+               address fail it. Answers are cached per IP string and
+               IPv4-mapped IPv6 addresses are checked as IPv4.
+
+    predicate is None when nothing is filtered.
+    """
+
+    def __init__(self, types: Optional[set] = None, pids: Optional[set] = None,
+                 matcher: Optional[ProcessMatcher] = None, ports: Optional[List[Tuple[int, int]]] = None,
+                 cidrs: Optional[list] = None, ip_cache: int = 65536):
+        self.matcher = matcher
+        self.stats = {"seen": 0, "kept": 0}
+        checks: List[Callable[[object], bool]] = []
+
+        if types:
+            types = frozenset(types)
+            checks.append(lambda c: c.type in types)
+
+        if pids or matcher is not None:
+            fixed = frozenset(pids or ())
+            if matcher is None:
+                checks.append(lambda c: c.pid in fixed)
+            else:
+                checks.append(lambda c: c.pid in fixed or c.pid in matcher)
+
+        if ports:
+            bitmap = bytearray(0x10000)
+            for lo, hi in ports:
+                bitmap[lo:hi + 1] = b"\x01" * (hi - lo + 1)
+
+            def port_ok(c) -> bool:
+                if c.laddr and bitmap[c.laddr[1]]:
+                    return True
+                return bool(c.raddr) and bitmap[c.raddr[1]] == 1
+
+            checks.append(port_ok)
+
+        if cidrs:
+            nets = [(n.version, n) for n in cidrs]
+            decided: Dict[str, bool] = {}
+
+            def inside(ip: str) -> bool:
+                try:
+                    addr = ipaddress.ip_address(ip)
+                except ValueError:
+                    return False
+                if addr.version == 6 and addr.ipv4_mapped is not None:
+                    addr = addr.ipv4_mapped
+                return any(v == addr.version and addr in n for v, n in nets)
+
+            def remote_ok(c) -> bool:
+                if not c.raddr:
+                    return False
+                ip = c.raddr[0]
+                hit = decided.get(ip)
+                if hit is None:
+                    if len(decided) >= ip_cache:
+                        decided.clear()
+                    hit = decided[ip] = inside(ip)
+                return hit
+
+            checks.append(remote_ok)
+
+        self.checks = len(checks)
+        if not checks:
+            self.predicate: Optional[Callable[[object], bool]] = None
+        elif len(checks) == 1:
+            self.predicate = checks[0]
+        else:
+            first, rest = checks[0], tuple(checks[1:])
+
+            def predicate(c) -> bool:
+                if not first(c):
+                    return False
+                for check in rest:
+                    if not check(c):
+                        return False
+                return True
+
+            self.predicate = predicate
+
+    def apply(self, conns: list) -> list:
+        """The rows that pass; `conns` itself when nothing is filtered."""
+        if self.predicate is None:
+            return conns
+        kept = list(filter(self.predicate, conns))
+        self.stats["seen"] += len(conns)
+        self.stats["kept"] += len(kept)
+        return kept
+
+    def snapshot(self) -> dict:
+        out = dict(self.stats)
+        if self.matcher is not None:
+            out["process_pids"] = len(self.matcher.pids())
+            out.update(self.matcher.stats)
+        return out
+
+
+class DnsCacheFile:
+    """rDNS answers persisted in a SQLite file shared between runs.
+
+    Rows are (ip, name, expires) with expires in wall-clock epoch seconds, so
+    a name resolved by one run stays valid for the next until its TTL runs
+    out. load() returns only live entries, soonest-expiring first, so when
+    they seed the in-memory LRU those are the first to be evicted. get() looks up a single IP, which also picks up
+    answers written by another run since startup. put_many() upserts in one
+    transaction and never shortens an entry another run stored with a later
+    expiry.
+
+    The file is opened in WAL mode with a busy timeout, so several net.py
+    instances can share it. Transactions are explicit (BEGIN IMMEDIATE takes
+    the write lock up front). close() compacts in one transaction: expired
+    rows are deleted, the table is trimmed to max_entries (earliest expiry
+    first), and the WAL is checkpointed. Compaction is skipped when another
+    run holds the lock.
+
+    The connection is used from the poll thread only.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.db = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS rdns (ip TEXT PRIMARY KEY, name TEXT, expires REAL NOT NULL) WITHOUT ROWID")
+
+    def load(self, limit: int) -> List[Tuple[str, Optional[str], float]]:
+        return self.db.execute("SELECT ip, name, expires FROM rdns WHERE expires > ? ORDER BY expires DESC LIMIT ?",
+                               (time.time(), limit)).fetchall()[::-1]
+
+    def get(self, ip: str) -> Optional[Tuple[Optional[str], float]]:
+        row = self.db.execute("SELECT name, expires FROM rdns WHERE ip = ? AND expires > ?", (ip, time.time())).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _write(self, statements: List[Tuple[str, object]]) -> None:
+        # isolation_level=None: sqlite3 opens no transactions of its own
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                if isinstance(params, list):
+                    self.db.executemany(sql, params)
+                else:
+                    self.db.execute(sql, params)
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def put_many(self, rows: List[Tuple[str, Optional[str], float]]) -> None:
+        self._write([("INSERT INTO rdns (ip, name, expires) VALUES (?, ?, ?) ON CONFLICT(ip) DO UPDATE SET "
+                      "name = excluded.name, expires = excluded.expires WHERE excluded.expires > rdns.expires", rows)])
+
+    def close(self) -> None:
+        try:
+            self._write([
+                ("DELETE FROM rdns WHERE expires <= ?", (time.time(),)),
+                ("DELETE FROM rdns WHERE ip IN (SELECT ip FROM rdns ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                 (self.max_entries,)),
+            ])
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.OperationalError:
+            pass  # busy: another run compacts on its way out
+        self.db.close()
+
+
 class ReverseDNS:
-    def __init__(self, enable: bool = True, timeout: float = 0.8):
+    """PTR lookups with a bounded LRU cache and an optional worker pool.
+
+    lookup() resolves synchronously (blocking on a cache miss). The poll loop
+    uses lookup_nowait() instead: it answers from the cache or queues the IP
+    for the worker threads and returns None; finished answers are collected
+    with drain() and logged as separate "rdns" events. Queries already in
+    flight are not queued twice, and when the request queue is full new IPs
+    are dropped (and retried the next time they are seen).
+
+    resolve_fn replaces the actual resolver (e.g. a local stub in tests);
+    nameserver points dnspython at a specific "host[:port]".
+
+    With a DnsCacheFile as store, the LRU starts warm from the file, misses
+    are checked against the file before a query is made, and new answers are
+    written back every flush_interval seconds (from drain()) and on close().
+    """
+
+    def __init__(self, enable: bool = True, timeout: float = 0.8, workers: int = 0,
+                 queue_size: int = 256, cache_size: int = 4096, ttl: float = 3600.0,
+                 negative_ttl: float = 300.0, nameserver: Optional[str] = None,
+                 resolve_fn: Optional[Callable[[str], Optional[str]]] = None,
+                 store: Optional[DnsCacheFile] = None, flush_interval: float = 5.0):
         self.enable = enable
         self.timeout = timeout
-        self._cache: Dict[str, Optional[str]] = {}
+        self.cache_size = max(1, cache_size)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._resolve_fn = resolve_fn
+        # ip -> (name, expires_at monotonic); ordered oldest-use first
+        self._cache: "OrderedDict[str, Tuple[Optional[str], float]]" = OrderedDict()
         self._lock = threading.Lock()
-        if HAS_DNSPYTHON:
+        self._inflight: set = set()
+        self._done: List[Tuple[str, Optional[str]]] = []
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max(1, queue_size))
+        self._threads: List[threading.Thread] = []
+        self.stats = {"hits": 0, "misses": 0, "queries": 0, "dropped": 0, "evicted": 0}
+        self.store = store
+        self.flush_interval = flush_interval
+        # (ip, name, expires epoch) answered here and not yet in the store
+        self._dirty: List[Tuple[str, Optional[str], float]] = []
+        self._next_flush = time.monotonic() + flush_interval
+        if store is not None:
+            self.stats.update(disk_loaded=0, disk_hits=0, disk_written=0)
+            wall, mono = time.time(), time.monotonic()
+            for ip, name, expires in store.load(self.cache_size):
+                self._cache[ip] = (name, mono + expires - wall)
+            self.stats["disk_loaded"] = len(self._cache)
+        if HAS_DNSPYTHON and resolve_fn is None:
             self.resolver = dns.resolver.Resolver(configure=True)
             self.resolver.timeout = timeout
             self.resolver.lifetime = timeout
+            if nameserver:
+                host, _, port = nameserver.rpartition(":") if nameserver.count(":") == 1 else (nameserver, "", "")
+                self.resolver.nameservers = [host]
+                if port:
+                    self.resolver.port = int(port)
         else:
             self.resolver = None
+        if enable:
+            for i in range(max(0, workers)):
+                t = threading.Thread(target=self._worker, name=f"rdns_{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
 
-    def lookup(self, ip: str) -> Optional[str]:
-        if not self.enable:
-            return None
-
+    @staticmethod
+    def _wanted(ip: str) -> bool:
         try:
             ip_obj = ipaddress.ip_address(ip)
-            if ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_link_local:
-                return None
+            return not (ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_link_local)
         except Exception:
-            return None
+            return False
 
+    def _cached(self, ip: str) -> Tuple[bool, Optional[str]]:
+        # Caller holds self._lock
+        hit = self._cache.get(ip)
+        if hit is None:
+            return False, None
+        name, expires = hit
+        if expires < time.monotonic():
+            del self._cache[ip]
+            return False, None
+        self._cache.move_to_end(ip)
+        return True, name
+
+    def _store(self, ip: str, name: Optional[str], ttl: Optional[float] = None, persist: bool = True) -> None:
+        if ttl is None:
+            ttl = self.ttl if name else self.negative_ttl
+        with self._lock:
+            self._cache[ip] = (name, time.monotonic() + ttl)
+            self._cache.move_to_end(ip)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+                self.stats["evicted"] += 1
+            if persist and self.store is not None:
+                self._dirty.append((ip, name, time.time() + ttl))
+
+    def _from_disk(self, ip: str) -> Tuple[bool, Optional[str]]:
+        # Poll thread only (the store's connection is not shared)
+        if self.store is None:
+            return False, None
+        row = self.store.get(ip)
+        if row is None:
+            return False, None
+        name, expires = row
+        self._store(ip, name, ttl=expires - time.time(), persist=False)
+        self.stats["disk_hits"] += 1
+        return True, name
+
+    def flush(self) -> None:
+        """Write answers gathered since the last flush to the store."""
+        if self.store is None:
+            return
         with self._lock:
-            if ip in self._cache:
-                return self._cache[ip]
+            rows = self._dirty
+            self._dirty = []
+        self._next_flush = time.monotonic() + self.flush_interval
+        if rows:
+            try:
+                self.store.put_many(rows)
+                self.stats["disk_written"] += len(rows)
+            except sqlite3.OperationalError:
+                with self._lock:
+                    self._dirty[:0] = rows  # locked by another run; retry next time
 
+    def _resolve(self, ip: str) -> Optional[str]:
+        with self._lock:
+            self.stats["queries"] += 1
+        if self._resolve_fn is not None:
+            try:
+                return self._resolve_fn(ip)
+            except Exception:
+                return None
         name: Optional[str] = None
         try:
             if HAS_DNSPYTHON and self.resolver is not None:
@@ -126,37 +672,675 @@ class ReverseDNS:
                 if ans and len(ans) > 0:
                     name = str(ans[0]).rstrip(".")
             else:
-                # Basic fallback
-                old_timeout = socket.getdefaulttimeout()
-                try:
-                    socket.setdefaulttimeout(self.timeout)
-                    name = socket.gethostbyaddr(ip)[0]
-                finally:
-                    socket.setdefaulttimeout(old_timeout)
+                # Basic fallback (the OS resolver applies its own timeout)
+                name = socket.gethostbyaddr(ip)[0]
         except Exception:
             name = None
+        return name
+
+    def lookup(self, ip: str) -> Optional[str]:
+        if not self.enable or not self._wanted(ip):
+            return None
 
         with self._lock:
-            self._cache[ip] = name
+            hit, name = self._cached(ip)
+        if hit:
+            self.stats["hits"] += 1
+            return name
+        hit, name = self._from_disk(ip)
+        if hit:
+            return name
+
+        self.stats["misses"] += 1
+        name = self._resolve(ip)
+        self._store(ip, name)
         return name
 
+    def lookup_nowait(self, ip: str) -> Optional[str]:
+        if not self.enable or not self._wanted(ip):
+            return None
+        if not self._threads:
+            return self.lookup(ip)
+
+        with self._lock:
+            hit, name = self._cached(ip)
+            if hit:
+                self.stats["hits"] += 1
+                return name
+            if ip in self._inflight:
+                return None
+        hit, name = self._from_disk(ip)
+        if hit:
+            return name
+        with self._lock:
+            if ip in self._inflight:
+                return None
+            self.stats["misses"] += 1
+            self._inflight.add(ip)
+        try:
+            self._queue.put_nowait(ip)
+        except queue.Full:
+            with self._lock:
+                self._inflight.discard(ip)
+                self.stats["dropped"] += 1
+        return None
+
+    def drain(self) -> List[Tuple[str, Optional[str]]]:
+        """Return (ip, name) pairs answered by the workers since the last call."""
+        with self._lock:
+            done = self._done
+            self._done = []
+        if self.store is not None and time.monotonic() >= self._next_flush:
+            self.flush()
+        return done
+
+    def _worker(self) -> None:
+        while True:
+            ip = self._queue.get()
+            if ip is None:
+                return
+            name = self._resolve(ip)
+            self._store(ip, name)
+            with self._lock:
+                self._inflight.discard(ip)
+                self._done.append((ip, name))
+
+    def close(self, wait: float = 0.0) -> None:
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        if wait > 0:
+            deadline = time.monotonic() + wait
+            for t in self._threads:
+                t.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+        if self.store is not None:
+            self.flush()
+            self.store.close()
+            self.store = None
+
+
+class ConnTable:
+    """Incremental diff of successive connection snapshots.
+
+    Each distinct key gets a slot on first sight; the per-slot status lives in
+    a flat list instead of a dict per connection. A tick is fed with
+    observe() for every socket and finished with sweep(), which returns the
+    keys that disappeared. When nothing closed, sweep() is O(1); otherwise the
+    closed set comes from a C-level set difference, so the Python-level work
+    per tick is proportional to the number of changes, not the table size.
+    """
 
-def write_jsonl(fp, obj: dict):
-    fp.write(json.dumps(obj, ensure_ascii=False) + "\n")
-    fp.flush()
+    UNCHANGED = 0
+    OPENED = 1
+    CHANGED = 2
+
+    __slots__ = ("_slots", "_status", "_seq", "_free", "_current", "_next_seq", "_strings")
+
+    def __init__(self):
+        self._slots: Dict[Tuple, int] = {}
+        self._status: List[Optional[str]] = []
+        self._seq: List[int] = []
+        self._free: List[int] = []
+        self._current: set = set()
+        self._next_seq = 0
+        self._strings: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, key) -> bool:
+        return key in self._slots
+
+    def intern(self, s: Optional[str]) -> Optional[str]:
+        # IP strings repeat across thousands of keys; keep one copy of each
+        if s is None:
+            return None
+        return self._strings.setdefault(s, s)
+
+    def observe(self, key: Tuple, status: Optional[str]) -> int:
+        self._current.add(key)
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+                self._status[slot] = status
+                self._seq[slot] = self._next_seq
+            else:
+                slot = len(self._status)
+                self._status.append(status)
+                self._seq.append(self._next_seq)
+            self._next_seq += 1
+            pid, fam, typ, l_ip, l_port, r_ip, r_port = key
+            key = (pid, fam, typ, self.intern(l_ip), l_port, self.intern(r_ip), r_port)
+            self._slots[key] = slot
+            return ConnTable.OPENED
+        if self._status[slot] != status:
+            self._status[slot] = status
+            return ConnTable.CHANGED
+        return ConnTable.UNCHANGED
+
+    def sweep(self, drop: bool = True) -> List[Tuple]:
+        """Finish a tick: drop and return keys not observed since the last sweep.
+
+        Closed keys are returned in first-seen order. With drop=False the
+        table keeps every key it has ever seen and nothing is returned.
+        """
+        current = self._current
+        self._current = set()
+        if not drop or len(current) == len(self._slots):
+            return []
+        closed = list(self._slots.keys() - current)
+        seq = self._seq
+        slots = self._slots
+        closed.sort(key=lambda k: seq[slots[k]])
+        for k in closed:
+            slot = slots.pop(k)
+            self._status[slot] = None
+            self._free.append(slot)
+        if len(self._strings) > 4 * len(slots) + 1024:
+            self._strings.clear()
+        return closed
+
+
+def encode_json_line(obj: dict) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(obj) + b"\n"
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+class LogWriter:
+    """JSONL writer running on its own thread.
+
+    write() only enqueues, so the poll loop never waits on encoding or disk.
+    The writer thread group-commits: buffered lines go to disk once
+    flush_bytes have accumulated or flush_interval seconds have passed since
+    the last flush. With rotate_bytes/rotate_seconds the log is split into
+    numbered segments (name.001.jsonl, ...); closed segments are optionally
+    compressed ("gzip" or "zstd") in the background. close() drains the queue,
+    flushes and waits for pending compressions. fmt="bin" writes the compact
+    netbin format instead of JSONL; every segment is a self-contained file.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = 0.5, flush_bytes: int = 64 * 1024,
+                 rotate_bytes: int = 0, rotate_seconds: float = 0.0, compress: Optional[str] = None,
+                 fmt: str = "jsonl"):
+        if compress == "zstd" and not HAS_ZSTD:
+            raise ValueError("zstd compression requires the zstandard package")
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.fmt = fmt
+        self._bin: Optional[BinEncoder] = None
+        self.segments: List[Path] = []
+        self._q: "queue.SimpleQueue[Optional[dict]]" = queue.SimpleQueue()
+        self._compressors: List[threading.Thread] = []
+        self._seg_index = 0
+        self.bytes_written = 0
+        self._fp = None
+        self._seg_bytes = 0
+        self._seg_started = 0.0
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="log_writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _segment_path(self) -> Path:
+        if self._seg_index == 0:
+            return self.path
+        return self.path.with_name(f"{self.path.stem}.{self._seg_index:03d}{self.path.suffix}")
+
+    def _taken(self, seg: Path) -> bool:
+        return seg.exists() or any(seg.with_name(seg.name + ext).exists() for ext in (".gz", ".zst"))
+
+    def _open_segment(self) -> None:
+        # Only a JSONL log is continued across runs; a bin file holds exactly one
+        # header, and a rotated segment from an earlier run keeps its name, so
+        # those move on to the next free index instead
+        seg = self._segment_path()
+        while (self._seg_index > 0 or self.fmt == "bin") and self._taken(seg):
+            self._seg_index += 1
+            seg = self._segment_path()
+        self._fp = open(seg, "ab" if self._seg_index == 0 and self.fmt != "bin" else "xb")
+        self._seg_bytes = self._fp.tell()
+        self._seg_started = time.monotonic()
+        self.segments.append(seg)
+        if self.fmt == "bin":
+            self._bin = BinEncoder()
+            header = self._bin.header()
+            self._fp.write(header)
+            self._seg_bytes += len(header)
+
+    def _close_segment(self) -> None:
+        if self._bin is not None:
+            self._fp.write(self._bin.finish())
+        self._fp.close()
+
+    def _encode(self, obj: dict) -> bytes:
+        if self._bin is not None:
+            return self._bin.encode(obj)
+        return encode_json_line(obj)
+
+    def _rotate(self) -> None:
+        self._close_segment()
+        closed = self.segments[-1]
+        if self.compress:
+            t = threading.Thread(target=self._compress_segment, args=(closed,), name="log_compress", daemon=True)
+            t.start()
+            self._compressors.append(t)
+        self._seg_index += 1
+        self._open_segment()
+
+    def _compress_segment(self, seg: Path) -> None:
+        try:
+            if self.compress == "gzip":
+                dst = seg.with_name(seg.name + ".gz")
+                with open(seg, "rb") as src, gzip.open(dst, "wb") as out:
+                    shutil.copyfileobj(src, out, 1024 * 1024)
+            else:
+                dst = seg.with_name(seg.name + ".zst")
+                with open(seg, "rb") as src, open(dst, "wb") as out:
+                    zstandard.ZstdCompressor().copy_stream(src, out)
+            seg.unlink()
+        except Exception as e:
+            print(f"[log] compressing {seg} failed: {e}", file=sys.stderr)
+
+    def write(self, obj: dict) -> None:
+        self._q.put(obj)
+
+    def pending(self) -> int:
+        return self._q.qsize()
+
+    def _commit(self, buf: List[bytes]) -> None:
+        data = b"".join(buf)
+        self._fp.write(data)
+        self._fp.flush()
+        self._seg_bytes += len(data)
+        self.bytes_written += len(data)
+        if (self.rotate_bytes and self._seg_bytes >= self.rotate_bytes) or \
+                (self.rotate_seconds and time.monotonic() - self._seg_started >= self.rotate_seconds):
+            self._rotate()
+
+    def _run(self) -> None:
+        buf: List[bytes] = []
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush)) if buf else None
+            try:
+                obj = self._q.get(timeout=timeout)
+                stop = obj is None
+            except queue.Empty:
+                obj, stop = None, False
+            if obj is not None:
+                try:
+                    line = self._encode(obj)
+                except Exception as e:
+                    line = self._encode({"ts": now_iso(), "event": "error", "stage": "encode", "error": str(e)})
+                buf.append(line)
+                pending += len(line)
+                if pending < self.flush_bytes and time.monotonic() - last_flush < self.flush_interval:
+                    continue
+            if buf:
+                try:
+                    self._commit(buf)
+                except Exception as e:
+                    print(f"[log] write failed: {e}", file=sys.stderr)
+                buf = []
+                pending = 0
+            last_flush = time.monotonic()
+            if stop:
+                return
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._q.put(None)
+        self._thread.join()
+        self._thread = None
+        self._close_segment()
+        for t in self._compressors:
+            t.join()
+
+
+class FlightRecorder:
+    """In-memory ring of the latest events, dumped to disk around triggers.
+
+    Drop-in for LogWriter when only the moments around an incident matter.
+    write() stores the event reference and its monotonic time into
+    preallocated slots, overwriting the oldest, so recording allocates
+    nothing beyond the event itself and never touches the disk. trigger()
+    schedules a dump of `window` seconds before and after it; a trigger
+    inside a pending window extends that window. poll() (once per tick)
+    writes the dump once the after-window has passed; close() writes a
+    pending one right away, or the last window if nothing triggered.
+
+    Each dump is a new file next to `path` (name.flight-<utc>-<reason>.ext),
+    written under a temporary name on a background thread and renamed into
+    place, so it is either complete or absent. The first event written (the
+    "start" header) is kept aside and heads every dump.
+    """
+
+    def __init__(self, path: Path, window: float, capacity: int = 500_000, fmt: str = "jsonl"):
+        self.path = Path(path)
+        self.window = window
+        self.capacity = capacity
+        self.fmt = fmt
+        self._events: List[Optional[dict]] = [None] * capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._head = 0
+        self._count = 0
+        self._header: Optional[dict] = None
+        # [start, end, reason, utc stamp] of the dump waiting for its after-window
+        self._pending: Optional[list] = None
+        self._dumpers: List[threading.Thread] = []
+        self.segments: List[Path] = []
+        self.bytes_written = 0
+        self.overwritten = 0  # events lost from a pending window because the ring was full
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def write(self, obj: dict) -> None:
+        if self._header is None:
+            self._header = obj
+            return
+        i = self._head
+        if self._pending is not None and self._count == self.capacity and self._times[i] >= self._pending[0]:
+            self.overwritten += 1
+        self._events[i] = obj
+        self._times[i] = time.monotonic()
+        self._head = i + 1 if i + 1 < self.capacity else 0
+        if self._count < self.capacity:
+            self._count += 1
+
+    def pending(self) -> int:
+        """Events currently held in the ring."""
+        return self._count
+
+    def trigger(self, reason: str) -> None:
+        now = time.monotonic()
+        if self._pending is not None:
+            self._pending[1] = now + self.window
+            return
+        self._pending = [now - self.window, now + self.window, reason, datetime.utcnow().strftime("%Y%m%d_%H%M%S")]
+
+    def poll(self) -> None:
+        if self._pending is not None and time.monotonic() >= self._pending[1]:
+            self._dump()
+
+    def _snapshot(self, start: float, end: float) -> List[dict]:
+        events, times, cap = self._events, self._times, self.capacity
+        i = (self._head - self._count) % cap
+        out = [] if self._header is None else [self._header]
+        for _ in range(self._count):
+            if start <= times[i] <= end:
+                out.append(events[i])
+            i = i + 1 if i + 1 < cap else 0
+        return out
+
+    def _dump(self) -> None:
+        start, end, reason, stamp = self._pending
+        self._pending = None
+        events = self._snapshot(start, end)
+        tag = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in reason)[:40]
+        dst = self.path.with_name(f"{self.path.stem}.flight-{stamp}-{tag}{self.path.suffix}")
+        n = 1
+        while dst.exists() or dst in self.segments:
+            n += 1
+            dst = self.path.with_name(f"{self.path.stem}.flight-{stamp}-{tag}-{n}{self.path.suffix}")
+        self.segments.append(dst)
+        t = threading.Thread(target=self._write_dump, args=(dst, events), name="flight_dump", daemon=True)
+        t.start()
+        self._dumpers.append(t)
+
+    def _write_dump(self, dst: Path, events: List[dict]) -> None:
+        tmp = dst.with_name(dst.name + ".partial")
+        try:
+            with open(tmp, "wb") as fp:
+                if self.fmt == "bin":
+                    enc = BinEncoder()
+                    fp.write(enc.header())
+                    for obj in events:
+                        fp.write(enc.encode(obj))
+                    fp.write(enc.finish())
+                else:
+                    for obj in events:
+                        fp.write(encode_json_line(obj))
+                size = fp.tell()
+            os.replace(tmp, dst)
+            self.bytes_written += size
+            print(f"[flight] {len(events)} events -> {dst}")
+        except Exception as e:
+            print(f"[flight] dump to {dst} failed: {e}", file=sys.stderr)
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._pending is None:
+            now = time.monotonic()
+            self._pending = [now - self.window, now, "stop", datetime.utcnow().strftime("%Y%m%d_%H%M%S")]
+        else:
+            self._pending[1] = time.monotonic()
+        self._dump()
+        for t in self._dumpers:
+            t.join()
+        self._dumpers = []
+
+
+def percentiles(values, points=(50, 90, 99)) -> Dict[str, float]:
+    if not values:
+        return {}
+    vals = sorted(values)
+    n = len(vals)
+    out = {f"p{p}": vals[min(n - 1, (n * p) // 100)] for p in points}
+    out["max"] = vals[-1]
+    return out
+
+
+class TickStats:
+    """Per-stage tick timings, summarized into periodic "stats" events.
+
+    The loop accumulates stage times with time.perf_counter() and hands one
+    record per tick to record(); only the last `window` ticks since the
+    previous report are kept.
+    """
+
+    STAGES = ("net_connections", "scan", "proc_info", "rdns", "write", "tick")
+
+    def __init__(self, report_every: float = 60.0, window: int = 4096):
+        self.report_every = report_every
+        self._samples: Dict[str, deque] = {st: deque(maxlen=window) for st in self.STAGES}
+        self._events: deque = deque(maxlen=window)
+        self._ticks = 0
+        self._last_report = time.monotonic()
+
+    def record(self, events: int, **stages: float) -> None:
+        self._ticks += 1
+        self._events.append(events)
+        for st, secs in stages.items():
+            self._samples[st].append(secs)
+
+    def due(self) -> bool:
+        return self.report_every > 0 and time.monotonic() - self._last_report >= self.report_every
+
+    def report(self, **extra) -> dict:
+        ev = {"ts": now_iso(), "event": "stats", "ticks": self._ticks}
+        ev.update(extra)
+        # milliseconds
+        ev["stages_ms"] = {
+            st: {k: round(v * 1000.0, 3) for k, v in percentiles(list(samples)).items()}
+            for st, samples in self._samples.items() if samples
+        }
+        ev["events_per_tick"] = percentiles(list(self._events))
+        ev["events"] = sum(self._events)
+        for samples in self._samples.values():
+            samples.clear()
+        self._events.clear()
+        self._ticks = 0
+        self._last_report = time.monotonic()
+        return ev
+
+
+class TickScheduler:
+    """Fixed-rate ticks on the monotonic clock.
+
+    Each tick is due `interval` after the previous one was due (not after the
+    previous one finished), so sleeping never accumulates drift. A tick that
+    ends past its successor's due time is an overrun; whole intervals missed
+    on top of that are skipped rather than run back to back. `interval` may
+    be changed between ticks; wake() cuts the current sleep short.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.next_due = time.monotonic()
+        self.overruns = 0
+        self.skipped = 0
+        self._wake = threading.Event()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def wait(self) -> None:
+        if self.interval <= 0:
+            self.next_due = time.monotonic()
+            return
+        self.next_due += self.interval
+        now = time.monotonic()
+        if now <= self.next_due:
+            if self._wake.wait(self.next_due - now):
+                self._wake.clear()
+                self.next_due = time.monotonic()
+            return
+        self.overruns += 1
+        missed = int((now - self.next_due) // self.interval)
+        if missed:
+            self.skipped += missed
+            self.next_due += missed * self.interval
+
+
+class AdaptiveInterval:
+    """Poll interval between a floor and a ceiling, driven by table churn.
+
+    A tick whose open/close rate reaches `churn_high` per second drops the
+    interval straight to the floor; a tick with some churn keeps it; a tick
+    with none doubles it (up to the ceiling). A marker pins the floor for
+    `marker_hold` seconds, so the seconds right after F1/F2 are sampled at
+    full rate even if nothing has changed yet.
+    """
+
+    def __init__(self, start: float, floor: float, ceiling: float, churn_high: float = 5.0,
+                 marker_hold: float = 30.0, backoff: float = 2.0):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.churn_high = churn_high
+        self.marker_hold = marker_hold
+        self.backoff = backoff
+        self.interval = min(max(start, floor), ceiling)
+        self._hold_until = 0.0
+
+    def marker(self) -> None:
+        self._hold_until = time.monotonic() + self.marker_hold
+        self.interval = self.floor
+
+    def update(self, changes: int, elapsed: float) -> float:
+        """Feed one tick's open+close count and the time it covered; returns the next interval."""
+        if time.monotonic() < self._hold_until:
+            self.interval = self.floor
+        elif changes and changes >= self.churn_high * max(elapsed, self.floor):
+            self.interval = self.floor
+        elif not changes:
+            self.interval = min(self.interval * self.backoff, self.ceiling)
+        # rounded to ms so every event carries a short, exactly reproducible value
+        self.interval = round(self.interval, 3)
+        return self.interval
 
 
 def parse_args(argv=None):
     ap = argparse.ArgumentParser(description="Log all network connections to JSONL.")
-    ap.add_argument("--interval", type=float, default=1.0, help="Polling interval in seconds (default: 1.0)")
-    ap.add_argument("--log", type=str, default=None, help="Output JSONL file path (default: ./netlog_YYYYmmdd_HHMMSS.jsonl)")
+    ap.add_argument("--interval", type=float, default=1.0, help="Polling interval in seconds (default: 1.0); with --adaptive the starting one")
+    ap.add_argument("--adaptive", action="store_true",
+                    help="Adapt the interval to churn and markers between --min-interval and --max-interval; "
+                         "every event then records the interval in effect")
+    ap.add_argument("--min-interval", type=float, default=0.1, help="Adaptive floor in seconds (default: 0.1)")
+    ap.add_argument("--max-interval", type=float, default=2.0, help="Adaptive ceiling in seconds (default: 2.0)")
+    ap.add_argument("--churn-high", type=float, default=5.0,
+                    help="Opens+closes per second that drop the interval to the floor (default: 5)")
+    ap.add_argument("--marker-hold", type=float, default=30.0,
+                    help="Seconds to stay at the floor after an F1/F2 marker (default: 30)")
+    ap.add_argument("--log", type=str, default=None, help="Output file path (default: ./netlog_YYYYmmdd_HHMMSS.jsonl or .bin)")
+    ap.add_argument("--format", choices=("jsonl", "bin"), default="jsonl", help="Log format: JSONL or compact binary, see netbin.py (default: jsonl)")
     ap.add_argument("--no-dns", action="store_true", help="Disable reverse DNS lookups")
     ap.add_argument("--dns-timeout", type=float, default=0.8, help="Reverse DNS timeout per query (default: 0.8s)")
+    ap.add_argument("--dns-workers", type=int, default=4, help="Background rDNS worker threads; 0 = resolve inline (default: 4)")
+    ap.add_argument("--dns-queue", type=int, default=256, help="Max pending rDNS requests before new IPs are dropped (default: 256)")
+    ap.add_argument("--proc-cache", type=int, default=2048,
+                    help="Process name/exe cache entries, keyed by PID and create time (default: 2048, 0 = off)")
+    ap.add_argument("--proc-refresh", type=float, default=5.0,
+                    help="Seconds between full process list refreshes of that cache and of the --process "
+                         "PID set (default: 5, 0 = never, not allowed with --process; reused PIDs are still "
+                         "caught on cache lookup)")
+    ap.add_argument("--dns-cache-size", type=int, default=4096, help="rDNS LRU cache entries (default: 4096)")
+    ap.add_argument("--dns-ttl", type=float, default=3600.0, help="Cache lifetime of a resolved name in seconds (default: 3600)")
+    ap.add_argument("--dns-neg-ttl", type=float, default=300.0, help="Cache lifetime of a failed lookup in seconds (default: 300)")
+    ap.add_argument("--dns-server", type=str, default=None, help="Query this nameserver (host[:port]) instead of the system one (needs dnspython)")
+    ap.add_argument("--dns-cache", type=str, default=None,
+                    help="Persistent rDNS cache file (SQLite), shared between runs; answers keep their TTLs across restarts")
+    ap.add_argument("--backend", choices=("auto",) + tuple(BACKENDS), default="auto",
+                    help="Connection table source: psutil, or proc = parse /proc/net on Linux (default: auto)")
     ap.add_argument("--tcp-only", action="store_true", help="Log only TCP connections")
     ap.add_argument("--udp-only", action="store_true", help="Log only UDP connections")
+    ap.add_argument("--process", action="append", default=[], metavar="NAME",
+                    help="Only sockets of processes whose name contains NAME (repeatable; OR-ed with --pid)")
+    ap.add_argument("--pid", action="append", type=int, default=[], help="Only sockets of this PID (repeatable)")
+    ap.add_argument("--port-range", action="append", default=[], metavar="LO[-HI]",
+                    help="Only sockets whose local or remote port is in range, e.g. 25200-25300 or 443,3659 (repeatable)")
+    ap.add_argument("--remote-cidr", action="append", default=[], metavar="CIDR",
+                    help="Only sockets whose remote address is in CIDR, e.g. 52.0.0.0/8 (repeatable)")
     ap.add_argument("--log-duplicates", action="store_true", help="Also log duplicates each poll (not only changes)")
     ap.add_argument("--no-close-events", action="store_true", help="Do not log close events when connections disappear")
+    ap.add_argument("--flush-interval", type=float, default=0.5, help="Max seconds buffered events wait before hitting disk (default: 0.5)")
+    ap.add_argument("--flush-bytes", type=int, default=64 * 1024, help="Flush as soon as this many bytes are buffered (default: 65536)")
+    ap.add_argument("--rotate-mb", type=float, default=0.0, help="Start a new log segment after this many MB (default: off)")
+    ap.add_argument("--rotate-minutes", type=float, default=0.0, help="Start a new log segment after this many minutes (default: off)")
+    ap.add_argument("--compress", choices=("none", "gzip", "zstd"), default="none", help="Compress closed log segments (default: none)")
+    ap.add_argument("--stats-interval", type=float, default=60.0, help="Emit a stats event with tick timings every N seconds; 0 = off (default: 60)")
+    ap.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH",
+                    help="Run under cProfile, save stats to PATH (default: net_profile_<time>.prof) and print the top entries")
     # Marker hotkeys
+    ap.add_argument("--flight-recorder", type=float, default=0.0, metavar="SECONDS",
+                    help="Keep events in memory only and dump SECONDS before and after each F2 marker or "
+                         "flight signal (Ctrl+Break on Windows, SIGUSR1 elsewhere), plus the last SECONDS on stop")
+    ap.add_argument("--flight-capacity", type=int, default=500_000,
+                    help="Events the flight recorder ring holds (default: 500000)")
+    ap.add_argument("--collector", type=str, default=None, metavar="HOST:PORT",
+                    help="Also stream events to a netstream.py collector (buffered locally while unreachable)")
+    ap.add_argument("--collector-session", type=str, default=None,
+                    help="Session the collector merges this host into (default: today's UTC date)")
+    ap.add_argument("--collector-buffer", type=int, default=200_000,
+                    help="Events kept while the collector is unreachable, oldest dropped first (default: 200000)")
     ap.add_argument("--markers", action="store_true", help="Enable hotkeys: F1 marker1, F2 marker2 (Windows console)")
     ap.add_argument("--marker1", type=str, default="matchmaking_start", help="Label for F1 marker (default: matchmaking_start)")
     ap.add_argument("--marker2", type=str, default="issue_observed", help="Label for F2 marker (default: issue_observed)")
@@ -165,10 +1349,29 @@ def parse_args(argv=None):
 
 def main(argv=None) -> int:
     args = parse_args(argv)
+    if args.profile is None:
+        return run(args)
+
+    prof_path = args.profile or f"net_profile_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.prof"
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(run, args)
+    finally:
+        prof.dump_stats(prof_path)
+        pstats.Stats(prof, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+        print(f"Profile written to: {prof_path}")
+
 
+def run(args) -> int:
     if args.tcp_only and args.udp_only:
         print("Choose at most one of --tcp-only or --udp-only", file=sys.stderr)
         return 2
+    if args.flight_recorder < 0 or args.flight_capacity < 1:
+        print("--flight-recorder needs SECONDS >= 0 and --flight-capacity >= 1", file=sys.stderr)
+        return 2
+    if args.adaptive and not 0 < args.min_interval <= args.max_interval:
+        print("--adaptive needs 0 < --min-interval <= --max-interval", file=sys.stderr)
+        return 2
 
     if platform.system() != "Windows":
         print("Warning: this monitor is designed for Windows; running on: " + platform.system(), file=sys.stderr)
@@ -178,19 +1381,60 @@ def main(argv=None) -> int:
     if args.log:
         out_path = Path(args.log)
     else:
-        out_path = out_dir / f"netlog_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        ext = "bin" if args.format == "bin" else "jsonl"
+        out_path = out_dir / f"netlog_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{ext}"
+    if args.format == "bin" and out_path.exists() and out_path.stat().st_size > 0:
+        # Binary captures carry a trailer and cannot be appended to
+        print(f"Refusing to append binary capture to existing file: {out_path}", file=sys.stderr)
+        return 2
+
+    try:
+        backend = make_backend(args.backend)
+    except (OSError, ImportError) as e:
+        print(f"--backend={args.backend} is not available here: {e}", file=sys.stderr)
+        return 2
+
+    dns_store = None
+    if args.dns_cache and not args.no_dns:
+        try:
+            dns_store = DnsCacheFile(args.dns_cache)
+        except sqlite3.Error as e:
+            print(f"--dns-cache {args.dns_cache}: {e}", file=sys.stderr)
+            return 2
+    rdns = ReverseDNS(enable=not args.no_dns, timeout=args.dns_timeout, workers=args.dns_workers,
+                      queue_size=args.dns_queue, cache_size=args.dns_cache_size, ttl=args.dns_ttl,
+                      negative_ttl=args.dns_neg_ttl, nameserver=args.dns_server, store=dns_store)
 
-    rdns = ReverseDNS(enable=not args.no_dns, timeout=args.dns_timeout)
+    proc_cache = ProcessCache(args.proc_cache, args.proc_refresh) if args.proc_cache > 0 else None
+    proc_info = proc_cache.lookup if proc_cache else safe_proc_info
+
+    try:
+        ports = parse_port_ranges(args.port_range)
+        cidrs = [ipaddress.ip_network(c, strict=False) for c in args.remote_cidr]
+    except ValueError as e:
+        print(f"Bad filter: {e}", file=sys.stderr)
+        return 2
+    if args.process and args.proc_refresh <= 0:
+        # the matcher only learns about exited and reused PIDs from the periodic process list
+        print("--process needs --proc-refresh > 0", file=sys.stderr)
+        return 2
+    matcher = ProcessMatcher(args.process, args.proc_refresh) if args.process else None
+    types = {socket.SOCK_STREAM} if args.tcp_only else ({socket.SOCK_DGRAM} if args.udp_only else None)
+    conn_filter = ConnFilter(types, set(args.pid), matcher, ports, cidrs)
 
     # Track connections we've already logged to avoid constant duplicates
     # Key: (pid, fam, typ, l_ip, l_port, r_ip, r_port)
-    seen: Dict[Tuple, Dict[str, Optional[str]]] = {}
+    table = ConnTable()
 
     # Prepare marker queue (from hotkey thread)
     marker_queue = []  # list of dicts to write
     mlock = threading.Lock()
     stop_event = threading.Event()
 
+    adaptive = AdaptiveInterval(args.interval, args.min_interval, args.max_interval, args.churn_high,
+                                args.marker_hold) if args.adaptive else None
+    sched = TickScheduler(adaptive.interval if adaptive else args.interval)
+
     def enqueue_marker(kind: str, label: str):
         with mlock:
             marker_queue.append({
@@ -199,6 +1443,8 @@ def main(argv=None) -> int:
                 "marker": kind,
                 "label": label,
             })
+        if adaptive:
+            sched.wake()
 
     def kb_loop():
         if not HAS_MSVCRT:
@@ -229,34 +1475,87 @@ def main(argv=None) -> int:
         kb_thread.start()
 
     # Open output
-    with open(out_path, "a", encoding="utf-8") as fp:
+    if args.compress == "zstd" and not HAS_ZSTD:
+        print("--compress=zstd requires: pip install zstandard", file=sys.stderr)
+        return 2
+
+    flight = args.flight_recorder > 0
+    flight_hits: List[int] = []  # appended by the signal handler, drained by the poll loop
+    if flight:
+        log = FlightRecorder(out_path, args.flight_recorder, capacity=args.flight_capacity, fmt=args.format)
+        if FLIGHT_SIGNAL is not None:
+            signal.signal(FLIGHT_SIGNAL, lambda signum, frame: flight_hits.append(signum))
+    else:
+        log = LogWriter(out_path, flush_interval=args.flush_interval, flush_bytes=args.flush_bytes,
+                        rotate_bytes=int(args.rotate_mb * 1024 * 1024), rotate_seconds=args.rotate_minutes * 60.0,
+                        compress=None if args.compress == "none" else args.compress, fmt=args.format)
+    collector = None
+    if args.collector:
+        collector = CollectorClient(parse_address(args.collector),
+                                    args.collector_session or datetime.utcnow().strftime("%Y%m%d"),
+                                    buffer=args.collector_buffer)
+
+    def emit(ev: dict) -> None:
+        log.write(ev)
+        if collector is not None:
+            collector.send(ev)
+
+    with log:
         # Write a header/marker
-        write_jsonl(fp, {
+        emit({
             "ts": now_iso(),
             "event": "start",
             "host": platform.node(),
             "platform": platform.platform(),
             "admin_note": "Run as Administrator to see system-wide connections.",
             "dns_enabled": not args.no_dns,
-            "interval": args.interval,
+            "dns_workers": args.dns_workers,
+            "dns_cache": args.dns_cache,
+            "filter": {"tcp_only": args.tcp_only, "udp_only": args.udp_only, "process": args.process,
+                       "pid": args.pid, "port_range": args.port_range, "remote_cidr": args.remote_cidr}
+                      if conn_filter.predicate else None,
+            "backend": backend.name,
+            "interval": sched.interval,
+            "adaptive": {"min_interval": args.min_interval, "max_interval": args.max_interval,
+                         "churn_high": args.churn_high, "marker_hold": args.marker_hold} if adaptive else None,
+            "stats_interval": args.stats_interval,
             "markers": bool(args.markers),
             "marker1": args.marker1,
             "marker2": args.marker2,
+            "flight_recorder": args.flight_recorder or None,
         })
 
+        stats = TickStats(report_every=args.stats_interval)
+        pc = time.perf_counter
+
+        if adaptive:
+            # every tick event records the interval it was sampled at, so
+            # analysis can tell a short-lived flow from a coarse tick
+            def write(ev: dict) -> None:
+                ev["interval"] = sched.interval
+                emit(ev)
+        else:
+            write = emit if collector is not None else log.write
+
         try:
             while True:
-                t0 = time.time()
+                t0 = pc()
+                t_proc = t_rdns = t_write = 0.0
+                n_events = n_changes = 0
 
                 try:
-                    conns = psutil.net_connections(kind="inet")
+                    conns = backend.connections()
                 except Exception as e:
                     # On some systems, querying all can fail; retry next tick
-                    write_jsonl(fp, {"ts": now_iso(), "event": "error", "stage": "net_connections", "error": str(e)})
-                    time.sleep(args.interval)
+                    emit({"ts": now_iso(), "event": "error", "stage": "net_connections", "error": str(e)})
+                    sched.wait()
                     continue
-
-                current_keys = set()
+                t_conn = pc() - t0
+                if proc_cache:
+                    t_proc += proc_cache.maybe_refresh()
+                if matcher is not None:
+                    t_proc += matcher.maybe_refresh()
+                conns = conn_filter.apply(conns)
 
                 # Flush marker queue first on each tick
                 if args.markers:
@@ -264,17 +1563,29 @@ def main(argv=None) -> int:
                         pending = list(marker_queue)
                         marker_queue.clear()
                     for mk in pending:
-                        write_jsonl(fp, mk)
+                        write(mk)
+                        if flight and mk["marker"] == "F2":
+                            log.trigger(mk["label"])
+                    n_events += len(pending)
+                    if pending and adaptive:
+                        adaptive.marker()
+
+                if flight_hits:
+                    flight_hits.clear()
+                    write({"ts": now_iso(), "event": "marker", "marker": "signal", "label": "flight_dump"})
+                    log.trigger("signal")
+                    n_events += 1
+
+                # Names resolved in the background since the last tick
+                for ip, name in rdns.drain():
+                    if name:
+                        write({"ts": now_iso(), "event": "rdns", "ip": ip, "rdns": name})
+                        n_events += 1
 
                 for c in conns:
                     fam = family_to_str(c.family)
                     typ = type_to_str(c.type)
 
-                    if args.tcp_only and typ != "tcp":
-                        continue
-                    if args.udp_only and typ != "udp":
-                        continue
-
                     l_ip = getattr(c.laddr, 'ip', None) or (c.laddr[0] if c.laddr else None)
                     l_port = getattr(c.laddr, 'port', None) or (c.laddr[1] if c.laddr else None)
                     if not l_ip:
@@ -287,23 +1598,18 @@ def main(argv=None) -> int:
                         r_port = getattr(c.raddr, 'port', None) or (c.raddr[1] if isinstance(c.raddr, tuple) and len(c.raddr) > 1 else None)
 
                     key = (c.pid, fam, typ, l_ip, l_port, r_ip, r_port)
-                    current_keys.add(key)
-
-                    proc = safe_proc_info(c.pid)
-
                     status = c.status if hasattr(c, 'status') else None
 
-                    first_seen = key not in seen
-                    status_changed = False
-                    if not first_seen:
-                        prev = seen.get(key, {})
-                        if prev.get("status") != status:
-                            status_changed = True
-
-                    if first_seen or status_changed or args.log_duplicates:
+                    change = table.observe(key, status)
+                    if change:
+                        n_changes += 1
+                    if change or args.log_duplicates:
+                        t = pc()
+                        proc = proc_info(c.pid)
+                        t_proc += pc() - t
                         entry = {
                             "ts": now_iso(),
-                            "event": "open" if first_seen else ("status_change" if status_changed else "sample"),
+                            "event": "open" if change == ConnTable.OPENED else ("status_change" if change == ConnTable.CHANGED else "sample"),
                             "family": fam,
                             "proto": typ,
                             "status": status,
@@ -314,41 +1620,77 @@ def main(argv=None) -> int:
                         }
 
                         if r_ip:
-                            rdns_name = rdns.lookup(r_ip)
+                            t = pc()
+                            rdns_name = rdns.lookup_nowait(r_ip)
+                            t_rdns += pc() - t
                             if rdns_name:
                                 entry["rdns"] = rdns_name
 
-                        write_jsonl(fp, entry)
-
-                    # Update seen
-                    seen[key] = {"status": status}
+                        t = pc()
+                        write(entry)
+                        t_write += pc() - t
+                        n_events += 1
 
                 # Emit close events for disappeared connections
-                if not args.no_close_events:
-                    disappeared = [k for k in list(seen.keys()) if k not in current_keys]
-                    for k in disappeared:
-                        pid, fam, typ, l_ip, l_port, r_ip, r_port = k
-                        entry = {
-                            "ts": now_iso(),
-                            "event": "close",
-                            "family": fam,
-                            "proto": typ,
-                            "laddr": {"ip": l_ip, "port": l_port},
-                            "raddr": {"ip": r_ip, "port": r_port} if r_ip else None,
-                            "pid": pid,
-                        }
-                        write_jsonl(fp, entry)
-                        del seen[k]
+                # (with --no-close-events vanished keys stay known, as before)
+                for k in table.sweep(drop=not args.no_close_events):
+                    pid, fam, typ, l_ip, l_port, r_ip, r_port = k
+                    entry = {
+                        "ts": now_iso(),
+                        "event": "close",
+                        "family": fam,
+                        "proto": typ,
+                        "laddr": {"ip": l_ip, "port": l_port},
+                        "raddr": {"ip": r_ip, "port": r_port} if r_ip else None,
+                        "pid": pid,
+                    }
+                    t = pc()
+                    write(entry)
+                    t_write += pc() - t
+                    n_events += 1
+                    n_changes += 1
 
-                # Sleep remaining time
-                elapsed = time.time() - t0
-                to_sleep = max(0.0, args.interval - elapsed)
-                time.sleep(to_sleep)
+                t_tick = pc() - t0
+                stats.record(n_events, net_connections=t_conn, proc_info=t_proc, rdns=t_rdns, write=t_write,
+                             scan=t_tick - t_conn - t_proc - t_rdns - t_write, tick=t_tick)
+                if stats.due():
+                    report = stats.report(interval=sched.interval, overruns=sched.overruns, skipped=sched.skipped,
+                                          connections=len(table), write_queue=log.pending(),
+                                          bytes_written=log.bytes_written, rdns=dict(rdns.stats))
+                    if proc_cache:
+                        report["proc_cache"] = proc_cache.snapshot()
+                    if conn_filter.predicate:
+                        report["filter"] = conn_filter.snapshot()
+                    backend_stats = backend.stats()
+                    if backend_stats:
+                        report["backend"] = backend_stats
+                    if collector is not None:
+                        report["collector"] = dict(collector.stats, pending=collector.pending())
+                    emit(report)
+                    sched.overruns = sched.skipped = 0
+                if flight:
+                    log.poll()
+
+                if adaptive:
+                    sched.interval = adaptive.update(n_changes, sched.interval)
+
+                # Sleep until the next tick is due
+                sched.wait()
 
         except KeyboardInterrupt:
-            write_jsonl(fp, {"ts": now_iso(), "event": "stop", "reason": "KeyboardInterrupt"})
+            for ip, name in rdns.drain():
+                if name:
+                    emit({"ts": now_iso(), "event": "rdns", "ip": ip, "rdns": name})
+            emit({"ts": now_iso(), "event": "stop", "reason": "KeyboardInterrupt"})
+        finally:
+            rdns.close()
+            if collector is not None:
+                collector.close()
 
-    print(f"Log written to: {out_path}")
+    if flight:
+        print(f"Flight recorder: {len(log.segments)} dump(s) next to {out_path}")
+    else:
+        print(f"Log written to: {log.segments[0]}" + (f" (+{len(log.segments) - 1} rotated segments)" if len(log.segments) > 1 else ""))
     print("Tip: Run the script as Administrator to capture all processes.")
     return 0
 
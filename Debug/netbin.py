@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+Compact binary capture format for net.py logs, plus readers/converters.
+
+Layout (little endian):
+  header   b"NLB1" u16 version u16 flags
+  records  u8 tag followed by a tag-specific body:
+    STR  (1)  u16 len, utf-8 bytes     -> next string id (0, 1, 2, ...)
+    CONN (2)  fixed-width connection event (see CONN_FMT), followed by a
+              u32 poll interval in ms when F_INTERVAL is set (version 2)
+    JSON (3)  u32 len, utf-8 JSON      -> any other event, stored verbatim
+    STRTAB (4) / INDEX (5)             -> trailer, written on close
+  footer   b"NLBI" u64 offset of STRTAB
+
+Process names, exe paths, IPs, statuses and rDNS names are written once as STR
+records and referenced by id afterwards. The trailer repeats the string table
+and carries a periodic (ts, offset, strings-known) index so readers can seek by
+time without scanning; files without a trailer (e.g. after a crash) are still
+readable front to back.
+
+Conversion both ways with the JSONL schema is lossless: connection events that
+don't fit the fixed layout exactly fall back to JSON records.
+
+Usage:
+  python netbin.py to-bin  netlog.jsonl netlog.bin
+  python netbin.py to-jsonl netlog.bin netlog.jsonl [--since 2025-01-01T10:00:00Z]
+"""
+
+import argparse
+import calendar
+import gzip
+import io
+import json
+import struct
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard  # type: ignore
+    HAS_ZSTD = True
+except Exception:
+    HAS_ZSTD = False
+
+MAGIC = b"NLB1"
+FOOTER_MAGIC = b"NLBI"
+VERSION = 2  # 2: optional interval after CONN records (adaptive polling)
+
+TAG_STR = 1
+TAG_CONN = 2
+TAG_JSON = 3
+TAG_STRTAB = 4
+TAG_INDEX = 5
+
+# ts, event, family, proto, flags, pid, status, l_ip, l_port, r_ip, r_port, name, exe, rdns
+CONN_FMT = struct.Struct("<IBBBBIIIHIHIII")
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+INDEX_FMT = struct.Struct("<IQI")
+FOOTER_FMT = struct.Struct("<4sQ")
+
+NONE_ID = 0xFFFFFFFF
+
+EVENTS = ("open", "status_change", "sample", "close")
+EVENT_CODES = {e: i for i, e in enumerate(EVENTS)}
+FAMILIES = ("ipv4", "ipv6")
+FAMILY_CODES = {f: i for i, f in enumerate(FAMILIES)}
+PROTOS = ("tcp", "udp")
+PROTO_CODES = {p: i for i, p in enumerate(PROTOS)}
+
+F_PID_NONE = 0x01
+F_LPORT_NONE = 0x02
+F_RADDR_NONE = 0x04
+F_RPORT_NONE = 0x08
+F_RDNS = 0x10
+F_INTERVAL = 0x20
+
+# Key order of the connection events written by net.py ("rdns" and then
+# "interval" may follow)
+OPEN_KEYS = ("ts", "event", "family", "proto", "status", "laddr", "raddr", "pid", "process")
+CLOSE_KEYS = ("ts", "event", "family", "proto", "laddr", "raddr", "pid")
+
+
+_DAYS: Dict[str, Optional[int]] = {}  # "YYYY-mm-dd" -> epoch of its midnight
+
+
+def ts_to_epoch(ts: str) -> Optional[int]:
+    # net.py timestamps: YYYY-mm-ddTHH:MM:SSZ (UTC, whole seconds). Only the
+    # date goes through strptime, once per day seen; the time is sliced.
+    if len(ts) != 20 or ts[-1] != "Z" or ts[10] != "T" or ts[13] != ":" or ts[16] != ":":
+        return None
+    hms = ts[11:13] + ts[14:16] + ts[17:19]
+    if not (hms.isascii() and hms.isdigit()):
+        return None
+    h, m, s = int(hms[0:2]), int(hms[2:4]), int(hms[4:6])
+    if h > 23 or m > 59 or s > 61:
+        return None
+    day = ts[:10]
+    base = _DAYS.get(day, -1)
+    if base == -1:
+        try:
+            base = calendar.timegm(time.strptime(day, "%Y-%m-%d"))
+        except Exception:
+            base = None
+        if len(_DAYS) >= 4096:
+            _DAYS.clear()
+        _DAYS[day] = base
+    if base is None:
+        return None
+    return base + h * 3600 + m * 60 + s
+
+
+def epoch_to_ts(sec: int) -> str:
+    return datetime.utcfromtimestamp(sec).isoformat(timespec="seconds") + "Z"
+
+
+class BinEncoder:
+    """Turns events into binary records for one file/segment.
+
+    encode() returns the bytes to append (string definitions + record);
+    finish() returns the trailer. Offsets are tracked from the header on, so
+    the caller must write everything it is given, in order.
+    """
+
+    def __init__(self, index_every: int = 60, index_records: int = 10000):
+        self.index_every = index_every
+        self.index_records = index_records
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+        self._offset = 0
+        self._index: List[Tuple[int, int, int]] = []
+        self._since_index = index_records
+        self._last_index_ts = -1
+        self._last_ts_str = ""
+        self._last_ts = 0
+
+    def header(self) -> bytes:
+        data = MAGIC + struct.pack("<HH", VERSION, 0)
+        self._offset += len(data)
+        return data
+
+    def _sid(self, s: Optional[str], out: List[bytes]) -> int:
+        if s is None:
+            return NONE_ID
+        sid = self._ids.get(s)
+        if sid is None:
+            raw = s.encode("utf-8")
+            if len(raw) > 0xFFFF:
+                raise ValueError("string too long")
+            sid = len(self._strings)
+            self._ids[s] = sid
+            self._strings.append(s)
+            out.append(bytes((TAG_STR,)) + U16.pack(len(raw)) + raw)
+        return sid
+
+    def _epoch(self, ts) -> Optional[int]:
+        if not isinstance(ts, str):
+            return None
+        if ts != self._last_ts_str:
+            sec = ts_to_epoch(ts)
+            if sec is None:
+                return None
+            self._last_ts_str, self._last_ts = ts, sec
+        return self._last_ts
+
+    def _conn_record(self, obj: dict, out: List[bytes]) -> Optional[bytes]:
+        ev = EVENT_CODES.get(obj.get("event"))
+        if ev is None:
+            return None
+        keys = tuple(obj.keys())
+        interval_ms = None
+        if keys[-1:] == ("interval",):
+            iv = obj["interval"]
+            # seconds rounded to ms (net.py rounds it so); anything else stays JSON
+            if not isinstance(iv, float) or not 0 <= iv < 4e6 or round(iv * 1000) / 1000 != iv:
+                return None
+            interval_ms = round(iv * 1000)
+            keys = keys[:-1]
+        close = ev == EVENT_CODES["close"]
+        if close:
+            if keys != CLOSE_KEYS:
+                return None
+        elif keys != OPEN_KEYS and keys != OPEN_KEYS + ("rdns",):
+            return None
+        sec = self._epoch(obj["ts"])
+        fam = FAMILY_CODES.get(obj["family"])
+        proto = PROTO_CODES.get(obj["proto"])
+        if sec is None or fam is None or proto is None:
+            return None
+
+        flags = 0
+        pid = obj["pid"]
+        if pid is None:
+            flags |= F_PID_NONE
+            pid = 0
+        elif not isinstance(pid, int) or not 0 <= pid <= 0xFFFFFFFF:
+            return None
+
+        laddr = obj["laddr"]
+        if not isinstance(laddr, dict) or tuple(laddr.keys()) != ("ip", "port") or not isinstance(laddr["ip"], str):
+            return None
+        l_port = laddr["port"]
+        if l_port is None:
+            flags |= F_LPORT_NONE
+            l_port = 0
+        elif not isinstance(l_port, int) or not 0 <= l_port <= 0xFFFF:
+            return None
+
+        raddr = obj["raddr"]
+        r_ip = None
+        r_port = 0
+        if raddr is None:
+            flags |= F_RADDR_NONE
+        else:
+            if not isinstance(raddr, dict) or tuple(raddr.keys()) != ("ip", "port") or not isinstance(raddr["ip"], str):
+                return None
+            r_ip = raddr["ip"]
+            if raddr["port"] is None:
+                flags |= F_RPORT_NONE
+            elif not isinstance(raddr["port"], int) or not 0 <= raddr["port"] <= 0xFFFF:
+                return None
+            else:
+                r_port = raddr["port"]
+
+        status = name = exe = rdns = None
+        if not close:
+            status = obj["status"]
+            proc = obj["process"]
+            if not isinstance(proc, dict) or tuple(proc.keys()) != ("name", "exe"):
+                return None
+            name, exe = proc["name"], proc["exe"]
+            if "rdns" in obj:
+                rdns = obj["rdns"]
+                if not isinstance(rdns, str):
+                    return None
+                flags |= F_RDNS
+            for v in (status, name, exe):
+                if v is not None and not isinstance(v, str):
+                    return None
+
+        if interval_ms is not None:
+            flags |= F_INTERVAL
+        rec = bytes((TAG_CONN,)) + CONN_FMT.pack(
+            sec, ev, fam, proto, flags, pid,
+            self._sid(status, out), self._sid(laddr["ip"], out), l_port,
+            self._sid(r_ip, out), r_port,
+            self._sid(name, out), self._sid(exe, out), self._sid(rdns, out),
+        )
+        return rec if interval_ms is None else rec + U32.pack(interval_ms)
+
+    def encode(self, obj: dict) -> bytes:
+        out: List[bytes] = []
+        sec = self._epoch(obj.get("ts"))
+        try:
+            rec = self._conn_record(obj, out)
+        except ValueError:
+            rec = None
+        if rec is None:
+            raw = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            rec = bytes((TAG_JSON,)) + U32.pack(len(raw)) + raw
+
+        if sec is not None:
+            self._since_index += 1
+            if self._since_index >= self.index_records or sec - self._last_index_ts >= self.index_every:
+                # Point at the string definitions emitted for this record, if any
+                self._index.append((sec, self._offset, len(self._strings) - (len(out))))
+                self._since_index = 0
+                self._last_index_ts = sec
+
+        out.append(rec)
+        data = b"".join(out)
+        self._offset += len(data)
+        return data
+
+    def finish(self) -> bytes:
+        strtab_off = self._offset
+        parts = [bytes((TAG_STRTAB,)), U32.pack(len(self._strings))]
+        for s in self._strings:
+            raw = s.encode("utf-8")
+            parts.append(U16.pack(len(raw)) + raw)
+        parts.append(bytes((TAG_INDEX,)) + U32.pack(len(self._index)))
+        for entry in self._index:
+            parts.append(INDEX_FMT.pack(*entry))
+        parts.append(FOOTER_FMT.pack(FOOTER_MAGIC, strtab_off))
+        data = b"".join(parts)
+        self._offset += len(data)
+        return data
+
+
+class BinReader:
+    """Streams events back out of a binary capture (optionally from a time)."""
+
+    def __init__(self, fp: BinaryIO):
+        self.fp = fp
+        head = fp.read(8)
+        if head[:4] != MAGIC:
+            raise ValueError("not a netlog binary capture")
+        if len(head) == 8 and struct.unpack("<H", head[4:6])[0] > VERSION:
+            raise ValueError("netlog binary capture from a newer version")
+        self.strings: List[str] = []
+        self.index: List[Tuple[int, int, int]] = []
+        self._data_end: Optional[int] = None
+        self._ts_cache: Dict[int, str] = {}
+
+    def load_trailer(self) -> bool:
+        """Read string table and index from the footer; False if there is none."""
+        fp = self.fp
+        try:
+            fp.seek(-FOOTER_FMT.size, io.SEEK_END)
+        except (OSError, io.UnsupportedOperation):
+            return False
+        magic, strtab_off = FOOTER_FMT.unpack(fp.read(FOOTER_FMT.size))
+        if magic != FOOTER_MAGIC:
+            fp.seek(8)
+            return False
+        fp.seek(strtab_off)
+        if fp.read(1) != bytes((TAG_STRTAB,)):
+            fp.seek(8)
+            return False
+        (n,) = U32.unpack(fp.read(4))
+        strings = []
+        for _ in range(n):
+            (ln,) = U16.unpack(fp.read(2))
+            strings.append(fp.read(ln).decode("utf-8"))
+        if fp.read(1) != bytes((TAG_INDEX,)):
+            fp.seek(8)
+            return False
+        (n,) = U32.unpack(fp.read(4))
+        raw = fp.read(n * INDEX_FMT.size)
+        self.index = [INDEX_FMT.unpack_from(raw, i * INDEX_FMT.size) for i in range(n)]
+        self.strings = strings
+        self._data_end = strtab_off
+        fp.seek(8)
+        return True
+
+    def seek_time(self, since: int) -> None:
+        """Position before the last index point at or before epoch `since`."""
+        if not self.index and not self.load_trailer():
+            return
+        # The trailer holds the complete string table, so any checkpoint works
+        pos = 8
+        for ts, off, _nstr in self.index:
+            if ts > since:
+                break
+            pos = off
+        self.fp.seek(pos)
+
+    def _ts(self, sec: int) -> str:
+        s = self._ts_cache.get(sec)
+        if s is None:
+            if len(self._ts_cache) > 4096:
+                self._ts_cache.clear()
+            s = self._ts_cache[sec] = epoch_to_ts(sec)
+        return s
+
+    def __iter__(self) -> Iterator[dict]:
+        fp = self.fp
+        read = fp.read
+        # With a loaded trailer the table is complete; otherwise it grows as STR records arrive
+        have_table = self._data_end is not None
+        strings = self.strings if have_table else []
+        if not have_table:
+            self.strings = strings
+        end = self._data_end
+        conn_size = CONN_FMT.size
+        while True:
+            if end is not None and fp.tell() >= end:
+                return
+            tag = read(1)
+            if not tag:
+                return
+            t = tag[0]
+            if t == TAG_STR:
+                (ln,) = U16.unpack(read(2))
+                s = read(ln).decode("utf-8")
+                if not have_table:
+                    strings.append(s)
+                continue
+            if t == TAG_CONN:
+                raw = read(conn_size)
+                if len(raw) < conn_size:
+                    return
+                (sec, ev, fam, proto, flags, pid, status, l_ip, l_port,
+                 r_ip, r_port, name, exe, rdns) = CONN_FMT.unpack(raw)
+                obj = {
+                    "ts": self._ts(sec),
+                    "event": EVENTS[ev],
+                    "family": FAMILIES[fam],
+                    "proto": PROTOS[proto],
+                }
+                close = ev == EVENT_CODES["close"]
+                if not close:
+                    obj["status"] = None if status == NONE_ID else strings[status]
+                obj["laddr"] = {"ip": strings[l_ip], "port": None if flags & F_LPORT_NONE else l_port}
+                obj["raddr"] = None if flags & F_RADDR_NONE else {
+                    "ip": strings[r_ip], "port": None if flags & F_RPORT_NONE else r_port}
+                obj["pid"] = None if flags & F_PID_NONE else pid
+                if not close:
+                    obj["process"] = {
+                        "name": None if name == NONE_ID else strings[name],
+                        "exe": None if exe == NONE_ID else strings[exe],
+                    }
+                    if flags & F_RDNS:
+                        obj["rdns"] = strings[rdns]
+                if flags & F_INTERVAL:
+                    raw = read(4)
+                    if len(raw) < 4:
+                        return
+                    obj["interval"] = U32.unpack(raw)[0] / 1000
+                yield obj
+                continue
+            if t == TAG_JSON:
+                (ln,) = U32.unpack(read(4))
+                raw = read(ln)
+                if len(raw) < ln:
+                    return
+                yield json.loads(raw)
+                continue
+            # Trailer (or garbage): stop
+            return
+
+
+def open_stream(path: Path) -> BinaryIO:
+    """Open a capture file, transparently decompressing .gz/.zst segments."""
+    fp = open(path, "rb")
+    head = fp.read(4)
+    fp.seek(0)
+    if head[:2] == b"\x1f\x8b":
+        return gzip.GzipFile(fileobj=fp)
+    if head == b"\x28\xb5\x2f\xfd":
+        if not HAS_ZSTD:
+            fp.close()
+            raise RuntimeError(f"{path}: zstd capture needs: pip install zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(fp, closefd=True)
+    return fp
+
+
+def iter_events(path, since: Optional[int] = None) -> Iterator[dict]:
+    """Yield events from a JSONL or binary capture (plain, .gz or .zst).
+
+    Malformed JSONL lines are skipped. `since` (epoch seconds) lets binary
+    captures with an index skip ahead; it is only a hint, earlier events can
+    still be yielded.
+    """
+    with open_stream(Path(path)) as fp:
+        head = fp.read(4)
+        if head == MAGIC:
+            if isinstance(fp, io.BufferedReader):
+                fp.seek(0)
+                reader = BinReader(fp)
+                if since is not None:
+                    reader.seek_time(since)
+            else:
+                # Compressed stream: no random access, read front to back
+                reader = BinReader(io.BufferedReader(_Prefixed(head, fp)))
+            yield from reader
+            return
+        text = io.TextIOWrapper(io.BufferedReader(_Prefixed(head, fp)), encoding="utf-8", errors="replace")
+        for line in text:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except Exception:
+                continue
+
+
+class _Prefixed(io.RawIOBase):
+    # Re-attach bytes already consumed while sniffing the format
+    def __init__(self, head: bytes, fp):
+        self._head = head
+        self._fp = fp
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._head:
+            n = min(len(b), len(self._head))
+            b[:n] = self._head[:n]
+            self._head = self._head[n:]
+            return n
+        data = self._fp.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+    def read(self, n: int = -1) -> bytes:
+        if n is None or n < 0:
+            data = self._head + self._fp.read()
+            self._head = b""
+            return data
+        if self._head:
+            data = self._head[:n]
+            self._head = self._head[n:]
+            if len(data) < n:
+                data += self._fp.read(n - len(data))
+            return data
+        return self._fp.read(n)
+
+    def tell(self) -> int:
+        raise io.UnsupportedOperation("tell")
+
+
+def jsonl_to_bin(src: Path, dst: Path) -> int:
+    enc = BinEncoder()
+    n = 0
+    with open(dst, "wb") as out:
+        out.write(enc.header())
+        for obj in iter_events(src):
+            out.write(enc.encode(obj))
+            n += 1
+        out.write(enc.finish())
+    return n
+
+
+def bin_to_jsonl(src: Path, dst: Path, since: Optional[int] = None) -> int:
+    n = 0
+    with open(dst, "w", encoding="utf-8") as out:
+        for obj in iter_events(src, since=since):
+            if since is not None and (ts_to_epoch(obj.get("ts", "")) or 0) < since:
+                continue
+            out.write(json.dumps(obj, ensure_ascii=False) + "\n")
+            n += 1
+    return n
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Convert net.py captures between JSONL and the binary format.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("to-bin", help="JSONL (plain/.gz/.zst) -> binary")
+    p.add_argument("src")
+    p.add_argument("dst")
+    p = sub.add_parser("to-jsonl", help="binary -> JSONL")
+    p.add_argument("src")
+    p.add_argument("dst")
+    p.add_argument("--since", type=str, default=None, help="Only events at/after this UTC time (YYYY-mm-ddTHH:MM:SSZ)")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    if args.cmd == "to-bin":
+        n = jsonl_to_bin(Path(args.src), Path(args.dst))
+    else:
+        since = None
+        if args.since:
+            since = ts_to_epoch(args.since)
+            if since is None:
+                print("--since must look like 2025-01-31T18:00:00Z", file=sys.stderr)
+                return 2
+        n = bin_to_jsonl(Path(args.src), Path(args.dst), since=since)
+    src_size = Path(args.src).stat().st_size
+    dst_size = Path(args.dst).stat().st_size
+    print(f"{n} events, {src_size} -> {dst_size} bytes in {time.perf_counter() - t0:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+"""
+Stream net.py events from several hosts to one collector.
+
+Wire format (TCP, big endian): every frame is u32 length, u8 type, body.
+  HELLO (1)  client -> collector  JSON {"host", "session", "stream", "version"}
+  BATCH (2)  client -> collector  u64 seq + JSON lines (one event per line)
+  ACK   (3)  collector -> client  u64 seq: every batch up to seq is merged
+The collector answers HELLO with the last seq it has for that stream, so a
+reconnecting client resends only what was not acknowledged.
+
+CollectorClient (used by net.py --collector) runs on its own thread: send()
+appends to a bounded in-memory buffer and returns, so the poll loop never
+waits on the network. While the collector is unreachable events keep
+accumulating in the buffer (the oldest are dropped beyond `buffer` events)
+and the thread reconnects with backoff. At most `inflight` batches are
+unacknowledged at once: a slow collector slows the client thread, never the
+poll loop.
+
+Collector is an asyncio server. Each connection is read one frame at a
+time and a batch is acknowledged only after its events are merged, and
+merging waits while a session holds more than `max_buffer` unreleased
+events, so a flooded collector pushes back through TCP instead of growing.
+Events of all hosts in the same session are merged into one time-ordered
+<session>.jsonl (each event tagged with "host"): an event is released once
+every host still sending in that session has reached its timestamp; hosts
+silent for more than `max_delay` seconds no longer hold the others back.
+Delivery is at least once: a batch written but not acknowledged before the
+collector went down is sent again after it comes back.
+
+Run a collector:
+  python netstream.py --port 7878 --out-dir collected
+and point the monitors at it:
+  python net.py --collector 192.168.1.10:7878 --collector-session match1
+"""
+
+import argparse
+import asyncio
+import heapq
+import json
+import os
+import platform
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+# Optional faster JSON
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+VERSION = 1
+T_HELLO = 1
+T_BATCH = 2
+T_ACK = 3
+HEAD = struct.Struct(">IB")
+SEQ = struct.Struct(">Q")
+MAX_FRAME = 16 * 1024 * 1024
+DEFAULT_PORT = 7878
+
+
+def _dumps(obj: dict) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(line: bytes):
+    return orjson.loads(line) if HAS_ORJSON else json.loads(line)
+
+
+def frame(ftype: int, body: bytes) -> bytes:
+    return HEAD.pack(len(body) + 1, ftype) + body
+
+
+def parse_address(text: str, default_port: int = DEFAULT_PORT) -> Tuple[str, int]:
+    host, sep, port = text.rpartition(":")
+    if not sep or not port.isdigit():
+        return text.strip("[]"), default_port
+    return host.strip("[]"), int(port)
+
+
+# --- client ----------------------------------------------------------------
+
+class CollectorClient:
+    """Non-blocking event sender with local buffering and reconnects."""
+
+    def __init__(self, address: Tuple[str, int], session: str, host: Optional[str] = None,
+                 buffer: int = 200_000, batch_events: int = 500, flush_interval: float = 0.5,
+                 inflight: int = 4, connect_timeout: float = 3.0):
+        self.address = address
+        self.session = session
+        self.host = host or platform.node()
+        self.stream = uuid.uuid4().hex
+        self.batch_events = batch_events
+        self.flush_interval = flush_interval
+        self.inflight = max(1, inflight)
+        self.connect_timeout = connect_timeout
+        self._buf: Deque[dict] = deque(maxlen=max(1, buffer))
+        self._unacked: Deque[Tuple[int, bytes]] = deque()  # (seq, frame)
+        self._seq = 0
+        self._next_try = 0.0
+        self._sock: Optional[socket.socket] = None
+        self._rx = b""
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.stats = {"events": 0, "batches": 0, "acked": 0, "dropped": 0, "connects": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="collector_client", daemon=True)
+        self._thread.start()
+
+    def send(self, obj: dict) -> None:
+        if len(self._buf) == self._buf.maxlen:
+            self.stats["dropped"] += 1
+        self._buf.append(obj)
+
+    def pending(self) -> int:
+        return len(self._buf) + len(self._unacked)
+
+    # runs on the client thread from here on
+
+    def _connect(self) -> bool:
+        try:
+            s = socket.create_connection(self.address, timeout=self.connect_timeout)
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            hello = {"host": self.host, "session": self.session, "stream": self.stream, "version": VERSION}
+            s.sendall(frame(T_HELLO, _dumps(hello)))
+            self._sock, self._rx = s, b""
+            self._ack(self._read_ack(self.connect_timeout))
+            # everything the collector has not merged yet goes out again, in order
+            s.settimeout(self.connect_timeout * 10)
+            for _, data in self._unacked:
+                s.sendall(data)
+            self.stats["connects"] += 1
+            return True
+        except (OSError, ValueError):
+            self._drop_connection()
+            return False
+
+    def _drop_connection(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+
+    def _read_ack(self, timeout: Optional[float]) -> Optional[int]:
+        """Latest ACK seq received within timeout (None: nothing arrived); raises on a broken connection."""
+        self._sock.settimeout(timeout)
+        latest = None
+        while True:
+            while len(self._rx) >= HEAD.size:
+                length, ftype = HEAD.unpack_from(self._rx)
+                if len(self._rx) < 4 + length:
+                    break
+                body = self._rx[HEAD.size:4 + length]
+                self._rx = self._rx[4 + length:]
+                if ftype != T_ACK or len(body) != SEQ.size:
+                    raise ValueError("unexpected frame from collector")
+                latest = SEQ.unpack(body)[0]
+            if latest is not None:
+                return latest
+            try:
+                data = self._sock.recv(65536)
+            except (socket.timeout, BlockingIOError):
+                return None
+            if not data:
+                raise ConnectionError("collector closed the connection")
+            self._rx += data
+            timeout = 0.0 if timeout is not None else None
+            self._sock.settimeout(timeout)
+
+    def _ack(self, seq: Optional[int]) -> None:
+        if seq is None:
+            return
+        while self._unacked and self._unacked[0][0] <= seq:
+            self._unacked.popleft()
+            self.stats["acked"] += 1
+
+    def _next_batch(self) -> Optional[bytes]:
+        buf = self._buf
+        if not buf:
+            return None
+        lines = []
+        while buf and len(lines) < self.batch_events:
+            lines.append(_dumps(buf.popleft()))
+        self._seq += 1
+        self.stats["events"] += len(lines)
+        self.stats["batches"] += 1
+        return frame(T_BATCH, SEQ.pack(self._seq) + b"\n".join(lines) + b"\n")
+
+    def _pump(self) -> bool:
+        """Send what is buffered while the in-flight window allows; collect ACKs.
+
+        Returns whether anything was sent or acknowledged.
+        """
+        progress = False
+        while True:
+            acked = len(self._unacked)
+            self._ack(self._read_ack(0.0))
+            if len(self._unacked) >= self.inflight:
+                self._ack(self._read_ack(self.flush_interval))
+            progress = progress or len(self._unacked) < acked
+            if len(self._unacked) >= self.inflight:
+                return progress
+            data = self._next_batch()
+            if data is None:
+                return progress
+            self._unacked.append((self._seq, data))
+            self._sock.settimeout(self.connect_timeout * 10)
+            self._sock.sendall(data)
+            progress = True
+
+    def _run(self) -> None:
+        backoff = 0.5
+        while True:
+            stopping = self._stop.is_set()
+            if self._sock is None and time.monotonic() >= self._next_try:
+                if self._connect():
+                    backoff = 0.5
+                else:
+                    self._next_try = time.monotonic() + backoff
+                    backoff = min(backoff * 2, 30.0)
+            progress = False
+            if self._sock is not None:
+                try:
+                    progress = self._pump()
+                except (OSError, ValueError):
+                    self.stats["errors"] += 1
+                    self._drop_connection()
+            if stopping:
+                return
+            # wait for the next reconnect attempt, or for a batch to fill up,
+            # whenever this round got nothing out (close() cuts either short)
+            if self._sock is None:
+                self._wake.wait(max(0.0, self._next_try - time.monotonic()))
+                self._wake.clear()
+            elif not progress or len(self._buf) < self.batch_events:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Send what is left, waiting up to timeout for the collector to acknowledge it."""
+        deadline = time.monotonic() + timeout
+        self._next_try = 0.0  # one more attempt right away if disconnected
+        while (self._buf or self._unacked) and time.monotonic() < deadline:
+            self._wake.set()
+            time.sleep(0.05)
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(max(0.0, deadline - time.monotonic()) + 1.0)
+        self._drop_connection()
+
+
+# --- collector -------------------------------------------------------------
+
+class SessionMerge:
+    """Time-ordered merge of the event streams of one session into one file."""
+
+    def __init__(self, path: Path, max_delay: float, max_buffer: int):
+        self.path = path
+        self.max_delay = max_delay
+        self.max_buffer = max_buffer
+        self._heap: List[Tuple[str, int, bytes]] = []  # (ts, arrival, line)
+        self._arrival = 0
+        # stream -> [host, newest ts seen, monotonic time of the last batch, connected]
+        self.streams: Dict[str, list] = {}
+        self.last_seq: Dict[str, int] = {}
+        self.released_ts = ""
+        self.written = 0
+        self.late = 0
+        self._fp = open(path, "ab")
+        # set and replaced whenever events come in or go out
+        self._changed = asyncio.Event()
+
+    def full(self) -> bool:
+        return len(self._heap) >= self.max_buffer
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_changed(self, timeout: float) -> None:
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def add(self, stream: str, host: str, events: List[dict]) -> None:
+        st = self.streams.setdefault(stream, [host, "", 0.0, True])
+        for ev in events:
+            ts = ev.get("ts") or ""
+            ev["host"] = host
+            if ts > st[1]:
+                st[1] = ts
+            self._arrival += 1
+            heapq.heappush(self._heap, (ts, self._arrival, _dumps(ev) + b"\n"))
+        st[2] = time.monotonic()
+        self._notify()
+
+    def watermark(self, now: float) -> Optional[str]:
+        """Events up to this ts can't be preceded by anything still to come (None: hold everything)."""
+        marks = [st[1] for st in self.streams.values() if st[3] and now - st[2] < self.max_delay]
+        if marks:
+            return min(marks)
+        return max((st[1] for st in self.streams.values()), default="") or None
+
+    def lagging(self, stream: str) -> bool:
+        """True for a stream the watermark waits on; it must not be held back."""
+        mark = self.watermark(time.monotonic())
+        st = self.streams.get(stream)
+        return mark is None or st is None or st[1] <= mark
+
+    def release(self, force: bool = False, spill: bool = True) -> int:
+        """Write out what the watermark allows. With spill, also the oldest
+        events beyond max_buffer - 1, so a full buffer always has room again."""
+        heap = self._heap
+        mark = None if force else self.watermark(time.monotonic())
+        out = []
+        while heap and (force or (mark is not None and heap[0][0] <= mark)
+                        or (spill and len(heap) >= self.max_buffer)):
+            ts, _, line = heapq.heappop(heap)
+            if ts < self.released_ts:
+                self.late += 1
+            else:
+                self.released_ts = ts
+            out.append(line)
+        if out:
+            self._fp.write(b"".join(out))
+            self._fp.flush()
+            self.written += len(out)
+            self._notify()
+        return len(out)
+
+    def close(self) -> None:
+        self.release(force=True)
+        self._fp.close()
+
+
+class Collector:
+    """asyncio server merging CollectorClient streams into <out_dir>/<session>.jsonl."""
+
+    def __init__(self, out_dir: Path, max_delay: float = 5.0, max_buffer: int = 100_000, tick: float = 0.25):
+        self.out_dir = Path(out_dir)
+        self.max_delay = max_delay
+        self.max_buffer = max_buffer
+        self.tick = tick
+        self.sessions: Dict[str, SessionMerge] = {}
+        self.stats = {"connections": 0, "batches": 0, "duplicates": 0, "events": 0}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._ticker: Optional[asyncio.Task] = None
+        self._handlers: set = set()
+        self._writers: set = set()
+
+    def _session(self, name: str) -> SessionMerge:
+        m = self.sessions.get(name)
+        if m is None:
+            safe = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)[:80] or "session"
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            m = self.sessions[name] = SessionMerge(self.out_dir / f"{safe}.jsonl", self.max_delay, self.max_buffer)
+        return m
+
+    async def start(self, host: str = "0.0.0.0", port: int = DEFAULT_PORT) -> Tuple[str, int]:
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self._ticker = asyncio.create_task(self._tick())
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def _tick(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            for m in self.sessions.values():
+                m.release()
+
+    async def _read_frame(self, reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+        length, ftype = HEAD.unpack(await reader.readexactly(HEAD.size))
+        if not 1 <= length <= MAX_FRAME:
+            raise ValueError(f"bad frame length {length}")
+        return ftype, await reader.readexactly(length - 1)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats["connections"] += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        self._writers.add(writer)
+        merge = stream = None
+        try:
+            ftype, body = await self._read_frame(reader)
+            hello = _loads(body) if ftype == T_HELLO else None
+            if not isinstance(hello, dict) or hello.get("version") != VERSION:
+                return
+            host, stream = str(hello.get("host")), str(hello.get("stream"))
+            merge = self._session(str(hello.get("session")))
+            merge.streams.setdefault(stream, [host, "", time.monotonic(), True])[3] = True
+            writer.write(frame(T_ACK, SEQ.pack(merge.last_seq.get(stream, 0))))
+            await writer.drain()
+            while True:
+                ftype, body = await self._read_frame(reader)
+                if ftype != T_BATCH or len(body) < SEQ.size:
+                    return
+                seq = SEQ.unpack_from(body)[0]
+                if seq <= merge.last_seq.get(stream, 0):
+                    self.stats["duplicates"] += 1
+                else:
+                    # A full merge buffer stops this connection here (no read, no
+                    # ACK) unless the watermark is waiting on this very stream:
+                    # its batch is what lets the others' events out. Whatever
+                    # the watermark allows goes out right away; the tick
+                    # spills the oldest if that is not enough.
+                    if merge.full():
+                        merge.release(spill=False)
+                    while merge.full() and not merge.lagging(stream):
+                        await merge.wait_changed(self.tick)
+                    events = [_loads(line) for line in body[SEQ.size:].splitlines() if line]
+                    merge.add(stream, host, events)
+                    if merge.full():
+                        merge.release(spill=False)
+                    merge.last_seq[stream] = seq
+                    self.stats["batches"] += 1
+                    self.stats["events"] += len(events)
+                writer.write(frame(T_ACK, SEQ.pack(seq)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            if merge is not None and stream in merge.streams:
+                merge.streams[stream][3] = False
+            writer.close()
+            self._writers.discard(writer)
+            self._handlers.discard(task)
+
+    async def close(self) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+        if self._server is not None:
+            self._server.close()
+        # closing the transports ends every handler at its next read
+        for w in list(self._writers):
+            w.close()
+        await asyncio.gather(*list(self._handlers), return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        for m in self.sessions.values():
+            m.close()
+
+
+async def serve(args) -> None:
+    col = Collector(Path(args.out_dir), max_delay=args.max_delay, max_buffer=args.max_buffer)
+    host, port = await col.start(args.host, args.port)
+    print(f"Collecting on {host}:{port} into {col.out_dir}{os.sep}<session>.jsonl")
+    try:
+        while True:
+            await asyncio.sleep(args.report)
+            for name, m in col.sessions.items():
+                live = sum(1 for st in m.streams.values() if st[3])
+                print(f"[{name}] hosts={live}/{len(m.streams)} written={m.written} late={m.late} {col.stats}")
+    finally:
+        await col.close()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Collect net.py event streams from several hosts.")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--out-dir", default="collected", help="Directory for <session>.jsonl (default: collected)")
+    ap.add_argument("--max-delay", type=float, default=5.0,
+                    help="Seconds a silent host may hold back the merge (default: 5)")
+    ap.add_argument("--max-buffer", type=int, default=100_000,
+                    help="Unreleased events per session before clients are pushed back (default: 100000)")
+    ap.add_argument("--report", type=float, default=30.0, help="Seconds between status lines (default: 30)")
+    args = ap.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
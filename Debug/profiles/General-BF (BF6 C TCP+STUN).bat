@@ -1,18 +1,12 @@
 @echo off
 chcp 65001 > nul
 :: 65001 - UTF-8
+:: The profile itself is Debug\launch\General-BF (BF6 C TCP+STUN).json; launcher.py compiles and caches it
 
-cd /d "%~dp0"
+cd /d "%~dp0..\..\"
 call service.bat status_zapret
 call service.bat check_updates
 echo:
 
-set "BIN=%~dp0bin\"
-set "LISTS=%~dp0lists\"
-cd /d %BIN%
-
-:: C: TCP set + UDP STUN (3478-3481)
-start "zapret: %~n0" /min "%BIN%winws.exe" --wf-raw=@"%~dp0..\filters\wf-bf6-C.txt" ^
---filter-tcp=443,80,8095,9000,10010,15013,2053,2083,2087,2096,8443 --dpi-desync=fake,split2 --dpi-desync-autottl=2 --dpi-desync-repeats=6 --dpi-desync-fooling=badseq --dpi-desync-badseq-increment=2 --dpi-desync-cutoff=n2 --new ^
---filter-udp=3478-3481 --dpi-desync=fake --dpi-desync-repeats=7 --dpi-desync-cutoff=n2
-
+python Debug\tools\launcher.py run "%~n0"
+if errorlevel 1 pause
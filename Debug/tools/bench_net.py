@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Benchmark the net.py poll loop against a synthetic socket table.
+
+psutil.net_connections / Process / process_iter are swapped for a generator
+that keeps N sockets alive and, every tick, replaces a share of them (churn),
+flips the status of others (flapping) and recycles PIDs under a new process
+identity (PID reuse). net.py's own main() is then driven for --ticks ticks with
+--interval 0; the generator raises KeyboardInterrupt afterwards, which takes
+the regular stop path (final rDNS drain, log flush).
+
+Reported: per-tick latency percentiles (time spent in net.py between two
+net_connections calls, generation excluded), peak RSS, net allocated blocks
+per tick (and traced bytes per tick with --tracemalloc), events and bytes
+written. Results are saved as JSON; --compare prints the change against an
+earlier result file.
+
+Examples:
+  python bench_net.py --sockets 50000 --churn 0.02 --ticks 50 --out before.json
+  python bench_net.py --sockets 50000 --churn 0.02 --ticks 50 --compare before.json -- --format bin
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "Debug"))
+
+import net  # noqa: E402
+
+psutil = net.psutil
+REAL_PROCESS = psutil.Process
+
+# Same shapes psutil returns
+addr = namedtuple("addr", ["ip", "port"])
+sconn = namedtuple("sconn", ["fd", "family", "type", "laddr", "raddr", "status", "pid"])
+
+TCP_STATES = ("ESTABLISHED", "SYN_SENT", "TIME_WAIT", "CLOSE_WAIT", "LISTEN")
+PROC_NAMES = ("bf6.exe", "chrome.exe", "svchost.exe", "EADesktop.exe", "Discord.exe", "steam.exe")
+
+
+class SyntheticNet:
+    """In-memory socket table that mutates a little on every call."""
+
+    def __init__(self, sockets: int, churn: float = 0.01, flap: float = 0.005, pid_reuse: float = 0.0,
+                 pids: int = 200, udp_share: float = 0.3, exe_cost_us: float = 0.0, seed: int = 1):
+        self.rnd = random.Random(seed)
+        self.churn = churn
+        self.flap = flap
+        self.pid_reuse = pid_reuse
+        self.udp_share = udp_share
+        self.exe_cost = exe_cost_us / 1e6
+        self.pid_list = list(range(1000, 1000 + pids * 4, 4))
+        # pid -> (name, exe, create_time); reuse swaps the identity behind a pid
+        self.procs: Dict[int, Tuple[str, str, float]] = {}
+        for pid in self.pid_list:
+            self._new_identity(pid)
+        self._port = 1024
+        self.table: List[sconn] = [self._new_conn() for _ in range(sockets)]
+        self.ticks = 0
+        self.limit = 0
+        self.enter: List[float] = []
+        self.exit: List[float] = []
+        self.rss: List[int] = []
+        self.blocks: List[int] = []
+        self.traced: List[int] = []
+
+    def _new_identity(self, pid: int) -> None:
+        name = self.rnd.choice(PROC_NAMES)
+        self.procs[pid] = (name, f"C:\\Program Files\\{name[:-4]}\\{name}", time.time() + self.rnd.random())
+
+    def _new_conn(self) -> sconn:
+        rnd = self.rnd
+        self._port = self._port + 1 if self._port < 65535 else 1024
+        pid = rnd.choice(self.pid_list)
+        v6 = rnd.random() < 0.2
+        fam = socket.AF_INET6 if v6 else socket.AF_INET
+        l_ip = "::" if v6 else f"192.168.1.{rnd.randint(2, 254)}"
+        if rnd.random() < self.udp_share:
+            return sconn(-1, fam, socket.SOCK_DGRAM, addr(l_ip, self._port), (), "NONE", pid)
+        r_ip = f"2a05:d01c::{rnd.randint(1, 0xffff):x}" if v6 else f"52.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}"
+        return sconn(-1, fam, socket.SOCK_STREAM, addr(l_ip, self._port), addr(r_ip, rnd.choice((443, 80, 3659, 10010))),
+                     rnd.choice(TCP_STATES), pid)
+
+    def _mutate(self) -> None:
+        rnd = self.rnd
+        n = len(self.table)
+        for _ in range(int(n * self.churn)):
+            self.table[rnd.randrange(n)] = self._new_conn()
+        for _ in range(int(n * self.flap)):
+            i = rnd.randrange(n)
+            c = self.table[i]
+            if c.type == socket.SOCK_STREAM:
+                self.table[i] = c._replace(status=rnd.choice(TCP_STATES))
+        for _ in range(int(len(self.pid_list) * self.pid_reuse)):
+            self._new_identity(rnd.choice(self.pid_list))
+
+    def net_connections(self, kind: str = "inet"):
+        now = time.perf_counter()
+        self.enter.append(now)
+        if self.ticks >= self.limit:
+            raise KeyboardInterrupt
+        self.rss.append(current_rss())
+        self.blocks.append(sys.getallocatedblocks())
+        if tracemalloc.is_tracing():
+            self.traced.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if self.ticks:
+            self._mutate()
+        self.ticks += 1
+        conns = list(self.table)
+        self.exit.append(time.perf_counter())
+        return conns
+
+    def process_class(self):
+        bench = self
+
+        class Process:
+            def __init__(self, pid: Optional[int] = None):
+                if pid is None:
+                    pid = os.getpid()
+                if pid not in bench.procs:
+                    raise psutil.NoSuchProcess(pid)
+                self.pid = pid
+                self._ident = bench.procs[pid]
+
+            def name(self) -> str:
+                return self._ident[0]
+
+            def exe(self) -> str:
+                if bench.exe_cost:
+                    # busy-wait: stands in for the expensive exe() query on Windows
+                    end = time.perf_counter() + bench.exe_cost
+                    while time.perf_counter() < end:
+                        pass
+                return self._ident[1]
+
+            def create_time(self) -> float:
+                return self._ident[2]
+
+        return Process
+
+    def process_iter_fn(self, process_class):
+        bench = self
+
+        def process_iter(attrs=None, ad_value=None):
+            for pid in list(bench.procs):
+                p = process_class(pid)
+                if attrs is not None:
+                    p.info = {"pid": pid}
+                    for a in attrs:
+                        if a != "pid":
+                            p.info[a] = getattr(p, a)()
+                yield p
+
+        return process_iter
+
+
+def current_rss() -> int:
+    try:
+        return REAL_PROCESS(os.getpid()).memory_info().rss
+    except Exception:
+        return 0
+
+
+def percentiles_ms(values: List[float]) -> Dict[str, float]:
+    out = {k: round(v * 1000.0, 3) for k, v in net.percentiles(values).items()}
+    if values:
+        out["mean"] = round(sum(values) / len(values) * 1000.0, 3)
+    return out
+
+
+def git_revision() -> Optional[str]:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "Debug"], cwd=ROOT, capture_output=True, text=True)
+        return rev.stdout.strip() + ("+dirty" if dirty.stdout.strip() else "")
+    except Exception:
+        return None
+
+
+def run_bench(args) -> dict:
+    syn = SyntheticNet(args.sockets, churn=args.churn, flap=args.flap, pid_reuse=args.pid_reuse,
+                       pids=args.pids, udp_share=args.udp_share, exe_cost_us=args.exe_cost_us, seed=args.seed)
+    syn.limit = args.ticks
+    net_args = [a for a in args.net_args if a != "--"]
+
+    orig = (psutil.net_connections, psutil.Process, psutil.process_iter)
+    with tempfile.TemporaryDirectory(prefix="bench_net_") as tmp:
+        log_path = Path(tmp) / "bench.log"
+        psutil.net_connections = syn.net_connections
+        psutil.Process = syn.process_class()
+        psutil.process_iter = syn.process_iter_fn(psutil.Process)
+        if args.tracemalloc:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        try:
+            rc = net.main(["--log", str(log_path), "--interval", "0", "--no-dns", "--stats-interval", "0",
+                           "--backend", "psutil"] + net_args)
+        finally:
+            wall = time.perf_counter() - t0
+            if args.tracemalloc:
+                tracemalloc.stop()
+            psutil.net_connections, psutil.Process, psutil.process_iter = orig
+        written = sum(p.stat().st_size for p in Path(tmp).iterdir())
+        events = 0
+        try:
+            from netbin import iter_events
+            events = sum(1 for p in sorted(Path(tmp).iterdir()) for _ in iter_events(p))
+        except Exception:
+            pass
+
+    # Work done by net.py between handing out conns and asking for the next tick
+    ticks = [syn.enter[i + 1] - syn.exit[i] for i in range(len(syn.exit)) if i + 1 < len(syn.enter)]
+    blocks = [syn.blocks[i + 1] - syn.blocks[i] for i in range(len(syn.blocks) - 1)]
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {
+            "sockets": args.sockets, "churn": args.churn, "flap": args.flap, "pid_reuse": args.pid_reuse,
+            "pids": args.pids, "udp_share": args.udp_share, "exe_cost_us": args.exe_cost_us,
+            "ticks": args.ticks, "seed": args.seed, "net_args": net_args,
+        },
+        "exit_code": rc,
+        "wall_s": round(wall, 3),
+        "first_tick_ms": round(ticks[0] * 1000.0, 3) if ticks else None,
+        "tick_ms": percentiles_ms(ticks[1:]),
+        "peak_rss_mb": round(max(syn.rss + [current_rss()]) / (1024 * 1024), 1),
+        "alloc_blocks_per_tick": net.percentiles(blocks[1:]),
+        "traced_peak_bytes_per_tick": net.percentiles(syn.traced[2:]) if syn.traced else None,
+        "events_written": events,
+        "bytes_written": written,
+    }
+
+
+def compare(cur: dict, old: dict) -> None:
+    def pct(a, b):
+        return f"{(a - b) / b * 100:+.1f}%" if b else "n/a"
+
+    print(f"\nvs {old.get('revision')}:")
+    for k in ("p50", "p90", "p99", "max", "mean"):
+        a, b = cur["tick_ms"].get(k), old.get("tick_ms", {}).get(k)
+        if a is not None and b is not None:
+            print(f"  tick {k:>4}: {b:10.3f} -> {a:10.3f} ms  {pct(a, b)}")
+    for k in ("first_tick_ms", "peak_rss_mb", "bytes_written", "wall_s"):
+        a, b = cur.get(k), old.get(k)
+        if a is not None and b is not None:
+            print(f"  {k:>13}: {b} -> {a}  {pct(a, b)}")
+    if cur["params"] != old.get("params"):
+        print("  [WARN] parameters differ between runs")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark the net.py poll loop on a synthetic socket table.")
+    ap.add_argument("--sockets", type=int, default=10000, help="Live sockets per tick (default: 10000)")
+    ap.add_argument("--churn", type=float, default=0.01, help="Share of sockets replaced per tick (default: 0.01)")
+    ap.add_argument("--flap", type=float, default=0.005, help="Share of sockets changing TCP status per tick (default: 0.005)")
+    ap.add_argument("--pid-reuse", type=float, default=0.0, help="Share of PIDs recycled per tick (default: 0)")
+    ap.add_argument("--pids", type=int, default=200, help="Distinct owning PIDs (default: 200)")
+    ap.add_argument("--udp-share", type=float, default=0.3, help="Share of UDP sockets (default: 0.3)")
+    ap.add_argument("--exe-cost-us", type=float, default=0.0, help="Simulated cost of Process.exe() in microseconds (default: 0)")
+    ap.add_argument("--ticks", type=int, default=30, help="Ticks to run (default: 30)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--tracemalloc", action="store_true", help="Also trace allocated bytes per tick (slow)")
+    ap.add_argument("--out", type=str, default=None, help="Save results as JSON")
+    ap.add_argument("--compare", type=str, default=None, help="Compare against an earlier results JSON")
+    ap.add_argument("net_args", nargs=argparse.REMAINDER, help="Extra net.py arguments after --")
+    args = ap.parse_args(argv)
+
+    res = run_bench(args)
+    print(json.dumps(res, indent=2))
+    if args.out:
+        Path(args.out).write_text(json.dumps(res, indent=2) + "\n", encoding="utf-8")
+    if args.compare:
+        compare(res, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+    return 0 if res["exit_code"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+Compiled, cached winws launcher for declarative profiles.
+
+A profile is a JSON file in Debug/launch:
+
+  {
+    "name": "General-BF",
+    "filter": "outbound and (... udp.SrcPort >= {START_PORT} and udp.SrcPort <= {END_PORT} ...)",
+    "sections": [
+      ["--filter-tcp=443", "--hostlist={LISTS}list-general.txt", "--dpi-desync=fake,multidisorder"],
+      ["--filter-udp=*", "--dpi-desync=fake", "--dpi-desync-fake-unknown-udp={BIN}quic_initial_www_google_com.bin"]
+    ]
+  }
+
+"filter_file" (path relative to the repo root) can be used instead of an
+inline "filter". Placeholders: {ROOT} {BIN} {LISTS} {START_PORT} {END_PORT};
+the ports come from the first line of lists/port-bf.txt (default 65530-65535).
+Sections are joined with --new. The General-BF*.bat files in the root and in
+Debug/profiles* only call "launcher.py run" with their own name, so the JSON
+here is the one definition of every profile.
+
+Compiling substitutes the placeholders, checks the filter with wfilter and
+writes the filter file and argv into the cache, keyed by the SHA-256 of the
+profile, port-bf.txt and every list/filter/fake file the profile references.
+A per-profile stamp keeps (size, mtime) of those inputs, so a relaunch with
+nothing changed is a few stat() calls plus one small JSON read: no list
+parsing, no filter generation, no temp file rewrite.
+
+Examples:
+  python launcher.py run handshake
+  python launcher.py run General-BF --dry-run
+  python launcher.py import-bat old-profile.bat
+  python launcher.py list
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from wfilter import FilterSyntaxError, parse
+
+ROOT = Path(__file__).resolve().parents[2]
+BIN = ROOT / "bin"
+LISTS = ROOT / "lists"
+FILTERS = ROOT / "Debug" / "filters"
+PROFILES = ROOT / "Debug" / "launch"
+PORT_FILE = LISTS / "port-bf.txt"
+
+DEFAULT_RANGE = (65530, 65535)
+# Bump when the compiled output format changes; old cache entries are ignored
+CACHE_VERSION = 1
+
+_PLACEHOLDER = re.compile(r"\{(ROOT|BIN|LISTS|START_PORT|END_PORT)\}")
+
+
+class ProfileError(ValueError):
+    pass
+
+
+def default_cache_dir() -> Path:
+    base = os.getenv("LOCALAPPDATA") or os.getenv("TEMP") or os.getenv("TMP") or tempfile.gettempdir()
+    return Path(base) / "zapret-bf" / "launch"
+
+
+def parse_range(text: str) -> Tuple[int, int]:
+    """First non-empty line of port-bf.txt: "a-b" or a single port."""
+    for line in text.splitlines():
+        s = line.strip()
+        if not s:
+            continue
+        try:
+            if "-" in s:
+                a, b = s.split("-", 1)
+                return int(a), int(b)
+            v = int(s)
+            return v, v
+        except ValueError:
+            break
+    return DEFAULT_RANGE
+
+
+def resolve_profile(name: str) -> Path:
+    p = Path(name)
+    if p.suffix.lower() == ".json" and p.exists():
+        return p.resolve()
+    cand = PROFILES / (name if name.endswith(".json") else name + ".json")
+    if cand.exists():
+        return cand
+    raise ProfileError(f"profile not found: {name} (looked in {PROFILES})")
+
+
+def load_profile(path: Path) -> dict:
+    try:
+        prof = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as e:
+        raise ProfileError(f"{path.name}: {e}")
+    if not isinstance(prof, dict):
+        raise ProfileError(f"{path.name}: expected a JSON object")
+    if ("filter" in prof) == ("filter_file" in prof):
+        raise ProfileError(f"{path.name}: needs exactly one of 'filter' or 'filter_file'")
+    sections = prof.get("sections")
+    if not isinstance(sections, list) or not sections or not all(
+            isinstance(s, list) and all(isinstance(a, str) for a in s) for s in sections):
+        raise ProfileError(f"{path.name}: 'sections' must be a non-empty list of argument lists")
+    prof.setdefault("name", path.stem)
+    return prof
+
+
+def substitute(text: str, env: Dict[str, str]) -> str:
+    return _PLACEHOLDER.sub(lambda m: env[m.group(1)], text)
+
+
+def path_env(start: int = 0, end: int = 0) -> Dict[str, str]:
+    return {"ROOT": str(ROOT) + os.sep, "BIN": str(BIN) + os.sep, "LISTS": str(LISTS) + os.sep,
+            "START_PORT": str(start), "END_PORT": str(end)}
+
+
+def referenced_files(prof: dict) -> List[Path]:
+    """Files whose content the compiled result depends on, besides the profile and port-bf.txt."""
+    env = path_env()
+    out: List[Path] = []
+    if "filter_file" in prof:
+        out.append(ROOT / prof["filter_file"])
+    for section in prof["sections"]:
+        for arg in section:
+            if "=" not in arg or "{" not in arg:
+                continue
+            p = Path(substitute(arg.split("=", 1)[1], env))
+            if p.is_file():
+                out.append(p)
+    return sorted(set(out))
+
+
+# --- cache -----------------------------------------------------------------
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _stat(path: Path) -> Optional[List[int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class LaunchCache:
+    """Compiled profiles under cache_dir: <key>.json (argv) + <key>.wf.txt, and <name>.stamp.json."""
+
+    def __init__(self, cache_dir: Path):
+        self.dir = cache_dir
+
+    def _stamp_path(self, profile_path: Path) -> Path:
+        tag = hashlib.sha256(str(profile_path).encode("utf-8")).hexdigest()[:16]
+        return self.dir / f"{profile_path.stem}.{tag}.stamp.json"
+
+    def _read_json(self, path: Path) -> Optional[dict]:
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def fast_lookup(self, profile_path: Path) -> Optional[dict]:
+        """Entry for an unchanged profile, judged by (size, mtime) of every recorded input."""
+        stamp = self._read_json(self._stamp_path(profile_path))
+        if not stamp or stamp.get("version") != CACHE_VERSION:
+            return None
+        for p, (size, mtime, _) in stamp["inputs"].items():
+            if (_stat(Path(p)) or [-1, -1]) != [size, mtime]:
+                return None
+        return self._entry(stamp["key"])
+
+    def _entry(self, key: str) -> Optional[dict]:
+        entry = self._read_json(self.dir / f"{key}.json")
+        if entry and Path(entry["filter_path"]).exists():
+            return entry
+        return None
+
+    def lookup(self, profile_path: Path, force: bool = False) -> Tuple[dict, bool]:
+        """(entry, cached). Hashes inputs whose stamp changed and compiles on a key miss."""
+        if not force:
+            hit = self.fast_lookup(profile_path)
+            if hit is not None:
+                return hit, True
+
+        old = self._read_json(self._stamp_path(profile_path)) or {}
+        old_inputs = old.get("inputs", {}) if old.get("version") == CACHE_VERSION else {}
+        prof = load_profile(profile_path)
+        inputs: Dict[str, list] = {}
+        for p in [profile_path, PORT_FILE] + referenced_files(prof):
+            st = _stat(p)
+            if st is None:
+                # missing port-bf.txt falls back to the default range; recorded so that creating it invalidates
+                inputs[str(p)] = [-1, -1, ""]
+                continue
+            prev = old_inputs.get(str(p))
+            sha = prev[2] if prev and prev[:2] == st else file_sha256(p)
+            inputs[str(p)] = st + [sha]
+
+        h = hashlib.sha256(f"v{CACHE_VERSION}\n".encode())
+        for p, (_, _, sha) in sorted(inputs.items()):
+            h.update(f"{p}\0{sha}\n".encode("utf-8"))
+        key = h.hexdigest()[:32]
+
+        self.dir.mkdir(parents=True, exist_ok=True)
+        entry = None if force else self._entry(key)
+        cached = entry is not None
+        if entry is None:
+            entry = self._compile(prof, key)
+        stamp = {"version": CACHE_VERSION, "profile": str(profile_path), "key": key, "inputs": inputs}
+        _write_atomic(self._stamp_path(profile_path), json.dumps(stamp, indent=1).encode("utf-8"))
+        return entry, cached
+
+    def _compile(self, prof: dict, key: str) -> dict:
+        try:
+            text = PORT_FILE.read_text(encoding="utf-8")
+        except OSError:
+            text = ""
+        start, end = parse_range(text)
+        env = path_env(start, end)
+        if "filter" in prof:
+            expr = prof["filter"]
+        else:
+            expr = (ROOT / prof["filter_file"]).read_text(encoding="utf-8")
+        expr = substitute(expr, env)
+        if not expr.isascii():
+            pos, ch = next((i, c) for i, c in enumerate(expr) if ord(c) > 127)
+            raise ProfileError(f"{prof['name']}: filter has a non-ASCII character {ch!r} at offset {pos}")
+        try:
+            parse(expr)
+        except FilterSyntaxError as e:
+            raise ProfileError(f"{prof['name']}: bad filter: {e}")
+
+        filter_path = self.dir / f"{key}.wf.txt"
+        _write_atomic(filter_path, expr.encode("ascii"))
+        argv = [str(BIN / "winws.exe"), f"--wf-raw=@{filter_path}"]
+        for i, section in enumerate(prof["sections"]):
+            if i:
+                argv.append("--new")
+            argv.extend(substitute(a, env) for a in section)
+        entry = {"name": prof["name"], "key": key, "ports": [start, end],
+                 "filter_path": str(filter_path), "argv": argv}
+        _write_atomic(self.dir / f"{key}.json", json.dumps(entry, indent=1).encode("utf-8"))
+        return entry
+
+
+# --- launching -------------------------------------------------------------
+
+def launch(entry: dict) -> int:
+    winws = Path(entry["argv"][0])
+    if not winws.exists():
+        print("winws.exe not found in bin/", file=sys.stderr)
+        return 2
+    # Launch detached to avoid blocking
+    DETACHED_PROCESS = 0x00000008
+    try:
+        subprocess.Popen(entry["argv"], cwd=str(BIN), creationflags=DETACHED_PROCESS)
+        print(f"Launched winws.exe ({entry['name']}) with", entry["filter_path"])
+        return 0
+    except Exception as e:
+        print("Failed to launch winws:", e, file=sys.stderr)
+        return 1
+
+
+def run_profile(name: str, dry_run: bool = False, cache_dir: Optional[Path] = None, force: bool = False) -> int:
+    try:
+        path = resolve_profile(name)
+        entry, cached = LaunchCache(cache_dir or default_cache_dir()).lookup(path, force)
+    except (ProfileError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    if dry_run:
+        print(f"[{'cached' if cached else 'compiled'}] {entry['name']} key={entry['key']} "
+              f"ports={entry['ports'][0]}-{entry['ports'][1]}", file=sys.stderr)
+        print(subprocess.list2cmdline(entry["argv"]))
+        return 0
+    return launch(entry)
+
+
+# --- .bat import -----------------------------------------------------------
+
+_BAT_VARS = (("%BIN_ROOT%", "{BIN}"), ("%BIN%", "{BIN}"), ("%LISTS%", "{LISTS}"))
+
+
+def _bat_args(line: str) -> List[str]:
+    out = []
+    for tok in re.findall(r'(?:[^\s"]+|"[^"]*")+', line):
+        tok = tok.replace('"', "")
+        for var, ph in _BAT_VARS:
+            tok = tok.replace(var, ph)
+        out.append(tok)
+    return out
+
+
+def profile_from_bat(path: Path) -> dict:
+    """Declarative profile equivalent to a General-BF style .bat."""
+    text = path.read_text(encoding="utf-8", errors="replace")
+    m = re.search(r'winws\.exe"\s+--wf-raw=@"([^"]+)"(.*?)(?:\n\s*\n|\Z)', text.replace("^\r\n", "^\n"), re.S)
+    if not m:
+        raise ProfileError(f"{path.name}: no winws.exe --wf-raw=@file start line")
+    ref, rest = m.group(1), m.group(2)
+    prof: dict = {"name": path.stem}
+    if "%WF_TMP%" in ref:
+        em = re.search(r'^\s*echo\s+(.*?)\s*>\s*"%WF_TMP%"\s*$', text, re.M)
+        if not em:
+            raise ProfileError(f"{path.name}: filter is written to %WF_TMP% but no echo line found")
+        expr = re.sub(r"\^(.)", r"\1", em.group(1))
+        for var in ("START_PORT", "END_PORT"):
+            expr = expr.replace(f"!{var}!", "{%s}" % var).replace(f"%{var}%", "{%s}" % var)
+        prof["filter"] = expr
+    else:
+        name = re.split(r"[\\/]+|%\w+%", ref)[-1]
+        prof["filter_file"] = (FILTERS / name).relative_to(ROOT).as_posix()
+        if not (ROOT / prof["filter_file"]).exists():
+            raise ProfileError(f"{path.name}: filter file {name} not found in {FILTERS}")
+    args = _bat_args(rest.replace("^\n", " "))
+    sections: List[List[str]] = [[]]
+    for a in args:
+        if a == "--new":
+            sections.append([])
+        else:
+            sections[-1].append(a)
+    prof["sections"] = [s for s in sections if s]
+    return prof
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Compile, cache and launch declarative winws profiles.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("run", help="Launch a profile (compiled once, cached by content hash)")
+    r.add_argument("profile", help=f"Profile name in {PROFILES.relative_to(ROOT)} or path to a .json")
+    r.add_argument("--dry-run", action="store_true", help="Print the winws command line instead of launching")
+    r.add_argument("--force", action="store_true", help="Recompile even if a cached entry matches")
+    r.add_argument("--cache-dir", type=str, default=None, help=f"Cache directory (default: {default_cache_dir()})")
+
+    i = sub.add_parser("import-bat", help="Convert old-style .bat profiles into JSON definitions")
+    i.add_argument("bats", nargs="+")
+    i.add_argument("--out-dir", type=str, default=str(PROFILES))
+
+    sub.add_parser("list", help="List available profiles")
+
+    args = ap.parse_args(argv)
+    if args.cmd == "run":
+        return run_profile(args.profile, args.dry_run, Path(args.cache_dir) if args.cache_dir else None, args.force)
+    if args.cmd == "list":
+        for p in sorted(PROFILES.glob("*.json")):
+            print(p.stem)
+        return 0
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rc = 0
+    for b in args.bats:
+        try:
+            prof = profile_from_bat(Path(b))
+        except (ProfileError, OSError) as e:
+            print(f"[WARN] {e}", file=sys.stderr)
+            rc = 1
+            continue
+        dst = out_dir / f"{prof['name']}.json"
+        dst.write_text(json.dumps(prof, indent=2) + "\n", encoding="utf-8")
+        print(f"{b} -> {dst}")
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
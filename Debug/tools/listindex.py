@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Deduplicate/aggregate lists/ hostlists and ipsets and query them in batches.
+
+winws loads list-general.txt and ipset-all.txt as-is: repeated lines,
+subdomains of a listed domain (a hostlist entry already matches all of its
+subdomains) and adjacent or nested CIDRs all cost load time and memory.
+
+Domains go into a reversed-label suffix trie (com -> discord -> cdn). A listed
+domain turns its node into a leaf and drops everything below it, so the trie
+only ever holds the minimal set and a lookup walks at most one node per label.
+`^domain` entries (exact match only) are kept as such unless a parent covers
+them.
+
+Addresses are kept as integer intervals per family; aggregation sorts and
+merges them and re-splits every merged interval into the fewest aligned CIDR
+blocks (nested, duplicate and adjacent prefixes collapse, e.g. two /25 halves
+become one /24). Lookups use the aggregated blocks as a level-compressed radix
+table: one hash probe per distinct prefix length present in the list.
+
+Examples:
+  python listindex.py compact ../../lists/list-general.txt
+  python listindex.py compact ../../lists/ipset-all.txt --write
+  python listindex.py match ../../lists/list-general.txt cdn.discordapp.com example.org
+  type hosts.txt | python listindex.py match ../../lists/list-general.txt -
+"""
+
+import argparse
+import socket
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+LISTS = ROOT / "lists"
+
+# Trie node markers
+LEAF = 0     # node covers itself and every subdomain
+EXACT = object()  # key inside a dict node: this exact name is listed (never equal to a label)
+
+
+def _strip(line: str) -> str:
+    line = line.split("#", 1)[0].strip()
+    return line
+
+
+# --- domains ---------------------------------------------------------------
+
+def normalize_host(host: str) -> str:
+    return host.strip().lower().rstrip(".")
+
+
+class DomainTrie:
+    """Reversed-label suffix trie with hostlist semantics (an entry matches its subdomains)."""
+
+    def __init__(self):
+        self.root: dict = {}
+        self.order: Dict[str, int] = {}  # entry -> first-seen index, to keep the file order on output
+        self.lines = 0
+
+    def add(self, entry: str) -> None:
+        self.lines += 1
+        exact = entry.startswith("^")
+        name = normalize_host(entry[1:] if exact else entry)
+        if not name:
+            return
+        node = self.root
+        labels = name.split(".")
+        for i in range(len(labels) - 1, 0, -1):
+            nxt = node.get(labels[i])
+            if nxt is LEAF:
+                return  # a parent domain is listed already
+            if nxt is None:
+                nxt = node[labels[i]] = {}
+            node = nxt
+        last = labels[0]
+        cur = node.get(last)
+        if cur is LEAF:
+            return
+        if exact:
+            if cur is None:
+                cur = node[last] = {}
+            cur[EXACT] = True
+        else:
+            node[last] = LEAF
+        key = ("^" if exact else "") + name
+        self.order.setdefault(key, len(self.order))
+
+    def match(self, host: str) -> bool:
+        node = self.root
+        labels = normalize_host(host).split(".")
+        for i in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[i])
+            if node is None:
+                return False
+            if node is LEAF:
+                return True
+        return EXACT in node
+
+    def match_many(self, hosts: Iterable[str]) -> List[bool]:
+        return [self.match(h) for h in hosts]
+
+    def entries(self) -> Iterator[str]:
+        """Minimal entries, unordered (depth-first)."""
+        stack: List[Tuple[dict, Tuple[str, ...]]] = [(self.root, ())]
+        while stack:
+            node, path = stack.pop()
+            for label, child in node.items():
+                if label is EXACT:
+                    yield "^" + ".".join(reversed(path))
+                elif child is LEAF:
+                    yield ".".join(reversed(path + (label,)))
+                else:
+                    stack.append((child, path + (label,)))
+
+    def minimal(self, sort: bool = False) -> List[str]:
+        out = list(self.entries())
+        if sort:
+            out.sort(key=lambda e: e.lstrip("^").split(".")[::-1])
+        else:
+            out.sort(key=lambda e: self.order.get(e, 0))
+        return out
+
+
+# --- addresses -------------------------------------------------------------
+
+def parse_ip(text: str) -> Optional[Tuple[int, int]]:
+    """(version, int) of a literal address, or None."""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, text.split("%", 1)[0]), "big")
+    except OSError:
+        return None
+
+
+def parse_ip_entry(entry: str) -> Optional[Tuple[int, int, int]]:
+    """(version, lo, hi) for "addr", "addr/len" or "addr1-addr2"."""
+    if "-" in entry:
+        a, b = entry.split("-", 1)
+        pa, pb = parse_ip(a.strip()), parse_ip(b.strip())
+        if pa is None or pb is None or pa[0] != pb[0] or pa[1] > pb[1]:
+            return None
+        return pa[0], pa[1], pb[1]
+    addr, _, plen = entry.partition("/")
+    p = parse_ip(addr)
+    if p is None:
+        return None
+    ver, val = p
+    bits = 32 if ver == 4 else 128
+    try:
+        n = int(plen) if plen else bits
+    except ValueError:
+        return None
+    if not 0 <= n <= bits:
+        return None
+    host = (1 << (bits - n)) - 1
+    lo = val & ~host
+    return ver, lo, lo | host
+
+
+def range_to_cidrs(lo: int, hi: int, bits: int) -> Iterator[Tuple[int, int]]:
+    """Fewest aligned (network, prefix_len) blocks covering [lo, hi]."""
+    while lo <= hi:
+        size = (lo & -lo).bit_length() - 1 if lo else bits
+        while lo + (1 << size) - 1 > hi:
+            size -= 1
+        yield lo, bits - size
+        lo += 1 << size
+
+
+def format_cidr(ver: int, net: int, plen: int) -> str:
+    if ver == 4:
+        addr = socket.inet_ntop(socket.AF_INET, net.to_bytes(4, "big"))
+        return f"{addr}/{plen}"
+    addr = socket.inet_ntop(socket.AF_INET6, net.to_bytes(16, "big"))
+    return f"{addr}/{plen}"
+
+
+class PrefixSet:
+    """IPv4/IPv6 prefixes with aggregation and longest-prefix style membership."""
+
+    def __init__(self):
+        self.ranges: Dict[int, List[Tuple[int, int]]] = {4: [], 6: []}
+        self.lines = 0
+        self._table: Optional[Dict[int, List[Tuple[int, int, set]]]] = None
+
+    def add(self, entry: str) -> bool:
+        self.lines += 1
+        r = parse_ip_entry(entry)
+        if r is None:
+            return False
+        self.ranges[r[0]].append((r[1], r[2]))
+        self._table = None
+        return True
+
+    def merged(self, ver: int) -> List[Tuple[int, int]]:
+        out: List[Tuple[int, int]] = []
+        for lo, hi in sorted(self.ranges[ver]):
+            if out and lo <= out[-1][1] + 1:
+                if hi > out[-1][1]:
+                    out[-1] = (out[-1][0], hi)
+            else:
+                out.append((lo, hi))
+        return out
+
+    def cidrs(self, ver: int) -> List[Tuple[int, int]]:
+        bits = 32 if ver == 4 else 128
+        return [c for lo, hi in self.merged(ver) for c in range_to_cidrs(lo, hi, bits)]
+
+    def minimal(self) -> List[str]:
+        return [format_cidr(v, n, p) for v in (4, 6) for n, p in self.cidrs(v)]
+
+    def _build(self) -> Dict[int, List[Tuple[int, int, set]]]:
+        # per family: (prefix_len, shift, {network >> shift}) for each length present
+        table: Dict[int, List[Tuple[int, int, set]]] = {}
+        for ver, bits in ((4, 32), (6, 128)):
+            by_len: Dict[int, set] = {}
+            for net, plen in self.cidrs(ver):
+                by_len.setdefault(plen, set()).add(net >> (bits - plen))
+            table[ver] = [(plen, bits - plen, nets) for plen, nets in sorted(by_len.items())]
+        return table
+
+    def match(self, ip: str) -> bool:
+        if self._table is None:
+            self._table = self._build()
+        p = parse_ip(ip.strip())
+        if p is None:
+            return False
+        ver, val = p
+        for _, shift, nets in self._table[ver]:
+            if (val >> shift) in nets:
+                return True
+        return False
+
+    def match_many(self, ips: Iterable[str]) -> List[bool]:
+        return [self.match(ip) for ip in ips]
+
+
+# --- files -----------------------------------------------------------------
+
+def read_entries(path: Path) -> List[str]:
+    with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+        return [e for e in (_strip(line) for line in f) if e]
+
+
+def is_ipset(entries: List[str], sample: int = 64) -> bool:
+    head = entries[:sample]
+    return bool(head) and all(parse_ip_entry(e) is not None for e in head)
+
+
+def load_index(path: Path):
+    """DomainTrie or PrefixSet for a list file, picked by its content."""
+    entries = read_entries(path)
+    if is_ipset(entries):
+        idx = PrefixSet()
+        bad = [e for e in entries if not idx.add(e)]
+        if bad:
+            print(f"[WARN] {path.name}: {len(bad)} unparsable line(s), e.g. {bad[0]!r}", file=sys.stderr)
+        return idx
+    trie = DomainTrie()
+    for e in entries:
+        trie.add(e)
+    return trie
+
+
+def resolve_list(name: str) -> Path:
+    p = Path(name)
+    if not p.exists() and (LISTS / name).exists():
+        p = LISTS / name
+    return p
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Deduplicate/aggregate hostlists and ipsets, batch-match hosts and IPs.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    c = sub.add_parser("compact", help="Print (or write) the minimal equivalent list")
+    c.add_argument("list", help="List file (path or name inside lists/)")
+    c.add_argument("--write", action="store_true", help="Rewrite the list in place")
+    c.add_argument("-o", "--out", type=str, default=None, help="Write to this file instead")
+    c.add_argument("--sort", action="store_true", help="Sort domains by reversed labels instead of keeping file order")
+
+    m = sub.add_parser("match", help="Print which hosts/IPs the list matches")
+    m.add_argument("list")
+    m.add_argument("items", nargs="+", help="Hosts or IPs; '-' reads one per line from stdin")
+    m.add_argument("--only-matches", action="store_true")
+
+    args = ap.parse_args(argv)
+    path = resolve_list(args.list)
+    try:
+        idx = load_index(path)
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    if args.cmd == "compact":
+        out = idx.minimal() if isinstance(idx, PrefixSet) else idx.minimal(sort=args.sort)
+        text = "".join(e + "\n" for e in out)
+        print(f"{path.name}: {idx.lines} -> {len(out)} entries", file=sys.stderr)
+        dst = path if args.write else (Path(args.out) if args.out else None)
+        if dst is None:
+            sys.stdout.write(text)
+        else:
+            dst.write_text(text, encoding="utf-8")
+        return 0
+
+    items = [i for raw in args.items for i in (sys.stdin.read().split() if raw == "-" else [raw])]
+    hits = idx.match_many(items)
+    for item, hit in zip(items, hits):
+        if hit or not args.only_matches:
+            print(f"{'match' if hit else '-':<5} {item}")
+    return 0 if any(hits) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
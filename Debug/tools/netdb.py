@@ -0,0 +1,529 @@
+#!/usr/bin/env python3
+"""
+Load net.py captures into an indexed SQLite store and query it.
+
+ingest reads JSONL or netbin captures (plain/.gz/.zst) into one database:
+sessions (one per "start" event), connection events, markers, rDNS answers
+and marker windows (F1 up to the next F2, or --window seconds at most).
+Rows go in through executemany() in batches, one transaction per batch, with
+WAL on so queries can run while a capture is being ingested.
+
+Ingest is incremental: for every file the database remembers how many bytes
+were loaded and a fingerprint of its head. A growing plain JSONL log is read
+from that offset on (only complete lines; a half-written last line is picked
+up next time); binary and compressed captures, which can't be appended to,
+are reloaded when their size or mtime changes. A file that shrank or was
+replaced is reloaded from scratch.
+
+query filters on process, protocol, remote address/port, time and the last N
+marker windows, and groups by remote endpoint (default), remote IP, remote
+port or process. Lookups hit indexes on time, process, remote IP and port,
+and session+time for the windows.
+
+Examples:
+  python netdb.py ingest netlog_*.jsonl
+  python netdb.py query --process bf6.exe --proto udp --last-windows 20
+  python netdb.py query --remote-ip 52.1.2.3 --group none --limit 50
+  python netdb.py query --since 7d --group process
+  python netdb.py windows --last 20
+  python netdb.py sql "SELECT COUNT(*) FROM conns"
+"""
+
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Optional faster JSON decoder
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "Debug"))
+
+from netbin import MAGIC, epoch_to_ts, iter_events, ts_to_epoch  # noqa: E402
+from port_learn import expand  # noqa: E402
+
+DEFAULT_DB = "netlog.db"
+SCHEMA_VERSION = 1
+HEAD_BYTES = 4096  # fingerprinted to notice a log replaced under the same name
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    offset INTEGER NOT NULL,       -- bytes loaded (plain JSONL), else size at load
+    head_len INTEGER NOT NULL,
+    head_sha TEXT NOT NULL,
+    session INTEGER                -- session the next events belong to
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    host TEXT,
+    start_ts INTEGER,
+    stop_ts INTEGER,
+    open_window INTEGER            -- window waiting for its end marker
+);
+CREATE TABLE IF NOT EXISTS procs (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    exe TEXT,
+    UNIQUE (name, exe)
+);
+CREATE TABLE IF NOT EXISTS conns (
+    session INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    proto TEXT,
+    family TEXT,
+    status TEXT,
+    pid INTEGER,
+    proc INTEGER,
+    l_ip TEXT,
+    l_port INTEGER,
+    r_ip TEXT,
+    r_port INTEGER
+);
+CREATE TABLE IF NOT EXISTS markers (
+    session INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    marker TEXT,
+    label TEXT
+);
+CREATE TABLE IF NOT EXISTS windows (
+    id INTEGER PRIMARY KEY,
+    session INTEGER NOT NULL,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER NOT NULL,
+    label TEXT,
+    end_marker TEXT
+);
+CREATE TABLE IF NOT EXISTS rdns (
+    ip TEXT PRIMARY KEY,
+    name TEXT,
+    ts INTEGER
+);
+CREATE INDEX IF NOT EXISTS conns_ts ON conns (ts);
+CREATE INDEX IF NOT EXISTS conns_proc_ts ON conns (proc, ts);
+CREATE INDEX IF NOT EXISTS conns_rip ON conns (r_ip);
+CREATE INDEX IF NOT EXISTS conns_rport ON conns (r_port, proto);
+CREATE INDEX IF NOT EXISTS conns_session_ts ON conns (session, ts);
+CREATE INDEX IF NOT EXISTS markers_ts ON markers (ts);
+CREATE INDEX IF NOT EXISTS windows_start ON windows (start_ts);
+CREATE INDEX IF NOT EXISTS sessions_file ON sessions (file_id);
+"""
+
+CONN_EVENTS = ("open", "close", "status_change", "sample")
+
+
+def connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, timeout=30.0)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA temp_store=MEMORY")
+    version = db.execute("PRAGMA user_version").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"{path} was written by a newer netdb (schema {version})")
+    db.executescript(SCHEMA)
+    db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    db.commit()
+    return db
+
+
+def head_digest(path: Path, size: int) -> Tuple[int, str]:
+    n = min(size, HEAD_BYTES)
+    with open(path, "rb") as f:
+        return n, hashlib.sha1(f.read(n)).hexdigest()
+
+
+def is_plain_jsonl(path: Path) -> bool:
+    with open(path, "rb") as f:
+        head = f.read(4)
+    return head != MAGIC and head[:2] != b"\x1f\x8b" and head != b"\x28\xb5\x2f\xfd"
+
+
+def read_new_lines(path: Path, offset: int) -> Tuple[Iterable[dict], List[int]]:
+    """Events from the complete lines after `offset`; end[0] is the new offset once consumed."""
+    end = [offset]
+
+    def gen():
+        loads = orjson.loads if HAS_ORJSON else json.loads
+        with open(path, "rb") as f:
+            f.seek(offset)
+            pos = offset
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # still being written
+                pos += len(line)
+                end[0] = pos
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield loads(line)
+                except Exception:
+                    continue
+
+    return gen(), end
+
+
+class Ingest:
+    """Loads events into the database, batching rows per table."""
+
+    def __init__(self, db: sqlite3.Connection, window: float = 300.0, start_marker: str = "F1",
+                 end_marker: str = "F2", batch: int = 5000):
+        self.db = db
+        self.window = int(window)
+        self.start_marker = start_marker
+        self.end_marker = end_marker
+        self.batch = batch
+        self.procs: Dict[Tuple[Optional[str], Optional[str]], int] = {
+            (name, exe): proc_id for proc_id, name, exe in db.execute("SELECT id, name, exe FROM procs")}
+        self._conns: List[tuple] = []
+        self._markers: List[tuple] = []
+        self._rdns: List[tuple] = []
+        self.counts = {"events": 0, "conns": 0, "markers": 0, "sessions": 0, "skipped": 0}
+
+    def _proc(self, ev: dict) -> Optional[int]:
+        proc = ev.get("process")
+        if not proc:
+            return None
+        key = (proc.get("name"), proc.get("exe"))
+        proc_id = self.procs.get(key)
+        if proc_id is None:
+            proc_id = self.db.execute("INSERT INTO procs (name, exe) VALUES (?, ?)", key).lastrowid
+            self.procs[key] = proc_id
+        return proc_id
+
+    def flush(self) -> None:
+        if self._conns:
+            self.counts["conns"] += len(self._conns)
+            self.db.executemany("INSERT INTO conns VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._conns)
+            self._conns = []
+        if self._markers:
+            self.db.executemany("INSERT INTO markers VALUES (?, ?, ?, ?)", self._markers)
+            self._markers = []
+        if self._rdns:
+            self.db.executemany("INSERT OR REPLACE INTO rdns VALUES (?, ?, ?)", self._rdns)
+            self._rdns = []
+
+    def _new_session(self, file_id: int, host: Optional[str], ts: Optional[int]) -> int:
+        self.counts["sessions"] += 1
+        return self.db.execute("INSERT INTO sessions (file_id, host, start_ts) VALUES (?, ?, ?)",
+                               (file_id, host, ts)).lastrowid
+
+    def _close_window(self, session: int, ts: int, marker: Optional[str]) -> None:
+        row = self.db.execute("SELECT open_window FROM sessions WHERE id = ?", (session,)).fetchone()
+        if row and row[0] is not None:
+            self.db.execute("UPDATE windows SET end_ts = MIN(end_ts, ?), end_marker = ? WHERE id = ?",
+                            (ts, marker, row[0]))
+            self.db.execute("UPDATE sessions SET open_window = NULL WHERE id = ?", (session,))
+
+    def events(self, file_id: int, session: Optional[int], events: Iterable[dict],
+               checkpoint: Optional[Callable[[Optional[int]], None]] = None) -> Optional[int]:
+        """Load events of one file; returns the session the file ends in.
+
+        Every `batch` connection rows are flushed and committed; checkpoint()
+        is called first so the file's progress is committed with them.
+        """
+        n = 0
+        last_text, last_ts = None, None
+        for ev in events:
+            n += 1
+            kind = ev.get("event")
+            text = ev.get("ts")
+            if text != last_text:
+                # whole-second stamps: consecutive events mostly share one
+                last_text, last_ts = text, ts_to_epoch(text or "")
+            ts = last_ts
+            if ts is None:
+                self.counts["skipped"] += 1
+                continue
+            if kind == "start":
+                self.flush()
+                session = self._new_session(file_id, ev.get("host"), ts)
+                continue
+            if session is None:
+                # rotated segment or a log started by an older net.py: no header
+                session = self._new_session(file_id, None, ts)
+            if kind in CONN_EVENTS:
+                laddr = ev.get("laddr") or {}
+                raddr = ev.get("raddr") or {}
+                self._conns.append((session, ts, kind, ev.get("proto"), ev.get("family"), ev.get("status"),
+                              ev.get("pid"), self._proc(ev), laddr.get("ip"), laddr.get("port"),
+                              raddr.get("ip"), raddr.get("port")))
+                if ev.get("rdns") and raddr.get("ip"):
+                    self._rdns.append((raddr["ip"], ev["rdns"], ts))
+                if len(self._conns) >= self.batch:
+                    self.flush()
+                    if checkpoint is not None:
+                        checkpoint(session)
+                    self.db.commit()
+            elif kind == "marker":
+                self.counts["markers"] += 1
+                marker = ev.get("marker")
+                self._markers.append((session, ts, marker, ev.get("label")))
+                if marker == self.start_marker:
+                    self._close_window(session, ts, marker)
+                    wid = self.db.execute(
+                        "INSERT INTO windows (session, start_ts, end_ts, label) VALUES (?, ?, ?, ?)",
+                        (session, ts, ts + self.window, ev.get("label"))).lastrowid
+                    self.db.execute("UPDATE sessions SET open_window = ? WHERE id = ?", (wid, session))
+                elif marker == self.end_marker:
+                    self._close_window(session, ts, marker)
+            elif kind == "rdns":
+                if ev.get("ip") and ev.get("rdns"):
+                    self._rdns.append((ev["ip"], ev["rdns"], ts))
+            elif kind == "stop":
+                self.flush()
+                self._close_window(session, ts, "stop")
+                self.db.execute("UPDATE sessions SET stop_ts = ? WHERE id = ?", (ts, session))
+        self.counts["events"] += n
+        self.flush()
+        return session
+
+    def drop_file(self, file_id: int) -> None:
+        for table in ("conns", "markers", "windows"):
+            self.db.execute(f"DELETE FROM {table} WHERE session IN (SELECT id FROM sessions WHERE file_id = ?)",
+                            (file_id,))
+        self.db.execute("DELETE FROM sessions WHERE file_id = ?", (file_id,))
+
+    def file(self, path: Path) -> str:
+        """Ingest one capture; returns what was done ("new", "append", "reload" or "unchanged")."""
+        path = path.resolve()
+        st = path.stat()
+        head_len, head_sha = head_digest(path, st.st_size)
+        row = self.db.execute("SELECT id, size, mtime_ns, offset, head_len, head_sha, session FROM files WHERE path = ?",
+                              (str(path),)).fetchone()
+        plain = is_plain_jsonl(path)
+        if row is not None:
+            file_id, size, mtime_ns, offset, old_len, old_sha, session = row
+            if size == st.st_size and mtime_ns == st.st_mtime_ns:
+                return "unchanged"
+            same_head = head_len >= old_len and head_digest(path, old_len)[1] == old_sha
+            if plain and same_head and st.st_size >= offset:
+                action = "append"
+            else:
+                action = "reload"
+                self.drop_file(file_id)
+                offset, session = 0, None
+        else:
+            # mtime 0 until fully loaded, so an interrupted ingest is resumed next time
+            file_id = self.db.execute(
+                "INSERT INTO files (path, size, mtime_ns, offset, head_len, head_sha) VALUES (?, ?, 0, 0, ?, ?)",
+                (str(path), st.st_size, head_len, head_sha)).lastrowid
+            action, offset, session = "new", 0, None
+
+        if plain:
+            events, end = read_new_lines(path, offset)
+
+            def checkpoint(sess: Optional[int]) -> None:
+                self.db.execute("UPDATE files SET offset = ?, session = ?, mtime_ns = 0 WHERE id = ?",
+                                (end[0], sess, file_id))
+
+            session = self.events(file_id, session, events, checkpoint)
+            offset = end[0]
+        else:
+            session = self.events(file_id, session, iter_events(path))
+            offset = st.st_size
+        self.db.execute("UPDATE files SET size = ?, mtime_ns = ?, offset = ?, head_len = ?, head_sha = ?, session = ? "
+                        "WHERE id = ?", (st.st_size, st.st_mtime_ns, offset, head_len, head_sha, session, file_id))
+        self.db.commit()
+        return action
+
+
+# --- queries ---------------------------------------------------------------
+
+def parse_time(text: str) -> int:
+    """Epoch seconds from an ISO timestamp, epoch seconds, or an age like 90m/12h/7d."""
+    text = text.strip()
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text[-1:] in units and text[:-1].isdigit():
+        return int(time.time()) - int(text[:-1]) * units[text[-1]]
+    if text.isdigit():
+        return int(text)
+    full = text if text.endswith("Z") else text + "Z"
+    if len(full) == 11:
+        full = full[:-1] + "T00:00:00Z"
+    sec = ts_to_epoch(full)
+    if sec is None:
+        raise ValueError(f"unrecognized time: {text!r}")
+    return sec
+
+
+GROUPS = {
+    "remote": ("c.r_ip, c.r_port, c.proto", ("r_ip", "r_port", "proto")),
+    "rip": ("c.r_ip", ("r_ip",)),
+    "rport": ("c.r_port, c.proto", ("r_port", "proto")),
+    "process": ("p.name", ("process",)),
+}
+
+
+def build_query(args) -> Tuple[str, list, Tuple[str, ...]]:
+    source = "conns c"
+    params: list = []
+    if args.last_windows:
+        # CROSS JOIN keeps the windows as the outer loop: each one is a range
+        # scan on (session, ts) instead of a pass over a whole process
+        label = "WHERE label = ? " if args.window_label else ""
+        source = ("(SELECT session, start_ts, end_ts FROM windows " + label + "ORDER BY start_ts DESC LIMIT ?) w "
+                  "CROSS JOIN conns c ON c.session = w.session AND c.ts BETWEEN w.start_ts AND w.end_ts")
+        params += ([args.window_label] if args.window_label else []) + [args.last_windows]
+    where = ["c.event = ?"]
+    params.append(args.event)
+    if args.process:
+        # procs is small: resolve the ids first so conns is searched through (proc, ts)
+        where.append("c.proc IN (SELECT id FROM procs WHERE name LIKE ?)")
+        params.append(args.process if any(ch in args.process for ch in "%_") else f"%{args.process}%")
+    if args.proto:
+        where.append("c.proto = ?")
+        params.append(args.proto)
+    if args.remote_ip:
+        where.append("c.r_ip = ?")
+        params.append(args.remote_ip)
+    if args.port is not None:
+        where.append("c.r_port = ?")
+        params.append(args.port)
+    if args.since:
+        where.append("c.ts >= ?")
+        params.append(parse_time(args.since))
+    if args.until:
+        where.append("c.ts <= ?")
+        params.append(parse_time(args.until))
+    sql_where = " WHERE " + " AND ".join(where)
+    join_proc = " LEFT JOIN procs p ON p.id = c.proc"
+    join_rdns = " LEFT JOIN rdns d ON d.ip = c.r_ip"
+    if args.group == "none":
+        cols = ("ts", "event", "proto", "pid", "process", "l_ip", "l_port", "r_ip", "r_port", "status", "rdns")
+        sql = ("SELECT c.ts, c.event, c.proto, c.pid, p.name, c.l_ip, c.l_port, c.r_ip, c.r_port, c.status, d.name "
+               "FROM " + source + join_proc + join_rdns + sql_where + " ORDER BY c.ts DESC LIMIT ?")
+    else:
+        key, names = GROUPS[args.group]
+        with_rdns = "r_ip" in names
+        cols = names + ("count", "first", "last") + (("rdns",) if with_rdns else ())
+        sql = (f"SELECT {key}, COUNT(*), MIN(c.ts), MAX(c.ts)" + (", MAX(d.name)" if with_rdns else "") +
+               " FROM " + source + (join_proc if args.group == "process" else "") + (join_rdns if with_rdns else "") +
+               sql_where + f" GROUP BY {key} ORDER BY COUNT(*) DESC LIMIT ?")
+    params.append(args.limit)
+    return sql, params, cols
+
+
+def print_rows(cols: Tuple[str, ...], rows: List[tuple], as_json: bool) -> None:
+    time_cols = {i for i, c in enumerate(cols) if c in ("ts", "first", "last", "start", "end")}
+    rows = [tuple(epoch_to_ts(v) if i in time_cols and isinstance(v, int) else v for i, v in enumerate(r)) for r in rows]
+    if as_json:
+        for r in rows:
+            print(json.dumps(dict(zip(cols, r)), ensure_ascii=False))
+        return
+    text = [tuple("" if v is None else str(v) for v in r) for r in rows]
+    widths = [max([len(c)] + [len(r[i]) for r in text]) for i, c in enumerate(cols)]
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for r in text:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Index net.py captures in SQLite and query them.")
+    ap.add_argument("--db", default=DEFAULT_DB, help=f"Database file (default: {DEFAULT_DB})")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    i = sub.add_parser("ingest", help="Load new captures / new lines of growing ones")
+    i.add_argument("captures", nargs="+", help="netlog files or glob patterns")
+    i.add_argument("--window", type=float, default=300.0, help="Max marker window length in seconds (default: 300)")
+    i.add_argument("--start-marker", default="F1", help="Marker key that opens a window (default: F1)")
+    i.add_argument("--end-marker", default="F2", help="Marker key that closes a window (default: F2)")
+    i.add_argument("--batch", type=int, default=5000, help="Rows per transaction (default: 5000)")
+
+    q = sub.add_parser("query", help="Connection events, grouped (default: by remote endpoint)")
+    q.add_argument("--process", help="Process name; substring unless it contains LIKE wildcards")
+    q.add_argument("--proto", choices=("tcp", "udp"))
+    q.add_argument("--remote-ip")
+    q.add_argument("--port", type=int, help="Remote port")
+    q.add_argument("--event", default="open", choices=CONN_EVENTS, help="Event type (default: open)")
+    q.add_argument("--since", help="ISO time, epoch seconds or age (90m, 12h, 7d)")
+    q.add_argument("--until")
+    q.add_argument("--last-windows", type=int, default=0, help="Only the last N marker windows")
+    q.add_argument("--window-label", help="Only windows opened with this marker label")
+    q.add_argument("--group", default="remote", choices=tuple(GROUPS) + ("none",))
+    q.add_argument("--limit", type=int, default=100)
+    q.add_argument("--json", action="store_true")
+
+    w = sub.add_parser("windows", help="List marker windows")
+    w.add_argument("--last", type=int, default=20)
+    w.add_argument("--json", action="store_true")
+
+    s = sub.add_parser("sql", help="Run a read-only SQL statement")
+    s.add_argument("statement")
+    s.add_argument("--json", action="store_true")
+
+    args = ap.parse_args(argv)
+    try:
+        db = connect(args.db)
+    except (sqlite3.Error, RuntimeError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    t0 = time.perf_counter()
+    if args.cmd == "ingest":
+        ing = Ingest(db, args.window, args.start_marker, args.end_marker, args.batch)
+        rc = 0
+        for p in expand(args.captures):
+            path = Path(p)
+            if not path.is_file():
+                print(f"[WARN] {p}: not a file", file=sys.stderr)
+                rc = 1
+                continue
+            try:
+                action = ing.file(path)
+            except Exception as e:
+                db.rollback()
+                print(f"[WARN] {p}: {e}", file=sys.stderr)
+                rc = 1
+                continue
+            print(f"{action:>9}  {p}")
+        db.execute("PRAGMA optimize")
+        c = ing.counts
+        print(f"{c['events']} events ({c['conns']} connections, {c['markers']} markers, {c['sessions']} sessions) "
+              f"in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+        db.close()
+        return rc
+
+    if args.cmd == "query":
+        try:
+            sql, params, cols = build_query(args)
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        rows = db.execute(sql, params).fetchall()
+    elif args.cmd == "windows":
+        cols = ("id", "session", "host", "label", "start", "end", "end_marker")
+        rows = db.execute("SELECT w.id, w.session, s.host, w.label, w.start_ts, w.end_ts, w.end_marker "
+                          "FROM windows w JOIN sessions s ON s.id = w.session "
+                          "ORDER BY w.start_ts DESC LIMIT ?", (args.last,)).fetchall()
+    else:
+        db.execute("PRAGMA query_only=ON")
+        try:
+            cur = db.execute(args.statement)
+        except sqlite3.Error as e:
+            print(f"error: {e}", file=sys.stderr)
+            return 2
+        cols = tuple(d[0] for d in cur.description or ())
+        rows = cur.fetchall()
+    print_rows(cols, rows, args.json)
+    print(f"({len(rows)} rows in {(time.perf_counter() - t0) * 1000:.1f} ms)", file=sys.stderr)
+    db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""
+Diff net.py sessions: which flows appear, vanish or change timing between a
+capture where a profile works and one where it doesn't.
+
+Every positional argument is one session (a capture or a glob of captures,
+JSONL or netbin, plain/.gz/.zst); the first is the reference the others are
+compared with. Captures are streamed once, event by event, and folded into
+per-flow aggregates:
+
+  flow     process name, protocol and remote endpoint. Local ports at or
+           above --ephemeral are dropped, so a listening/unconnected socket
+           is keyed by its well-known port or "eph". --remote net masks the
+           remote IP to /24 (IPv4) or /48 (IPv6), --remote port drops it.
+  time     seconds since the F1 marker that opened the window (up to F2, the
+           next F1 or --window seconds). Sockets already open at F1 count as
+           seen at 0. With --no-markers every capture is one window starting
+           at its "start" event.
+
+Per flow the diff compares presence (share of windows the flow shows up in),
+median first-seen offset, median TCP connect time (open to ESTABLISHED) and
+the share of TCP sockets that closed without ever connecting. Timings are
+whole-second histograms capped at the window length. After every window,
+flows seen in less than --prune of the windows so far are dropped (lossy
+counting), so memory stays bounded by live sockets and the flows that recur,
+not by the size of the logs or the long tail of one-off connections. A kept
+flow's presence is low by at most --prune; anything rarer than that on one
+side reads as absent there.
+
+Examples:
+  python netdiff.py works.jsonl broken.jsonl
+  python netdiff.py "caps/good_*.jsonl" "caps/bad_*.jsonl" --process bf6 --remote net
+  python netdiff.py ref.bin a.bin b.bin --no-markers --json diff.json
+"""
+
+import argparse
+import ipaddress
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "Debug"))
+
+from netbin import iter_events, ts_to_epoch  # noqa: E402
+from netdb import is_plain_jsonl, read_new_lines  # noqa: E402
+from port_learn import expand  # noqa: E402
+
+FlowKey = Tuple[str, str, str, object]
+
+
+class Flow:
+    """Aggregates of one flow within one session."""
+
+    __slots__ = ("windows", "delta", "last_window", "opens", "connected", "failed", "first", "connect", "life", "rdns")
+
+    def __init__(self, delta: int = 0):
+        self.windows = 0
+        self.delta = delta  # windows it may have been in before it was (re)created
+        self.last_window = -1
+        self.opens = 0
+        self.connected = 0
+        self.failed = 0
+        # whole seconds -> count
+        self.first: Dict[int, int] = {}
+        self.connect: Dict[int, int] = {}
+        self.life: Dict[int, int] = {}
+        self.rdns: Optional[str] = None
+
+
+def bump(hist: Dict[int, int], value: int, cap: int) -> None:
+    value = min(max(value, 0), cap)
+    hist[value] = hist.get(value, 0) + 1
+
+
+def median(hist: Dict[int, int]) -> Optional[int]:
+    total = sum(hist.values())
+    if not total:
+        return None
+    seen = 0
+    for value in sorted(hist):
+        seen += hist[value]
+        if seen * 2 >= total:
+            return value
+    return None
+
+
+def events_of(path: str) -> Iterator[dict]:
+    p = Path(path)
+    if is_plain_jsonl(p):
+        events, _ = read_new_lines(p, 0)
+        return iter(events)
+    return iter_events(p)
+
+
+class Session:
+    """One side of the diff: flows seen inside the marker windows of its captures."""
+
+    def __init__(self, name: str, window: float = 300.0, markers: bool = True, process: str = "",
+                 ephemeral: int = 49152, remote: str = "endpoint", start_marker: str = "F1", end_marker: str = "F2",
+                 prune: float = 0.1):
+        self.name = name
+        self.window = int(window)
+        self.markers = markers
+        self.needle = process.lower()
+        self.ephemeral = ephemeral
+        self.remote = remote
+        self.start_marker = start_marker
+        self.end_marker = end_marker
+        self.prune = prune
+        self.flows: Dict[FlowKey, Flow] = {}
+        self.pruned = 0
+        self.n_windows = 0
+        self.n_events = 0
+        self.files: List[str] = []
+        self._names: Dict[str, str] = {}  # ip -> rDNS name, trimmed to kept flows on prune
+        # socket -> [flow key, open ts, window id, connected]
+        self._live: Dict[tuple, list] = {}
+        self._win: Optional[int] = None  # id of the open window
+        self._win_start = 0
+        self._win_end = 0
+
+    # --- normalization -----------------------------------------------------
+
+    def _remote(self, ip: str) -> str:
+        if self.remote == "net":
+            try:
+                return str(ipaddress.ip_network(f"{ip}/{24 if ':' not in ip else 48}", strict=False))
+            except ValueError:
+                return ip
+        return ip
+
+    def flow_key(self, ev: dict) -> Optional[FlowKey]:
+        name = ((ev.get("process") or {}).get("name") or "?").lower()
+        if self.needle and self.needle not in name:
+            return None
+        proto = ev.get("proto") or "?"
+        raddr = ev.get("raddr")
+        if raddr and raddr.get("ip"):
+            if self.remote == "port":
+                return (name, proto, "*", raddr.get("port"))
+            return (name, proto, self._remote(raddr["ip"]), raddr.get("port"))
+        port = (ev.get("laddr") or {}).get("port")
+        if not isinstance(port, int) or port >= self.ephemeral:
+            port = "eph"
+        return (name, proto, "", port)
+
+    # --- windows -----------------------------------------------------------
+
+    def _flow(self, key: FlowKey) -> Flow:
+        flow = self.flows.get(key)
+        if flow is None:
+            # windows before the current one it may have missed while pruned
+            done = self.n_windows - (1 if self._win is not None else 0)
+            flow = self.flows[key] = Flow(int(self.prune * done))
+        return flow
+
+    def _seen(self, flow: Flow, ts: int) -> None:
+        if flow.last_window != self._win:
+            flow.last_window = self._win
+            flow.windows += 1
+            bump(flow.first, ts - self._win_start, self.window)
+
+    def _open_window(self, ts: int) -> None:
+        self._close_window()
+        self._win = self.n_windows
+        self.n_windows += 1
+        # without markers the window is the whole capture (timings still cap at --window)
+        self._win_start, self._win_end = ts, ts + self.window if self.markers else float("inf")
+        for entry in self._live.values():
+            self._seen(self._flow(entry[0]), ts)
+
+    def _close_window(self) -> None:
+        if self._win is None:
+            return
+        self._win = None
+        limit = int(self.prune * self.n_windows)
+        drop = [key for key, flow in self.flows.items() if flow.windows + flow.delta <= limit]
+        for key in drop:
+            del self.flows[key]
+        self.pruned += len(drop)
+        if len(self._names) > len(self.flows):
+            keep = {key[2] for key in self.flows}
+            self._names = {ip: name for ip, name in self._names.items() if ip in keep}
+
+    # --- streaming ---------------------------------------------------------
+
+    def feed(self, events: Iterable[dict]) -> None:
+        last_text, ts = None, None
+        live = self._live
+        for ev in events:
+            self.n_events += 1
+            text = ev.get("ts")
+            if text != last_text:
+                last_text, ts = text, ts_to_epoch(text or "")
+            if ts is None:
+                continue
+            if self._win is not None and ts > self._win_end:
+                self._close_window()
+            kind = ev.get("event")
+            if kind in ("open", "status_change", "close"):
+                laddr = ev.get("laddr") or {}
+                raddr = ev.get("raddr") or {}
+                sock = (ev.get("pid"), ev.get("proto"), laddr.get("ip"), laddr.get("port"), raddr.get("ip"), raddr.get("port"))
+                if kind == "open":
+                    key = self.flow_key(ev)
+                    if key is None:
+                        continue
+                    connected = ev.get("status") == "ESTABLISHED"
+                    live[sock] = [key, ts, self._win, connected]
+                    if self._win is not None:
+                        flow = self._flow(key)
+                        self._seen(flow, ts)
+                        flow.opens += 1
+                        if connected and ev.get("proto") == "tcp":
+                            flow.connected += 1
+                            bump(flow.connect, 0, self.window)
+                    continue
+                entry = live.get(sock) if kind == "status_change" else live.pop(sock, None)
+                if entry is None:
+                    continue
+                key, opened, win, connected = entry
+                if kind == "status_change":
+                    if not connected and ev.get("status") == "ESTABLISHED":
+                        entry[3] = True
+                        if win is not None and win == self._win and ev.get("proto") == "tcp":
+                            flow = self._flow(key)
+                            flow.connected += 1
+                            bump(flow.connect, ts - opened, self.window)
+                elif win is not None and win == self._win:
+                    flow = self._flow(key)
+                    bump(flow.life, ts - opened, self.window)
+                    if not connected and ev.get("proto") == "tcp":
+                        flow.failed += 1
+            elif kind == "rdns":
+                if ev.get("ip") and ev.get("rdns"):
+                    self._names[ev["ip"]] = ev["rdns"]
+            elif kind == "marker":
+                if not self.markers:
+                    continue
+                if ev.get("marker") == self.start_marker:
+                    self._open_window(ts)
+                elif ev.get("marker") == self.end_marker:
+                    self._close_window()
+            elif kind in ("start", "stop"):
+                # a new capture: PIDs and sockets of the previous one are gone
+                self._close_window()
+                live.clear()
+                if kind == "start" and not self.markers:
+                    self._open_window(ts)
+
+    def load(self, paths: List[str]) -> None:
+        for p in paths:
+            try:
+                self.feed(events_of(p))
+                self.files.append(p)
+            except Exception as e:
+                print(f"[WARN] {p}: {e}", file=sys.stderr)
+        self._close_window()
+        self._live = {}
+        self._attach_names()
+
+    def _attach_names(self) -> None:
+        if self.remote != "endpoint":
+            return
+        for key, flow in self.flows.items():
+            flow.rdns = self._names.get(key[2])
+        self._names = {}
+
+    # --- summary -----------------------------------------------------------
+
+    def presence(self, flow: Optional[Flow]) -> float:
+        return flow.windows / self.n_windows if flow is not None and self.n_windows else 0.0
+
+
+def fail_rate(flow: Flow) -> Optional[float]:
+    done = flow.connected + flow.failed
+    return flow.failed / done if done else None
+
+
+def describe(key: FlowKey, flow: Optional[Flow] = None) -> str:
+    name, proto, host, port = key
+    if host == "":
+        text = f"{name} {proto} local:{port}"
+    else:
+        text = f"{name} {proto} {'[' + host + ']' if ':' in host else host}:{port}"
+    if flow is not None and flow.rdns:
+        text += f" ({flow.rdns})"
+    return text
+
+
+def flow_summary(sess: Session, flow: Optional[Flow]) -> Optional[dict]:
+    if flow is None or not flow.windows:
+        return None
+    rate = fail_rate(flow)
+    return {"presence": round(sess.presence(flow), 3), "windows": flow.windows, "opens": flow.opens,
+            "first_s": median(flow.first), "connect_s": median(flow.connect), "life_s": median(flow.life),
+            "fail_rate": round(rate, 3) if rate is not None else None}
+
+
+def diff(ref: Session, other: Session, min_presence: float = 0.5, presence_delta: float = 0.5,
+         time_delta: int = 3, fail_delta: float = 0.5) -> dict:
+    """Hash-join the flows of two sessions and classify the differences."""
+    appeared, vanished, changed = [], [], []
+    for key in ref.flows.keys() | other.flows.keys():
+        a, b = ref.flows.get(key), other.flows.get(key)
+        pa, pb = ref.presence(a), other.presence(b)
+        if max(pa, pb) < min_presence:
+            continue
+        row = {"flow": describe(key, a or b), "ref": flow_summary(ref, a), "other": flow_summary(other, b)}
+        if not pa:
+            appeared.append(row)
+            continue
+        if not pb:
+            vanished.append(row)
+            continue
+        sa, sb = row["ref"], row["other"]
+        why = []
+        if abs(pa - pb) >= presence_delta:
+            why.append("presence")
+        for field in ("first_s", "connect_s"):
+            if sa[field] is not None and sb[field] is not None and abs(sa[field] - sb[field]) >= time_delta:
+                why.append(field[:-2])
+        if sa["fail_rate"] is not None and sb["fail_rate"] is not None and abs(sa["fail_rate"] - sb["fail_rate"]) >= fail_delta:
+            why.append("fail")
+        if why:
+            row["changed"] = why
+            changed.append(row)
+
+    def weight(row: dict) -> float:
+        return -max((row["ref"] or {}).get("presence", 0.0), (row["other"] or {}).get("presence", 0.0))
+
+    for rows in (appeared, vanished, changed):
+        rows.sort(key=lambda r: (weight(r), r["flow"]))
+    return {"ref": ref.name, "other": other.name, "appeared": appeared, "vanished": vanished, "changed": changed}
+
+
+def _fmt(s: Optional[dict]) -> str:
+    if s is None:
+        return "-"
+    parts = [f"{s['presence'] * 100:.0f}%", f"t+{s['first_s']}s"]
+    if s["connect_s"] is not None:
+        parts.append(f"conn {s['connect_s']}s")
+    if s["fail_rate"]:
+        parts.append(f"fail {s['fail_rate'] * 100:.0f}%")
+    return " ".join(parts)
+
+
+def print_diff(result: dict, limit: int) -> None:
+    print(f"\n== {result['ref']} -> {result['other']}")
+    for title, rows in (("appeared", result["appeared"]), ("vanished", result["vanished"]), ("changed", result["changed"])):
+        print(f"{title} ({len(rows)})")
+        for row in rows[:limit]:
+            note = f"  [{','.join(row['changed'])}]" if "changed" in row else ""
+            print(f"  {row['flow']:<60} {_fmt(row['ref']):>24} -> {_fmt(row['other']):<24}{note}")
+        if len(rows) > limit:
+            print(f"  ... {len(rows) - limit} more")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Diff flows between net.py sessions (first one is the reference).")
+    ap.add_argument("sessions", nargs="+", help="One capture or glob pattern per session; the first is the reference")
+    ap.add_argument("--process", default="", help="Only flows of processes whose name contains this (default: all)")
+    ap.add_argument("--no-markers", action="store_true", help="One window per capture from its start instead of F1..F2")
+    ap.add_argument("--start-marker", default="F1", help="Marker key that opens a window (default: F1)")
+    ap.add_argument("--end-marker", default="F2", help="Marker key that closes a window (default: F2)")
+    ap.add_argument("--window", type=float, default=300.0, help="Max window length in seconds (default: 300)")
+    ap.add_argument("--ephemeral", type=int, default=49152, help="Local ports from here up are treated as ephemeral (default: 49152)")
+    ap.add_argument("--remote", choices=("endpoint", "net", "port"), default="endpoint",
+                    help="Join on remote IP:port, on its /24 (/48) and port, or on the port only (default: endpoint)")
+    ap.add_argument("--min-presence", type=float, default=0.5,
+                    help="Ignore flows seen in fewer than this share of windows on both sides (default: 0.5)")
+    ap.add_argument("--prune", type=float, default=0.1,
+                    help="Drop flows seen in less than this share of windows so far; keep it below --min-presence (default: 0.1)")
+    ap.add_argument("--presence-delta", type=float, default=0.5, help="Report presence changes at least this large (default: 0.5)")
+    ap.add_argument("--time-delta", type=int, default=3, help="Report first-seen/connect changes of at least N seconds (default: 3)")
+    ap.add_argument("--fail-delta", type=float, default=0.5, help="Report TCP failure rate changes at least this large (default: 0.5)")
+    ap.add_argument("--limit", type=int, default=30, help="Rows printed per section (default: 30)")
+    ap.add_argument("--json", type=str, default=None, help="Also write the full diff as JSON to this path")
+    args = ap.parse_args(argv)
+
+    if len(args.sessions) < 2:
+        ap.error("need at least two sessions")
+
+    t0 = time.perf_counter()
+    sessions: List[Session] = []
+    for spec in args.sessions:
+        paths = expand([spec])
+        sess = Session(Path(paths[0]).name if len(paths) == 1 else spec, args.window, not args.no_markers,
+                       args.process, args.ephemeral, args.remote, args.start_marker, args.end_marker, args.prune)
+        sess.load(paths)
+        print(f"{sess.name}: {len(sess.files)} file(s), {sess.n_events} events, {sess.n_windows} window(s), "
+              f"{len(sess.flows)} flows kept, {sess.pruned} pruned")
+        if not sess.n_windows:
+            print(f"[WARN] {sess.name}: no {args.start_marker} markers; use --no-markers to diff whole captures",
+                  file=sys.stderr)
+        sessions.append(sess)
+
+    results = [diff(sessions[0], other, args.min_presence, args.presence_delta, args.time_delta, args.fail_delta)
+               for other in sessions[1:]]
+    for result in results:
+        print_diff(result, args.limit)
+    print(f"\n{sum(s.n_events for s in sessions)} events in {time.perf_counter() - t0:.2f}s")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    return 0 if all(s.n_windows for s in sessions) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Learn the UDP source ports the game uses from net.py captures and propose
+tight port ranges for lists/port-bf.txt and the WinDivert filters.
+
+Captures (JSONL or netbin, plain/.gz/.zst) are streamed one event at a time
+into a fixed 65536-slot histogram, so memory stays constant no matter how many
+or how large the files are. Observed ports are then covered with the fewest
+ranges whose unobserved "slack" ports fit in --slack; --coverage drops the
+rarest ports first when a few outliers would otherwise widen the ranges.
+
+Examples:
+  python port_learn.py netlog_*.jsonl
+  python port_learn.py netlog_*.bin --markers --slack 64 --write-port-file ../../lists/port-bf.txt
+  python port_learn.py caps/*.jsonl --write-filter wf-udp-learned.txt
+"""
+
+import argparse
+import glob
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "Debug"))
+
+from netbin import iter_events, ts_to_epoch  # noqa: E402
+
+
+def game_udp_ports(events: Iterable[dict], process: str, markers: bool = False,
+                   start_marker: str = "F1", end_marker: str = "F2",
+                   window: float = 300.0) -> Iterator[int]:
+    """Yield the local port of every UDP socket the game opens.
+
+    With markers=True only sockets opened inside a marker window count: a
+    window starts at `start_marker` and ends at `end_marker` or after
+    `window` seconds, whichever comes first.
+    """
+    needle = process.lower()
+    open_until: Optional[int] = None
+    for ev in events:
+        kind = ev.get("event")
+        if kind == "marker":
+            if not markers:
+                continue
+            sec = ts_to_epoch(ev.get("ts", ""))
+            if ev.get("marker") == start_marker and sec is not None:
+                open_until = sec + int(window)
+            elif ev.get("marker") == end_marker:
+                open_until = None
+            continue
+        if kind != "open" or ev.get("proto") != "udp":
+            continue
+        proc = ev.get("process") or {}
+        name = proc.get("name") or ""
+        if needle not in name.lower():
+            continue
+        if markers:
+            if open_until is None:
+                continue
+            sec = ts_to_epoch(ev.get("ts", ""))
+            if sec is None or sec > open_until:
+                open_until = None
+                continue
+        port = (ev.get("laddr") or {}).get("port")
+        if isinstance(port, int) and 0 <= port <= 0xFFFF:
+            yield port
+
+
+def histogram(ports: Iterable[int]) -> array:
+    hist = array("L", [0]) * 65536
+    for p in ports:
+        hist[p] += 1
+    return hist
+
+
+def observed(hist: array, min_count: int = 1, coverage: float = 1.0) -> List[int]:
+    """Ports to cover: seen at least min_count times, rarest dropped beyond coverage."""
+    ports = [p for p in range(65536) if hist[p] >= min_count]
+    if coverage >= 1.0 or not ports:
+        return ports
+    total = sum(hist[p] for p in ports)
+    keep = []
+    acc = 0
+    for p in sorted(ports, key=lambda p: hist[p], reverse=True):
+        if acc >= coverage * total:
+            break
+        keep.append(p)
+        acc += hist[p]
+    keep.sort()
+    return keep
+
+
+def cover(ports: List[int], slack: int = 0, max_ranges: int = 0) -> List[Tuple[int, int]]:
+    """Cover sorted ports with ranges, merging across the smallest gaps first.
+
+    Merging the k smallest gaps adds the least possible slack for k merges,
+    so this yields the fewest ranges whose total slack stays within `slack`.
+    With max_ranges > 0, merging continues (past the slack budget if needed)
+    until at most that many ranges remain.
+    """
+    if not ports:
+        return []
+    # gap i separates ports[i] and ports[i + 1]; merging it costs (gap - 1) slack
+    gaps = sorted(range(len(ports) - 1), key=lambda i: ports[i + 1] - ports[i])
+    merged = set()
+    used = 0
+    ranges_left = len(ports)
+    for i in gaps:
+        cost = ports[i + 1] - ports[i] - 1
+        over_budget = used + cost > slack
+        if over_budget and not (max_ranges and ranges_left > max_ranges):
+            break
+        merged.add(i)
+        used += cost
+        ranges_left -= 1
+    out: List[Tuple[int, int]] = []
+    start = ports[0]
+    for i in range(len(ports) - 1):
+        if i not in merged:
+            out.append((start, ports[i]))
+            start = ports[i + 1]
+    out.append((start, ports[-1]))
+    return out
+
+
+def range_weight(hist: array, r: Tuple[int, int]) -> int:
+    return sum(hist[r[0]:r[1] + 1])
+
+
+def format_port_file(r: Tuple[int, int]) -> str:
+    return f"{r[0]}-{r[1]}" if r[0] != r[1] else str(r[0])
+
+
+def format_filter(ranges: List[Tuple[int, int]], field: str = "udp.SrcPort", indent: str = "    ") -> str:
+    # Same shape as Debug/filters/wf-bf6-hybrid.txt: ranges first, then singletons
+    clauses = [f"({field} >= {a} and {field} <= {b})" for a, b in ranges if a != b]
+    clauses += [f"{field} == {a}" for a, b in ranges if a == b]
+    return (" or\n").join(indent + c for c in clauses) + "\n"
+
+
+def expand(paths: List[str]) -> List[str]:
+    out: List[str] = []
+    for p in paths:
+        hits = sorted(glob.glob(p))
+        out.extend(hits if hits else [p])
+    return out
+
+
+def all_events(paths: List[str]) -> Iterator[dict]:
+    for p in paths:
+        try:
+            yield from iter_events(p)
+        except Exception as e:
+            print(f"[WARN] {p}: {e}", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Propose UDP source port ranges from net.py captures.")
+    ap.add_argument("captures", nargs="+", help="netlog files or glob patterns")
+    ap.add_argument("--process", default="bf6", help="Substring of the game process name (default: bf6)")
+    ap.add_argument("--markers", action="store_true", help="Only count sockets opened inside F1..F2 marker windows")
+    ap.add_argument("--start-marker", default="F1", help="Marker key that opens a window (default: F1)")
+    ap.add_argument("--end-marker", default="F2", help="Marker key that closes a window (default: F2)")
+    ap.add_argument("--window", type=float, default=300.0, help="Max window length in seconds (default: 300)")
+    ap.add_argument("--min-count", type=int, default=1, help="Ignore ports seen fewer times (default: 1)")
+    ap.add_argument("--coverage", type=float, default=1.0, help="Cover this fraction of sockets, dropping rare ports (default: 1.0)")
+    ap.add_argument("--slack", type=int, default=32, help="Total unobserved ports the ranges may include (default: 32)")
+    ap.add_argument("--max-ranges", type=int, default=0, help="Merge further until at most N ranges remain (default: no limit)")
+    ap.add_argument("--write-port-file", type=str, default=None, help="Write the heaviest range in port-bf.txt format to this path")
+    ap.add_argument("--write-filter", type=str, default=None, help="Write a WinDivert udp.SrcPort fragment to this path")
+    args = ap.parse_args(argv)
+
+    paths = expand(args.captures)
+    hist = histogram(game_udp_ports(all_events(paths), args.process, args.markers,
+                                    args.start_marker, args.end_marker, args.window))
+    ports = observed(hist, args.min_count, args.coverage)
+    if not ports:
+        print(f"No UDP sockets of a process matching '{args.process}' found in {len(paths)} file(s)", file=sys.stderr)
+        return 1
+
+    ranges = cover(ports, args.slack, args.max_ranges)
+    total = sum(hist)
+    covered = sum(range_weight(hist, r) for r in ranges)
+    width = sum(b - a + 1 for a, b in ranges)
+    print(f"{total} sockets on {len(ports)} distinct ports -> {len(ranges)} range(s), "
+          f"{width} ports wide, {covered}/{total} sockets covered")
+    for r in ranges:
+        print(f"  {format_port_file(r):>11}  sockets={range_weight(hist, r)}")
+
+    fragment = format_filter(ranges)
+    print("\nFilter fragment:\n" + fragment, end="")
+
+    if args.write_port_file:
+        # port-bf.txt holds a single range (the launcher reads only the first line)
+        best = max(ranges, key=lambda r: range_weight(hist, r))
+        Path(args.write_port_file).write_text(format_port_file(best) + "\n", encoding="utf-8")
+        if len(ranges) > 1:
+            print(f"[WARN] port file holds one range; wrote heaviest {format_port_file(best)}, "
+                  f"use the filter fragment for the rest", file=sys.stderr)
+    if args.write_filter:
+        Path(args.write_filter).write_text(fragment, encoding="ascii")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
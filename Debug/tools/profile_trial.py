@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+Try winws profiles one after another and rank them by handshake probes.
+
+Each profile (a Debug/launch JSON, or an old General-BF style .bat imported
+on the fly) is compiled through launcher.py's cache and launched; after
+--settle seconds a batch of TCP and UDP probes runs against the target, up
+to --concurrency at a time. A TCP probe records the connect latency and the
+time until the first byte of the reply; a UDP probe records the time until
+the first reply datagram. winws is stopped before the next profile starts.
+
+A profile is dropped early once it can no longer win: when even answering
+every remaining probe would leave its success rate below --min-success or
+more than --margin below the best profile finished so far. Probes not
+started yet are skipped.
+
+--launch stub compiles the profile but starts nothing (the default off
+Windows), and --echo starts a local TCP/UDP echo server as the target, so a
+run works offline, e.g. to check the runner or measure probe overhead.
+
+Examples:
+  python profile_trial.py --target 203.0.113.7:443 --udp-target 203.0.113.7:3659
+  python profile_trial.py General-BF handshake "General-BF (ALT)" --probes 40
+  python profile_trial.py --echo --launch stub --out trial.json
+"""
+
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from launcher import (BIN, PROFILES, LaunchCache, ProfileError, default_cache_dir, profile_from_bat,
+                      resolve_profile)
+
+
+class Probe(NamedTuple):
+    proto: str
+    ok: bool
+    connect: Optional[float]  # seconds, TCP only
+    first: Optional[float]    # seconds from the start of the probe to the first reply byte
+    error: Optional[str]
+
+
+def parse_target(text: str, default_port: int = 443) -> Tuple[str, int]:
+    host, sep, port = text.rpartition(":")
+    if not sep or "]" in port or (host.count(":") and not host.endswith("]")):
+        return text.strip("[]"), default_port
+    return host.strip("[]"), int(port)
+
+
+def tcp_probe(target: Tuple[str, int], payload: bytes, timeout: float) -> Probe:
+    t0 = time.perf_counter()
+    try:
+        s = socket.create_connection(target, timeout=timeout)
+    except OSError as e:
+        return Probe("tcp", False, None, None, e.__class__.__name__)
+    connect = time.perf_counter() - t0
+    try:
+        s.settimeout(max(0.001, timeout - connect))
+        s.sendall(payload)
+        if not s.recv(1):
+            return Probe("tcp", False, connect, None, "closed")
+        return Probe("tcp", True, connect, time.perf_counter() - t0, None)
+    except OSError as e:
+        return Probe("tcp", False, connect, None, e.__class__.__name__)
+    finally:
+        s.close()
+
+
+def udp_probe(target: Tuple[str, int], payload: bytes, timeout: float) -> Probe:
+    t0 = time.perf_counter()
+    try:
+        info = socket.getaddrinfo(target[0], target[1], type=socket.SOCK_DGRAM)[0]
+        with socket.socket(info[0], socket.SOCK_DGRAM) as s:
+            s.settimeout(timeout)
+            s.connect(info[4])
+            s.send(payload)
+            s.recv(65535)
+        return Probe("udp", True, None, time.perf_counter() - t0, None)
+    except OSError as e:
+        return Probe("udp", False, None, None, e.__class__.__name__)
+
+
+# --- local target ----------------------------------------------------------
+
+class EchoServer:
+    """TCP and UDP echo on one port of the loopback interface, one thread per TCP client."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.tcp.bind((host, port))
+        self.tcp.listen(128)
+        self.address = self.tcp.getsockname()
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.bind(self.address)
+        self._stop = threading.Event()
+        for fn, name in ((self._accept, "echo_tcp"), (self._datagrams, "echo_udp")):
+            threading.Thread(target=fn, name=name, daemon=True).start()
+
+    def _accept(self) -> None:
+        while not self._stop.is_set():
+            try:
+                conn, _ = self.tcp.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._echo, args=(conn,), name="echo_conn", daemon=True).start()
+
+    @staticmethod
+    def _echo(conn: socket.socket) -> None:
+        with conn:
+            try:
+                while True:
+                    data = conn.recv(65536)
+                    if not data:
+                        return
+                    conn.sendall(data)
+            except OSError:
+                return
+
+    def _datagrams(self) -> None:
+        while not self._stop.is_set():
+            try:
+                data, peer = self.udp.recvfrom(65535)
+                self.udp.sendto(data, peer)
+            except OSError:
+                return
+
+    def close(self) -> None:
+        self._stop.set()
+        self.tcp.close()
+        self.udp.close()
+
+
+# --- profiles --------------------------------------------------------------
+
+def default_profiles() -> List[str]:
+    return [str(p) for p in sorted(PROFILES.glob("*.json"))]
+
+
+def compile_profile(name: str, cache: LaunchCache) -> dict:
+    """Cached launch entry for a launch profile name/path or a .bat file."""
+    if name.lower().endswith(".bat") and (PROFILES / f"{Path(name).stem}.json").exists():
+        # the repo's .bat profiles are thin wrappers around their launch JSON
+        path = PROFILES / f"{Path(name).stem}.json"
+    elif name.lower().endswith(".bat"):
+        prof = profile_from_bat(Path(name))
+        # imported definitions live next to the cache so LaunchCache can stamp them
+        path = cache.dir / "trial-profiles" / f"{prof['name']}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        text = json.dumps(prof, indent=2) + "\n"
+        if not path.exists() or path.read_text(encoding="utf-8") != text:
+            path.write_text(text, encoding="utf-8")
+    else:
+        path = resolve_profile(name)
+    return cache.lookup(path)[0]
+
+
+def start_winws(entry: dict) -> subprocess.Popen:
+    if not Path(entry["argv"][0]).exists():
+        raise OSError("winws.exe not found in bin/")
+    return subprocess.Popen(entry["argv"], cwd=str(BIN), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop_winws(proc: Optional[subprocess.Popen]) -> None:
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(5)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+# --- scoring ---------------------------------------------------------------
+
+def is_loser(ok: int, done: int, total: int, min_success: float, best: Optional[float], margin: float = 0.0) -> bool:
+    """True once no outcome of the remaining probes can reach min_success, or come within margin of best."""
+    reachable = (ok + total - done) / total
+    return reachable < min_success or (best is not None and reachable < best - margin)
+
+
+def quantile_ms(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    vals = sorted(values)
+    return round(vals[min(len(vals) - 1, int(len(vals) * q))] * 1000.0, 2)
+
+
+def summarize(probes: List[Probe], total: int) -> dict:
+    out: dict = {"planned": total, "done": len(probes), "ok": sum(p.ok for p in probes)}
+    out["success"] = round(out["ok"] / total, 4) if total else 0.0
+    for proto in ("tcp", "udp"):
+        ps = [p for p in probes if p.proto == proto]
+        if not ps:
+            continue
+        ok = [p for p in ps if p.ok]
+        errors: Dict[str, int] = {}
+        for p in ps:
+            if p.error:
+                errors[p.error] = errors.get(p.error, 0) + 1
+        out[proto] = {
+            "done": len(ps), "ok": len(ok),
+            "connect_ms_p50": quantile_ms([p.connect for p in ps if p.connect is not None], 0.5),
+            "first_ms_p50": quantile_ms([p.first for p in ok], 0.5),
+            "first_ms_p90": quantile_ms([p.first for p in ok], 0.9),
+            "errors": errors,
+        }
+    return out
+
+
+def run_probes(plan: List[tuple], concurrency: int, min_success: float, best: Optional[float],
+               margin: float = 0.0) -> Tuple[List[Probe], bool]:
+    """Run (fn, target, payload, timeout) probes; returns (results, stopped_early).
+
+    At most `concurrency` probes are submitted at a time, so a loser is
+    detected before the rest of the plan is even queued.
+    """
+    total = len(plan)
+    results: List[Probe] = []
+    todo = iter(plan)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        pending = {pool.submit(*p) for _, p in zip(range(max(1, concurrency)), todo)}
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            results.extend(f.result() for f in finished)
+            if len(results) < total and is_loser(sum(r.ok for r in results), len(results), total, min_success, best, margin):
+                # probes already on the wire finish; their outcome no longer matters
+                return results, True
+            for _, p in zip(range(len(finished)), todo):
+                pending.add(pool.submit(*p))
+    return results, False
+
+
+def trial(name: str, args, cache: LaunchCache, best: Optional[float]) -> dict:
+    result: dict = {"profile": name}
+    try:
+        entry = compile_profile(name, cache)
+    except (ProfileError, OSError) as e:
+        result["error"] = str(e)
+        return result
+    result["name"] = entry["name"]
+    proc = None
+    try:
+        if args.launch == "winws":
+            proc = start_winws(entry)
+        time.sleep(args.settle)
+        if proc is not None and proc.poll() is not None:
+            result["error"] = f"winws exited with code {proc.returncode}"
+            return result
+        plan: List[tuple] = []
+        for i in range(args.probes):
+            if args.tcp_target:
+                plan.append((tcp_probe, args.tcp_target, args.tcp_payload, args.timeout))
+            if args.udp_target:
+                plan.append((udp_probe, args.udp_target, args.udp_payload, args.timeout))
+        t0 = time.perf_counter()
+        probes, early = run_probes(plan, args.concurrency, args.min_success, best, args.margin)
+        result.update(summarize(probes, len(plan)))
+        result["stopped_early"] = early
+        result["seconds"] = round(time.perf_counter() - t0, 3)
+    except OSError as e:
+        result["error"] = str(e)
+    finally:
+        stop_winws(proc)
+    return result
+
+
+def rank_key(r: dict) -> tuple:
+    tcp = r.get("tcp") or {}
+    udp = r.get("udp") or {}
+    lat = tcp.get("first_ms_p50") or udp.get("first_ms_p50") or float("inf")
+    return (-r.get("success", -1.0), lat)
+
+
+def print_table(results: List[dict]) -> None:
+    print(f"{'success':>7} {'tcp ok':>7} {'conn p50':>9} {'tcp 1st':>8} {'udp ok':>7} {'udp 1st':>8}  profile")
+    for r in sorted(results, key=rank_key):
+        if "error" in r:
+            print(f"{'-':>7} {'':>7} {'':>9} {'':>8} {'':>7} {'':>8}  {r['error']}")
+            continue
+        tcp, udp = r.get("tcp") or {}, r.get("udp") or {}
+
+        def ms(v):
+            return "-" if v is None else f"{v:.1f}"
+
+        print(f"{r['success']:>7.0%} {tcp.get('ok', '-'):>7} {ms(tcp.get('connect_ms_p50')):>9} "
+              f"{ms(tcp.get('first_ms_p50')):>8} {udp.get('ok', '-'):>7} {ms(udp.get('first_ms_p50')):>8}  "
+              f"{Path(r['profile']).name}{' (stopped early)' if r.get('stopped_early') else ''}")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Launch winws profiles one by one and rank them with TCP/UDP probes.")
+    ap.add_argument("profiles", nargs="*", help="Launch profile names/paths or .bat files (default: all "
+                                                "profiles in Debug/launch)")
+    ap.add_argument("--target", help="TCP probe target host[:port] (default port 443)")
+    ap.add_argument("--udp-target", help="UDP probe target host[:port]")
+    ap.add_argument("--echo", action="store_true", help="Probe a local TCP/UDP echo server instead")
+    ap.add_argument("--launch", choices=("winws", "stub"), default="winws" if sys.platform == "win32" else "stub",
+                    help="Start winws for each profile, or only compile it (default: winws on Windows)")
+    ap.add_argument("--settle", type=float, default=None, help="Seconds between launch and the first probe "
+                                                               "(default: 2 with winws, 0 with stub)")
+    ap.add_argument("--probes", type=int, default=20, help="Probes per protocol and profile (default: 20)")
+    ap.add_argument("--concurrency", type=int, default=8, help="Probes in flight at once (default: 8)")
+    ap.add_argument("--timeout", type=float, default=3.0, help="Per-probe timeout in seconds (default: 3)")
+    ap.add_argument("--min-success", type=float, default=0.5,
+                    help="Drop a profile once it can't reach this success rate (default: 0.5)")
+    ap.add_argument("--margin", type=float, default=0.1,
+                    help="Drop a profile once it can't get within this of the best success rate (default: 0.1)")
+    ap.add_argument("--payload", type=str, default=None, help="File sent by TCP probes (default: a short HTTP request)")
+    ap.add_argument("--udp-payload", type=str, default=None,
+                    help="File sent by UDP probes (default: bin/quic_initial_www_google_com.bin if present)")
+    ap.add_argument("--cache-dir", type=str, default=None, help=f"Launch cache (default: {default_cache_dir()})")
+    ap.add_argument("--out", type=str, default=None, help="Write results as JSON")
+    args = ap.parse_args(argv)
+
+    echo = None
+    if args.echo:
+        echo = EchoServer()
+        args.tcp_target = args.udp_target = echo.address
+    else:
+        if not args.target and not args.udp_target:
+            print("error: give --target and/or --udp-target, or --echo", file=sys.stderr)
+            return 2
+        args.tcp_target = parse_target(args.target) if args.target else None
+        args.udp_target = parse_target(args.udp_target) if args.udp_target else None
+    if args.settle is None:
+        args.settle = 2.0 if args.launch == "winws" else 0.0
+    host = args.tcp_target[0] if args.tcp_target else args.udp_target[0]
+    args.tcp_payload = (Path(args.payload).read_bytes() if args.payload else
+                        f"HEAD / HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("ascii"))
+    quic = BIN / "quic_initial_www_google_com.bin"
+    if args.udp_payload:
+        args.udp_payload = Path(args.udp_payload).read_bytes()
+    else:
+        args.udp_payload = quic.read_bytes() if quic.exists() else b"\x00" * 32
+
+    cache = LaunchCache(Path(args.cache_dir) if args.cache_dir else default_cache_dir())
+    results: List[dict] = []
+    best: Optional[float] = None
+    try:
+        for name in args.profiles or default_profiles():
+            r = trial(name, args, cache, best)
+            results.append(r)
+            if "error" in r:
+                print(f"[skip] {r['error']}", file=sys.stderr)
+                continue
+            print(f"[{r['success']:.0%}] {Path(name).name} ({r['done']}/{r['planned']} probes, {r['seconds']}s"
+                  f"{', stopped early' if r['stopped_early'] else ''})", file=sys.stderr)
+            if not r["stopped_early"]:
+                best = r["success"] if best is None else max(best, r["success"])
+    except KeyboardInterrupt:
+        print("interrupted, ranking the profiles tried so far", file=sys.stderr)
+    finally:
+        if echo is not None:
+            echo.close()
+
+    print_table(results)
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=1) + "\n", encoding="utf-8")
+    return 0 if any("error" not in r for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
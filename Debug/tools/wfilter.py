@@ -0,0 +1,794 @@
+#!/usr/bin/env python3
+"""
+WinDivert filter compiler/optimizer for Debug/filters/*.txt and the launch profiles.
+
+WinDivert runs the --wf-raw expression for every packet, so long OR-chains of
+single-port tests cost kernel time. This module parses a filter into an AST,
+rewrites port tests into per-field interval sets (merging adjacent and
+overlapping ranges, intersecting under AND), folds protocol tests that are
+implied or repeated (`tcp and tcp.DstPort == 443`, `(udp and A) or (udp and B)`)
+and prints a minimal equivalent filter in the same layout as the hand-written
+files.
+
+Every result is checked against the original by an evaluator that enumerates
+direction x protocol x IP version x every port equivalence class (all port
+values between two consecutive constants behave identically, so this covers
+all 65536 values of every port field); --brute additionally sweeps every port
+value one field at a time. Tests on fields the optimizer doesn't model
+(addresses, flags, lengths, ...) are kept as opaque atoms and enumerated as
+free booleans.
+
+Semantics follow WinDivert: `and` binds tighter than `or`, and a test on a
+field of a missing layer (tcp.DstPort on a UDP packet) is false.
+
+Examples:
+  python wfilter.py optimize ../filters/wf-bf6-hybrid.txt
+  python wfilter.py optimize ../launch/General-BF.json --oneline --bat
+  python wfilter.py union ../filters/wf-bf6-hybrid.txt ../launch/General-BF.json
+  python wfilter.py check ../filters/wf-bf6-u-local.txt ../filters/wf-bf6-hybrid.txt
+"""
+
+import argparse
+import json
+import re
+import sys
+from dataclasses import dataclass, field
+from itertools import product
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+ROOT = Path(__file__).resolve().parents[2]
+LISTS = ROOT / "lists"
+BIN = ROOT / "bin"
+FILTERS = ROOT / "Debug" / "filters"
+
+PORT_MAX = 0xFFFF
+
+# field -> protocol layer it lives in
+PORT_FIELDS = {
+    "tcp.SrcPort": "tcp",
+    "tcp.DstPort": "tcp",
+    "udp.SrcPort": "udp",
+    "udp.DstPort": "udp",
+}
+PROTO_FLAGS = ("tcp", "udp")
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+# --- AST -------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Const:
+    value: bool
+
+
+@dataclass(frozen=True)
+class Flag:
+    name: str
+
+
+@dataclass(frozen=True)
+class Cmp:
+    field: str
+    op: str
+    value: Union[int, str]
+    pos: int = field(default=0, compare=False)
+
+
+@dataclass(frozen=True)
+class PortSet:
+    # field in PORT_FIELDS, value within `ranges` (implies the field's layer)
+    field: str
+    ranges: Tuple[Tuple[int, int, int], ...]  # (lo, hi, pos) sorted by lo, disjoint, non-adjacent
+
+    def __eq__(self, other):
+        return isinstance(other, PortSet) and self.field == other.field and \
+            [(a, b) for a, b, _ in self.ranges] == [(a, b) for a, b, _ in other.ranges]
+
+    def __hash__(self):
+        return hash((self.field, tuple((a, b) for a, b, _ in self.ranges)))
+
+
+@dataclass(frozen=True)
+class Not:
+    item: "Node"
+
+
+@dataclass(frozen=True)
+class And:
+    items: Tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    items: Tuple["Node", ...]
+
+
+Node = Union[Const, Flag, Cmp, PortSet, Not, And, Or]
+
+
+# --- parser ----------------------------------------------------------------
+
+_TOKEN = re.compile(r"\s*(?:(==|!=|<=|>=|&&|\|\||[<>=!()?:])|([A-Za-z_][\w.]*)|([0-9A-Fa-fx:.]+(?:/\d+)?))")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise FilterSyntaxError(f"unexpected character at {pos}: {text[pos:pos + 20]!r}")
+        tokens.append(m.group(m.lastindex))
+        pos = m.end()
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens: List[str], base: int = 0):
+        self.toks = tokens
+        self.i = 0
+        # leaf counter; positions keep the author's clause order through optimization
+        self.leaves = base
+
+    def peek(self) -> Optional[str]:
+        return self.toks[self.i] if self.i < len(self.toks) else None
+
+    def take(self, expect: Optional[str] = None) -> str:
+        tok = self.peek()
+        if tok is None or (expect is not None and tok.lower() != expect):
+            raise FilterSyntaxError(f"expected {expect or 'token'} at token {self.i}, got {tok!r}")
+        self.i += 1
+        return tok
+
+    def parse(self) -> Node:
+        node = self.ternary()
+        if self.peek() is not None:
+            raise FilterSyntaxError(f"trailing tokens from {self.i}: {' '.join(self.toks[self.i:self.i + 5])}")
+        return node
+
+    def ternary(self) -> Node:
+        cond = self.or_expr()
+        if self.peek() == "?":
+            self.take("?")
+            a = self.ternary()
+            self.take(":")
+            b = self.ternary()
+            return Or((And((cond, a)), And((Not(cond), b))))
+        return cond
+
+    def or_expr(self) -> Node:
+        items = [self.and_expr()]
+        while (self.peek() or "").lower() in ("or", "||"):
+            self.take()
+            items.append(self.and_expr())
+        return items[0] if len(items) == 1 else Or(tuple(items))
+
+    def and_expr(self) -> Node:
+        items = [self.unary()]
+        while (self.peek() or "").lower() in ("and", "&&"):
+            self.take()
+            items.append(self.unary())
+        return items[0] if len(items) == 1 else And(tuple(items))
+
+    def unary(self) -> Node:
+        tok = self.peek()
+        if tok is not None and tok.lower() in ("not", "!"):
+            self.take()
+            return Not(self.unary())
+        if tok == "(":
+            self.take("(")
+            node = self.ternary()
+            self.take(")")
+            return node
+        return self.atom()
+
+    def atom(self) -> Node:
+        name = self.take()
+        low = name.lower()
+        if low in ("true", "false"):
+            return Const(low == "true")
+        if not re.match(r"[A-Za-z_]", name):
+            raise FilterSyntaxError(f"expected field name, got {name!r}")
+        op = self.peek()
+        if op in ("==", "=", "!=", "<", "<=", ">", ">="):
+            self.take()
+            raw = self.take()
+            try:
+                value: Union[int, str] = int(raw, 0)
+            except ValueError:
+                value = raw
+            self.leaves += 1
+            return Cmp(name, "==" if op == "=" else op, value, pos=self.leaves)
+        self.leaves += 1
+        return Flag(name)
+
+
+def parse(text: str, base: int = 0) -> Node:
+    return _Parser(tokenize(text), base).parse()
+
+
+# --- interval sets ---------------------------------------------------------
+
+Ranges = Tuple[Tuple[int, int, int], ...]
+
+
+def _norm(ranges: Sequence[Tuple[int, int, int]]) -> Ranges:
+    out: List[List[int]] = []
+    for lo, hi, pos in sorted(ranges):
+        if lo > hi:
+            continue
+        if out and lo <= out[-1][1] + 1:
+            out[-1][1] = max(out[-1][1], hi)
+            out[-1][2] = min(out[-1][2], pos)
+        else:
+            out.append([lo, hi, pos])
+    return tuple((a, b, p) for a, b, p in out)
+
+
+def _intersect(a: Ranges, b: Ranges) -> Ranges:
+    out = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        lo = max(a[i][0], b[j][0])
+        hi = min(a[i][1], b[j][1])
+        if lo <= hi:
+            out.append((lo, hi, min(a[i][2], b[j][2])))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return _norm(out)
+
+
+def _cmp_ranges(op: str, v: int, pos: int) -> Ranges:
+    if op == "==":
+        r = [(v, v, pos)]
+    elif op == "!=":
+        r = [(0, v - 1, pos), (v + 1, PORT_MAX, pos)]
+    elif op == "<":
+        r = [(0, v - 1, pos)]
+    elif op == "<=":
+        r = [(0, v, pos)]
+    elif op == ">":
+        r = [(v + 1, PORT_MAX, pos)]
+    else:
+        r = [(v, PORT_MAX, pos)]
+    return _norm([(max(0, lo), min(PORT_MAX, hi), p) for lo, hi, p in r])
+
+
+# --- optimizer -------------------------------------------------------------
+
+def _layer(node: Node) -> Optional[str]:
+    # Protocol layer a node implies (tcp/udp), if any
+    if isinstance(node, Flag) and node.name in PROTO_FLAGS:
+        return node.name
+    if isinstance(node, PortSet):
+        return PORT_FIELDS[node.field]
+    if isinstance(node, Cmp) and node.field in PORT_FIELDS:
+        return PORT_FIELDS[node.field]
+    if isinstance(node, And):
+        for it in node.items:
+            lay = _layer(it)
+            if lay:
+                return lay
+    if isinstance(node, Or) and node.items:
+        lays = {_layer(it) for it in node.items}
+        if len(lays) == 1:
+            return lays.pop()
+    return None
+
+
+def _rebuild(cls, items: List[Node]) -> Node:
+    # Flatten, drop neutral constants, short-circuit absorbing ones, dedupe
+    neutral = cls is And
+    flat: List[Node] = []
+    for it in items:
+        if isinstance(it, cls):
+            flat.extend(it.items)
+        else:
+            flat.append(it)
+    out: List[Node] = []
+    for it in flat:
+        if isinstance(it, Const):
+            if it.value == neutral:
+                continue
+            return Const(not neutral)
+        if it not in out:
+            out.append(it)
+    if not out:
+        return Const(neutral)
+    if len(out) == 1:
+        return out[0]
+    return cls(tuple(out))
+
+
+def _merge_portsets(items: List[Node], union: bool) -> List[Node]:
+    out: List[Node] = []
+    index: Dict[str, int] = {}
+    for it in items:
+        if isinstance(it, PortSet):
+            k = index.get(it.field)
+            if k is not None:
+                prev = out[k]
+                ranges = _norm(prev.ranges + it.ranges) if union else _intersect(prev.ranges, it.ranges)
+                out[k] = PortSet(it.field, ranges)
+                continue
+            index[it.field] = len(out)
+        out.append(it)
+    return [_portset_const(it) if isinstance(it, PortSet) else it for it in out]
+
+
+def _portset_const(ps: PortSet) -> Node:
+    if not ps.ranges:
+        return Const(False)
+    if len(ps.ranges) == 1 and ps.ranges[0][:2] == (0, PORT_MAX):
+        return Flag(PORT_FIELDS[ps.field])
+    return ps
+
+
+def _simplify_and(items: List[Node]) -> Node:
+    items = _merge_portsets(items, union=False)
+    node = _rebuild(And, items)
+    if not isinstance(node, And):
+        return node
+    items = list(node.items)
+    # Conflicting protocols can never match together
+    layers = {lay for lay in (_layer(it) for it in items) if lay}
+    if len(layers) > 1:
+        return Const(False)
+    # Drop a bare protocol test already implied by a sibling
+    for name in PROTO_FLAGS:
+        if Flag(name) in items and any(_layer(it) == name for it in items if it != Flag(name)):
+            items.remove(Flag(name))
+    # `not tcp and udp` -> `udp`
+    if layers:
+        lay = next(iter(layers))
+        items = [it for it in items if not (isinstance(it, Not) and it.item in [Flag(p) for p in PROTO_FLAGS if p != lay])]
+    if Flag("outbound") in items and Flag("inbound") in items:
+        return Const(False)
+    return _rebuild(And, items)
+
+
+def _factor_or(items: List[Node]) -> List[Node]:
+    # (f and A) or (f and B) -> f and (A or B), for the most common factor f
+    while True:
+        counts: Dict[Node, int] = {}
+        for it in items:
+            if isinstance(it, And):
+                for sub in set(it.items):
+                    counts[sub] = counts.get(sub, 0) + 1
+        best = max(counts.items(), key=lambda kv: kv[1], default=(None, 0))
+        if best[1] < 2:
+            return items
+        f = best[0]
+        rest: List[Node] = []
+        first = None
+        keep: List[Node] = []
+        for it in items:
+            if isinstance(it, And) and f in it.items:
+                if first is None:
+                    first = len(keep)
+                    keep.append(f)  # placeholder
+                rest.append(_rebuild(And, [x for x in it.items if x != f]))
+            else:
+                keep.append(it)
+        keep[first] = _simplify_and([f, _simplify_or(rest)])
+        items = keep
+
+
+def _simplify_or(items: List[Node]) -> Node:
+    node = _rebuild(Or, items)
+    if not isinstance(node, Or):
+        return node
+    items = _merge_portsets(list(node.items), union=True)
+    node = _rebuild(Or, items)
+    if not isinstance(node, Or):
+        return node
+    items = list(node.items)
+    # tcp or (tcp and X) -> tcp
+    for name in PROTO_FLAGS:
+        if Flag(name) in items:
+            items = [it for it in items if it == Flag(name) or _layer(it) != name]
+    items = _factor_or(items)
+    return _rebuild(Or, _merge_portsets(items, union=True))
+
+
+def optimize(node: Node) -> Node:
+    """Return a simplified node; the result may contain PortSet nodes (see lower())."""
+    if isinstance(node, Cmp):
+        if node.field in PORT_FIELDS and isinstance(node.value, int):
+            return _portset_const(PortSet(node.field, _cmp_ranges(node.op, node.value, node.pos)))
+        return node
+    if isinstance(node, Not):
+        inner = optimize(node.item)
+        if isinstance(inner, Const):
+            return Const(not inner.value)
+        if isinstance(inner, Not):
+            return inner.item
+        return Not(inner)
+    if isinstance(node, And):
+        return _simplify_and([optimize(it) for it in node.items])
+    if isinstance(node, Or):
+        return _simplify_or([optimize(it) for it in node.items])
+    return node
+
+
+def _range_clauses(ps: PortSet) -> List[Tuple[int, Node]]:
+    out = []
+    for lo, hi, pos in ps.ranges:
+        if lo == hi:
+            out.append((pos, Cmp(ps.field, "==", lo)))
+        elif lo == 0:
+            out.append((pos, Cmp(ps.field, "<=", hi)))
+        elif hi == PORT_MAX:
+            out.append((pos, Cmp(ps.field, ">=", lo)))
+        else:
+            out.append((pos, And((Cmp(ps.field, ">=", lo), Cmp(ps.field, "<=", hi)))))
+    return out
+
+
+def _first_pos(node: Node) -> int:
+    if isinstance(node, Cmp):
+        return node.pos
+    if isinstance(node, PortSet):
+        return min(p for _, _, p in node.ranges)
+    if isinstance(node, (And, Or)):
+        return min((_first_pos(it) for it in node.items), default=0)
+    if isinstance(node, Not):
+        return _first_pos(node.item)
+    return 0
+
+
+def lower(node: Node, guard: int = 3) -> Node:
+    """Expand PortSet nodes back into plain comparisons, keeping source order.
+
+    Inside an OR, port tests of the same protocol are grouped behind one
+    `tcp and (...)` / `udp and (...)` guard once there are at least `guard`
+    of them: the redundant protocol test lets WinDivert skip the whole group
+    for packets of the other protocol.
+    """
+    if isinstance(node, PortSet):
+        clauses = [c for _, c in sorted(_range_clauses(node), key=lambda pc: pc[0])]
+        return clauses[0] if len(clauses) == 1 else Or(tuple(clauses))
+    if isinstance(node, Not):
+        return Not(lower(node.item, guard))
+    if isinstance(node, And):
+        return And(tuple(lower(it, guard) for it in node.items))
+    if isinstance(node, Or):
+        parts: List[Tuple[int, Node]] = []
+        groups: Dict[str, List[Tuple[int, Node]]] = {}
+        for it in node.items:
+            if isinstance(it, PortSet):
+                groups.setdefault(PORT_FIELDS[it.field], []).extend(_range_clauses(it))
+            else:
+                parts.append((_first_pos(it), lower(it, guard)))
+        for layer, clauses in groups.items():
+            clauses.sort(key=lambda pc: pc[0])
+            if guard and len(clauses) >= guard and len(groups) + len(parts) > 1:
+                parts.append((clauses[0][0], And((Flag(layer), Or(tuple(c for _, c in clauses))))))
+            else:
+                parts.extend(clauses)
+        parts.sort(key=lambda pc: pc[0])
+        items = tuple(c for _, c in parts)
+        return items[0] if len(items) == 1 else Or(items)
+    return node
+
+
+def compile_filter(text: str) -> Tuple[Node, Node]:
+    """Parse and optimize; returns (original AST, optimized plain AST)."""
+    orig = parse(text)
+    return orig, lower(optimize(orig))
+
+
+def count_tests(node: Node) -> int:
+    if isinstance(node, (Flag, Cmp)):
+        return 1
+    if isinstance(node, PortSet):
+        return sum(1 if lo == hi else 2 for lo, hi, _ in node.ranges)
+    if isinstance(node, Not):
+        return count_tests(node.item)
+    if isinstance(node, (And, Or)):
+        return sum(count_tests(it) for it in node.items)
+    return 0
+
+
+# --- printer ---------------------------------------------------------------
+
+def _fmt(node: Node, depth: int, multiline: bool, top: bool = False) -> str:
+    pad = "  "
+    if isinstance(node, Const):
+        return "true" if node.value else "false"
+    if isinstance(node, Flag):
+        return node.name
+    if isinstance(node, Cmp):
+        return f"{node.field} {node.op} {node.value}"
+    if isinstance(node, PortSet):
+        return _fmt(lower(node), depth, multiline, top)
+    if isinstance(node, Not):
+        inner = _fmt(node.item, depth, multiline)
+        if isinstance(node.item, (Flag, Const, Not)) or inner.startswith("("):
+            return f"not {inner}"
+        return f"not ({inner})"
+    if isinstance(node, And):
+        parts = []
+        for it in node.items:
+            s = _fmt(it, depth, multiline)
+            if isinstance(it, Or) and not s.startswith("("):
+                s = f"({s})"
+            parts.append(s)
+        s = " and ".join(parts)
+        return s if top else f"({s})"
+    if isinstance(node, Or):
+        parts = [_fmt(it, depth + 1, multiline) for it in node.items]
+        if multiline and (len(parts) > 2 or any("\n" in p for p in parts)):
+            inner = " or\n".join(pad * (depth + 1) + p for p in parts)
+            s = "(\n" + inner + "\n" + pad * depth + ")"
+            return s[1:-1].strip("\n") if top and depth == 0 else s
+        s = " or ".join(parts)
+        return s if top else f"({s})"
+    raise TypeError(node)
+
+
+def format_filter(node: Node, multiline: bool = True, bat: bool = False) -> str:
+    s = _fmt(node, 0, multiline, top=True)
+    if multiline and "\n" in s and isinstance(node, Or):
+        s = "\n".join(line[2:] if line.startswith("  ") else line for line in s.splitlines())
+    if bat:
+        s = s.replace(">", "^>").replace("<", "^<")
+    return s
+
+
+# --- evaluator / equivalence ----------------------------------------------
+
+_PROTOS = ("tcp", "udp", "icmp")
+
+
+class _Compiler:
+    def __init__(self):
+        self.opaque: Dict[str, int] = {}
+
+    def expr(self, node: Node) -> str:
+        if isinstance(node, Const):
+            return "True" if node.value else "False"
+        if isinstance(node, Flag):
+            n = node.name
+            if n == "outbound":
+                return "o"
+            if n == "inbound":
+                return "(not o)"
+            if n in ("tcp", "udp"):
+                return f"(pr == {_PROTOS.index(n)})"
+            if n == "icmp":
+                return "(pr == 2 and not v6)"
+            if n == "icmpv6":
+                return "(pr == 2 and v6)"
+            if n == "ip":
+                return "(not v6)"
+            if n == "ipv6":
+                return "v6"
+            return self._opaque(n)
+        if isinstance(node, Cmp):
+            if node.field in PORT_FIELDS and isinstance(node.value, int):
+                var = _PORT_VARS[node.field]
+                proto = _PROTOS.index(PORT_FIELDS[node.field])
+                return f"(pr == {proto} and {var} {node.op} {node.value})"
+            return self._opaque(f"{node.field} {node.op} {node.value}")
+        if isinstance(node, PortSet):
+            return self.expr(lower(node))
+        if isinstance(node, Not):
+            return f"(not {self.expr(node.item)})"
+        if isinstance(node, And):
+            return "(" + " and ".join(self.expr(it) for it in node.items) + ")"
+        if isinstance(node, Or):
+            return "(" + " or ".join(self.expr(it) for it in node.items) + ")"
+        raise TypeError(node)
+
+    def _opaque(self, key: str) -> str:
+        idx = self.opaque.setdefault(key, len(self.opaque))
+        return f"x[{idx}]"
+
+    def function(self, node: Node):
+        src = "lambda o, pr, v6, ts, td, us, ud, x: " + self.expr(node)
+        return eval(src, {})
+
+
+_PORT_VARS = {"tcp.SrcPort": "ts", "tcp.DstPort": "td", "udp.SrcPort": "us", "udp.DstPort": "ud"}
+
+
+def _constants(node: Node, acc: Dict[str, set]) -> None:
+    if isinstance(node, Cmp) and node.field in PORT_FIELDS and isinstance(node.value, int):
+        acc.setdefault(node.field, set()).add(node.value)
+    elif isinstance(node, PortSet):
+        for lo, hi, _ in node.ranges:
+            acc.setdefault(node.field, set()).update((lo, hi))
+    elif isinstance(node, Not):
+        _constants(node.item, acc)
+    elif isinstance(node, (And, Or)):
+        for it in node.items:
+            _constants(it, acc)
+
+
+def port_classes(values: set) -> List[int]:
+    """One representative per equivalence class of 0..65535 w.r.t. the constants."""
+    cuts = {0, PORT_MAX + 1}
+    for v in values:
+        for c in (v, v + 1):
+            if 0 <= c <= PORT_MAX + 1:
+                cuts.add(c)
+    return sorted(cuts)[:-1]
+
+
+def equivalent(a: Node, b: Node, brute: bool = False) -> Tuple[bool, int, Optional[dict]]:
+    """Exhaustively compare two filters; returns (same, points checked, counterexample)."""
+    comp = _Compiler()
+    fa = comp.function(a)
+    fb = comp.function(b)
+    if len(comp.opaque) > 12:
+        raise ValueError("too many opaque atoms to enumerate")
+    consts: Dict[str, set] = {}
+    _constants(a, consts)
+    _constants(b, consts)
+    reps = {f: port_classes(consts.get(f, set())) for f in PORT_FIELDS}
+    xs = list(product((False, True), repeat=len(comp.opaque)))
+    checked = 0
+
+    def sweep(pr: int, src: Sequence[int], dst: Sequence[int]):
+        nonlocal checked
+        for o, v6, x in product((True, False), (False, True), xs):
+            for s in src:
+                for d in dst:
+                    if pr == 0:
+                        args = (o, pr, v6, s, d, 0, 0, x)
+                    else:
+                        args = (o, pr, v6, 0, 0, s, d, x)
+                    checked += 1
+                    if fa(*args) != fb(*args):
+                        return {"outbound": o, "proto": _PROTOS[pr], "ipv6": v6, "src": s, "dst": d,
+                                "opaque": dict(zip(comp.opaque, x))}
+        return None
+
+    plans = [(0, reps["tcp.SrcPort"], reps["tcp.DstPort"]),
+             (1, reps["udp.SrcPort"], reps["udp.DstPort"]),
+             (2, [0], [0])]
+    if brute:
+        full = range(PORT_MAX + 1)
+        plans += [(0, full, reps["tcp.DstPort"]), (0, reps["tcp.SrcPort"], full),
+                  (1, full, reps["udp.DstPort"]), (1, reps["udp.SrcPort"], full)]
+    for pr, src, dst in plans:
+        bad = sweep(pr, src, dst)
+        if bad:
+            return False, checked, bad
+    return True, checked, None
+
+
+# --- sources ---------------------------------------------------------------
+
+def read_port_range() -> Tuple[int, int]:
+    # Same fallback as launcher.py and run_handshake.py
+    try:
+        s = (LISTS / "port-bf.txt").read_text(encoding="utf-8").strip().splitlines()[0].strip()
+    except Exception:
+        s = ""
+    if not s:
+        s = "65530-65535"
+    if "-" in s:
+        a, b = s.split("-", 1)
+        return int(a), int(b)
+    return int(s), int(s)
+
+
+def filter_from_bat(path: Path) -> str:
+    """Extract the --wf-raw filter text a .bat profile hands to winws."""
+    text = path.read_text(encoding="utf-8", errors="replace")
+    m = re.search(r'--wf-raw=@"([^"]+)"', text)
+    if not m:
+        raise FilterSyntaxError(f"{path}: no --wf-raw=@file argument")
+    ref = m.group(1)
+    if "%WF_TMP%" in ref:
+        em = re.search(r'^\s*echo\s+(.*?)\s*>\s*"%WF_TMP%"\s*$', text, re.M)
+        if not em:
+            raise FilterSyntaxError(f"{path}: filter is written to %WF_TMP% but no echo line found")
+        expr = re.sub(r"\^(.)", r"\1", em.group(1))
+        start, end = read_port_range()
+        for var, val in (("START_PORT", start), ("END_PORT", end)):
+            expr = expr.replace(f"!{var}!", str(val)).replace(f"%{var}%", str(val))
+        return expr
+    ref = ref.replace("%~dp0", str(path.parent) + "\\").replace("%BIN%", str(BIN) + "\\")
+    target = Path(ref.replace("\\", "/"))
+    if not target.exists() and (FILTERS / target.name).exists():
+        # Some profiles point at bin\ while the filter files live in Debug/filters
+        target = FILTERS / target.name
+    return target.read_text(encoding="utf-8")
+
+
+def filter_from_profile(path: Path) -> str:
+    """The --wf-raw filter text of a Debug/launch JSON profile, ports filled in."""
+    try:
+        prof = json.loads(path.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as e:
+        raise FilterSyntaxError(f"{path}: {e}")
+    if "filter_file" in prof:
+        return (ROOT / prof["filter_file"]).read_text(encoding="utf-8")
+    if "filter" not in prof:
+        raise FilterSyntaxError(f"{path}: no 'filter' or 'filter_file'")
+    start, end = read_port_range()
+    return prof["filter"].replace("{START_PORT}", str(start)).replace("{END_PORT}", str(end))
+
+
+def load_source(src: str) -> str:
+    if src == "-":
+        return sys.stdin.read()
+    p = Path(src)
+    if p.suffix.lower() == ".json":
+        return filter_from_profile(p)
+    if p.suffix.lower() in (".bat", ".cmd"):
+        return filter_from_bat(p)
+    if p.exists():
+        return p.read_text(encoding="utf-8")
+    return src  # literal expression
+
+
+# --- CLI -------------------------------------------------------------------
+
+def _report(orig: Node, opt: Node, brute: bool) -> bool:
+    ok, n, bad = equivalent(orig, opt, brute=brute)
+    print(f"# tests: {count_tests(orig)} -> {count_tests(opt)}; "
+          f"{'equivalent' if ok else 'NOT EQUIVALENT'} over {n} enumerated points", file=sys.stderr)
+    if bad:
+        print(f"# counterexample: {bad}", file=sys.stderr)
+    return ok
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Parse, minimize and verify WinDivert filters.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    for name, hlp in (("optimize", "minimize one filter"), ("union", "minimal filter matching any of the inputs")):
+        p = sub.add_parser(name, help=hlp)
+        p.add_argument("sources", nargs="+" if name == "union" else 1,
+                       help="filter file, launch profile .json, literal expression or -")
+        p.add_argument("--oneline", action="store_true", help="Print on one line")
+        p.add_argument("--bat", action="store_true", help="Escape < and > with ^ for echo in a .bat")
+        p.add_argument("--brute", action="store_true", help="Also verify every port value one field at a time")
+        p.add_argument("--write", type=str, default=None, help="Write the result to this file")
+    p = sub.add_parser("check", help="prove two filters equivalent (or show a counterexample)")
+    p.add_argument("a")
+    p.add_argument("b")
+    p.add_argument("--brute", action="store_true")
+    args = ap.parse_args(argv)
+
+    try:
+        if args.cmd == "check":
+            a, b = parse(load_source(args.a)), parse(load_source(args.b))
+            ok, n, bad = equivalent(a, b, brute=args.brute)
+            print(f"{'equivalent' if ok else 'different'} ({n} points checked)")
+            if bad:
+                print(f"counterexample: {bad}")
+            return 0 if ok else 1
+
+        trees = [parse(load_source(s), base=i * 1_000_000) for i, s in enumerate(args.sources)]
+        orig = trees[0] if len(trees) == 1 else Or(tuple(trees))
+    except (FilterSyntaxError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+
+    opt = lower(optimize(orig))
+    text = format_filter(opt, multiline=not args.oneline, bat=args.bat)
+    ok = _report(orig, opt, args.brute)
+    if not ok:
+        return 1
+    if args.write:
+        Path(args.write).write_text(text + "\n", encoding="ascii")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
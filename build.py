@@ -10,26 +10,74 @@ Creates ZIP, RAR, and 7Z archives from the repository root while excluding:
 
 Outputs archives into ./ReleaseBuild with a user-provided bundle name.
 
+Usage:
+  python build.py                      # asks for the bundle name
+  python build.py --name zapret-bf-1.2 --formats zip,7z --jobs 3
+  python build.py --name zapret-bf-1.3 --delta-from zapret-bf-1.2
+  python build.py --apply-delta zapret-bf-1.3.delta-from-zapret-bf-1.2.zip --target C:\\zapret-bf
+
+Inputs are scanned once: every file is read a single time to record its size
+and SHA-256 and to sample whether it compresses at all. The result is kept in
+ReleaseBuild/<name>.manifest.json; when a rebuild finds the same input hashes
+and the archives from the last build still in place, nothing is rebuilt.
+Unchanged files (same size and mtime as in the last manifest) are not even
+re-read. The formats are then built concurrently in a process pool, each into
+a temporary file that replaces the old archive only on success.
+
+Every release keeps its manifest, so --delta-from can later emit a small zip
+with only the files that changed since an earlier release plus delta.json
+(expected hashes before/after and the files to remove). --apply-delta checks
+every file of an existing install against those hashes first, then extracts,
+verifies and swaps files in; nothing is touched if the install doesn't match.
+
 Notes:
-- ZIP is created with Python's standard library.
+- ZIP is created with Python's standard library. Files that don't compress
+  (fake payloads, already-compressed data) are stored instead of deflated.
 - 7Z is created with py7zr if available, otherwise attempts to use 7z.exe CLI.
-- RAR creation is attempted via patoolib if available, otherwise tries rar.exe/WinRAR.exe CLI.
+- RAR creation is attempted via patoolib if available, otherwise tries rar.exe/WinRAR.exe CLI
+  (which are told to store the incompressible file types with -ms).
 - Excluded items are skipped without deleting anything from the workspace.
 """
 
 from __future__ import annotations
 
+import argparse
+import hashlib
+import json
+import mmap
 import os
 import sys
 import shutil
+import time
 import zipfile
+import zlib
 import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable, List
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 
 EXCLUDED_DIRS = {".github", "debug", "releasebuild"}
 EXCLUDED_FILES = {".gitignore", "readme.md", "build.py"}
+# Parts of Debug/ the release needs: the .bat profiles launch through launcher.py
+BUNDLED_DEBUG = ("Debug/tools/launcher.py", "Debug/tools/wfilter.py", "Debug/launch", "Debug/filters")
+FORMATS = ("zip", "7z", "rar")
+
+# A file is stored uncompressed when deflating its first block saves less than this
+STORE_RATIO = 0.95
+SAMPLE_BYTES = 256 * 1024
+# Smaller files are never stored: zlib's overhead makes tiny text look incompressible
+STORE_MIN_BYTES = 4 * 1024
+MANIFEST_VERSION = 2
+
+
+class FileEntry(NamedTuple):
+    path: Path
+    arcname: str
+    size: int
+    mtime_ns: int
+    sha256: str
+    store: bool
 
 
 def ask_bundle_name() -> str:
@@ -60,22 +108,133 @@ def collect_files(root: Path) -> List[Path]:
             # do not include directories (safety)
             if p.is_file():
                 files.append(p)
+    for rel in BUNDLED_DEBUG:
+        p = root / rel
+        if p.is_dir():
+            files.extend(sorted(f for f in p.rglob("*") if f.is_file()))
+        elif p.is_file():
+            files.append(p)
     return files
 
 
+def _scan_file(p: Path) -> Tuple[str, bool]:
+    """SHA-256 and "store, don't compress" verdict from one read of the file.
+
+    The file is memory-mapped, so hashing doesn't copy it through Python
+    buffers; hashlib and zlib release the GIL on large inputs, which lets
+    scan_files() hash several big binaries at once on worker threads.
+    """
+    with open(p, "rb") as f:
+        try:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return hashlib.sha256().hexdigest(), False
+        with view:
+            sha = hashlib.sha256(view).hexdigest()
+            sample = view[:SAMPLE_BYTES]
+    if len(sample) < STORE_MIN_BYTES:
+        return sha, False
+    store = len(zlib.compress(sample, 1)) >= len(sample) * STORE_RATIO
+    return sha, store
+
+
+def scan_files(files: Iterable[Path], root: Path, previous: Optional[dict] = None,
+               workers: int = 0) -> List[FileEntry]:
+    """Size, mtime and hash of every input; hashes from `previous` are reused for untouched files."""
+    known = (previous or {}).get("files", {})
+    stats = []
+    todo: List[Path] = []
+    for p in files:
+        st = p.stat()
+        arc = p.relative_to(root).as_posix()
+        old = known.get(arc)
+        fresh = not (old and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns)
+        stats.append((p, arc, st, old))
+        if fresh:
+            todo.append(p)
+    # Largest first so one big binary doesn't end up alone at the tail
+    todo.sort(key=lambda p: p.stat().st_size, reverse=True)
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+        scanned = dict(zip(todo, pool.map(_scan_file, todo)))
+    out: List[FileEntry] = []
+    for p, arc, st, old in stats:
+        sha, store = scanned[p] if p in scanned else (old["sha256"], old["store"])
+        out.append(FileEntry(p, arc, st.st_size, st.st_mtime_ns, sha, store))
+    out.sort(key=lambda e: e.arcname)
+    return out
+
+
+def inputs_digest(entries: Iterable[FileEntry]) -> str:
+    h = hashlib.sha256()
+    for e in entries:
+        h.update(f"{e.arcname}\0{e.sha256}\0{int(e.store)}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+def manifest_path(out_dir: Path, name: str) -> Path:
+    return out_dir / f"{name}.manifest.json"
+
+
+def load_manifest(path: Path) -> Optional[dict]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return data if data.get("version") == MANIFEST_VERSION else None
+
+
+def latest_manifest(out_dir: Path) -> Optional[dict]:
+    paths = sorted(out_dir.glob("*.manifest.json"), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+    for p in paths:
+        data = load_manifest(p)
+        if data:
+            return data
+    return None
+
+
+def write_manifest(path: Path, name: str, entries: List[FileEntry], archives: Dict[str, dict]) -> None:
+    data = {
+        "version": MANIFEST_VERSION,
+        "name": name,
+        "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "digest": inputs_digest(entries),
+        "files": {e.arcname: {"size": e.size, "mtime_ns": e.mtime_ns, "sha256": e.sha256, "store": e.store}
+                  for e in entries},
+        "archives": archives,
+    }
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, indent=1, ensure_ascii=False) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def up_to_date(manifest: Optional[dict], digest: str, fmt: str, out_path: Path) -> bool:
+    if not manifest or manifest.get("digest") != digest:
+        return False
+    rec = manifest.get("archives", {}).get(fmt)
+    if not rec:
+        return False
+    try:
+        st = out_path.stat()
+    except OSError:
+        return False
+    return st.st_size == rec["size"] and st.st_mtime_ns == rec["mtime_ns"]
+
+
 def ensure_release_dir(root: Path) -> Path:
     out = root / "ReleaseBuild"
     out.mkdir(parents=True, exist_ok=True)
     return out
 
 
-def build_zip(files: Iterable[Path], root: Path, out_path: Path) -> None:
+def build_zip(files: Iterable[Path], root: Path, out_path: Path, store: Iterable[Path] = ()) -> None:
+    stored = set(store)
     with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
         for p in files:
-            zf.write(p, arcname=p.relative_to(root))
+            zf.write(p, arcname=p.relative_to(root),
+                     compress_type=zipfile.ZIP_STORED if p in stored else zipfile.ZIP_DEFLATED)
 
 
-def build_7z(files: List[Path], root: Path, out_path: Path) -> None:
+def build_7z(files: List[Path], root: Path, out_path: Path, store: Iterable[Path] = ()) -> None:
     try:
         import py7zr  # type: ignore
 
@@ -104,7 +263,20 @@ def build_7z(files: List[Path], root: Path, out_path: Path) -> None:
             pass
 
 
-def build_rar(files: List[Path], root: Path, out_path: Path) -> None:
+def _store_types(files: Iterable[Path], store: Iterable[Path]) -> List[str]:
+    # rar -ms takes file types, not names: only use it for extensions where every file is incompressible
+    stored = set(store)
+    verdict: Dict[str, bool] = {}
+    for p in files:
+        if p.suffix:
+            ext = p.suffix.lstrip(".").lower()
+            verdict[ext] = verdict.get(ext, True) and p in stored
+    return sorted(ext for ext, all_stored in verdict.items() if all_stored)
+
+
+def build_rar(files: List[Path], root: Path, out_path: Path, store: Iterable[Path] = ()) -> None:
+    types = _store_types(files, store)
+    ms = [f"-ms{';'.join(types)}"] if types else []
     # Try patool first
     try:
         import patoolib  # type: ignore
@@ -124,7 +296,7 @@ def build_rar(files: List[Path], root: Path, out_path: Path) -> None:
             for p in files:
                 lf.write(str(p) + "\n")
         try:
-            subprocess.run([rar, "a", "-r", "-ep1", str(out_path), f"@{listfile}"], check=True)
+            subprocess.run([rar, "a", "-r", "-ep1", *ms, str(out_path), f"@{listfile}"], check=True)
         finally:
             try:
                 listfile.unlink()
@@ -136,7 +308,7 @@ def build_rar(files: List[Path], root: Path, out_path: Path) -> None:
             for p in files:
                 lf.write(f"\"{p}\"\n")
         try:
-            subprocess.run([winrar, "a", "-r", "-ep1", str(out_path), f"@{listfile}"], check=True)
+            subprocess.run([winrar, "a", "-r", "-ep1", *ms, str(out_path), f"@{listfile}"], check=True)
         finally:
             try:
                 listfile.unlink()
@@ -147,30 +319,252 @@ def build_rar(files: List[Path], root: Path, out_path: Path) -> None:
     print("[WARN] RAR tools not found and patool unavailable; skipping RAR build", file=sys.stderr)
 
 
-def main() -> int:
+BUILDERS = {"zip": build_zip, "7z": build_7z, "rar": build_rar}
+
+
+def build_one(fmt: str, files: List[Path], root: Path, out_path: Path, store: List[Path]) -> Optional[dict]:
+    """Build one archive into a temp file and move it into place. Runs in a worker process."""
+    tmp = out_path.with_name(f"{out_path.stem}.partial{out_path.suffix}")
+    if tmp.exists():
+        tmp.unlink()
+    t0 = time.perf_counter()
+    BUILDERS[fmt](files, root, tmp, store)
+    if not tmp.exists():
+        return None  # tool not available, the builder already warned
+    os.replace(tmp, out_path)
+    st = out_path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "seconds": round(time.perf_counter() - t0, 3)}
+
+
+# --- delta bundles -----------------------------------------------------------
+
+DELTA_INDEX = "delta.json"
+
+
+def diff_manifests(old: dict, entries: List[FileEntry]) -> Tuple[List[FileEntry], List[str]]:
+    """(changed or added entries, removed arcnames) going from `old` to `entries`."""
+    old_files = old.get("files", {})
+    changed = [e for e in entries if old_files.get(e.arcname, {}).get("sha256") != e.sha256]
+    current = {e.arcname for e in entries}
+    removed = sorted(a for a in old_files if a not in current)
+    return changed, removed
+
+
+def build_delta(old: dict, name: str, entries: List[FileEntry], out_path: Path) -> Tuple[int, int]:
+    """Zip with only the changed/added files plus delta.json (hashes before/after, removals)."""
+    changed, removed = diff_manifests(old, entries)
+    old_files = old.get("files", {})
+    index = {
+        "from": old.get("name"),
+        "to": name,
+        "from_digest": old.get("digest"),
+        "to_digest": inputs_digest(entries),
+        # arcname -> [sha256 expected before (None if new), sha256 after]
+        "files": {e.arcname: [old_files.get(e.arcname, {}).get("sha256"), e.sha256] for e in changed},
+        "removed": {a: old_files[a]["sha256"] for a in removed},
+    }
+    tmp = out_path.with_name(f"{out_path.stem}.partial{out_path.suffix}")
+    with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(DELTA_INDEX, json.dumps(index, indent=1, ensure_ascii=False))
+        for e in changed:
+            zf.write(e.path, arcname=e.arcname, compress_type=zipfile.ZIP_STORED if e.store else zipfile.ZIP_DEFLATED)
+    os.replace(tmp, out_path)
+    return len(changed), len(removed)
+
+
+def _safe_target(target: Path, arcname: str) -> Path:
+    dst = (target / arcname).resolve()
+    if target.resolve() not in dst.parents:
+        raise ValueError(f"refusing path outside the install: {arcname}")
+    return dst
+
+
+def _file_sha(p: Path) -> Optional[str]:
+    try:
+        return _scan_file(p)[0]
+    except FileNotFoundError:
+        return None
+
+
+def _report_locked(e: Exception) -> None:
+    print(f"[ERROR] {e}", file=sys.stderr)
+    print("[ERROR] Stop winws/zapret before updating (running binaries are locked).", file=sys.stderr)
+
+
+def apply_delta(delta_path: Path, target: Path, dry_run: bool = False, force: bool = False) -> int:
+    """Patch an install in place. Every file is checked before anything is written."""
+    with zipfile.ZipFile(delta_path) as zf:
+        index = json.loads(zf.read(DELTA_INDEX).decode("utf-8"))
+        plan_write: List[Tuple[str, Path, str]] = []
+        plan_remove: List[Path] = []
+        problems: List[str] = []
+        unsafe = 0  # problems --force can't override
+        for arc, (before, after) in index["files"].items():
+            try:
+                dst = _safe_target(target, arc)
+            except ValueError as e:
+                problems.append(str(e))
+                unsafe += 1
+                continue
+            have = _file_sha(dst)
+            if have == after:
+                continue  # already up to date (e.g. a re-run after an interrupted apply)
+            if have != before and not force:
+                problems.append(f"{arc}: local file differs from release {index['from']}")
+            plan_write.append((arc, dst, after))
+        for arc, before in index["removed"].items():
+            try:
+                dst = _safe_target(target, arc)
+            except ValueError as e:
+                problems.append(str(e))
+                unsafe += 1
+                continue
+            have = _file_sha(dst)
+            if have is None:
+                continue
+            if have != before and not force:
+                problems.append(f"{arc}: locally modified, not removing")
+                continue
+            plan_remove.append(dst)
+        if problems:
+            for msg in problems:
+                print(f"[ERROR] {msg}", file=sys.stderr)
+            hint = " Use --force to overwrite local changes." if len(problems) > unsafe else ""
+            print(f"[ERROR] Nothing changed.{hint}", file=sys.stderr)
+            return 1
+
+        print(f"[INFO] {index['from']} -> {index['to']}: {len(plan_write)} to write, {len(plan_remove)} to remove")
+        if dry_run:
+            for arc, _, _ in plan_write:
+                print(f"  write  {arc}")
+            for dst in plan_remove:
+                print(f"  remove {dst.relative_to(target.resolve()).as_posix()}")
+            return 0
+
+        # Extract next to the destination and verify before swapping in
+        staged: List[Tuple[Path, Path]] = []
+        try:
+            for arc, dst, after in plan_write:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                tmp = dst.with_name(dst.name + ".delta-tmp")
+                with zf.open(arc) as src, open(tmp, "wb") as out:
+                    shutil.copyfileobj(src, out, 1024 * 1024)
+                staged.append((tmp, dst))
+                if _file_sha(tmp) != after:
+                    raise ValueError(f"{arc}: hash mismatch in delta archive")
+            for tmp, dst in staged:
+                os.replace(tmp, dst)
+        except (OSError, ValueError) as e:
+            for tmp, _ in staged:
+                if tmp.exists():
+                    tmp.unlink()
+            _report_locked(e)
+            return 1
+    # Written files are already in place here; a re-run after a failure only redoes the removals
+    root = target.resolve()
+    try:
+        for dst in plan_remove:
+            dst.unlink(missing_ok=True)
+            parent = dst.parent
+            while parent != root and not any(parent.iterdir()):
+                parent.rmdir()
+                parent = parent.parent
+    except OSError as e:
+        _report_locked(e)
+        return 1
+    print(f"[DONE] Updated {target} to {index['to']}")
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Build ZIP/7Z/RAR release bundles.")
+    ap.add_argument("--name", type=str, default=None, help="Bundle name (skips the interactive prompt)")
+    ap.add_argument("--formats", type=str, default=",".join(FORMATS), help="Comma-separated formats (default: zip,7z,rar)")
+    ap.add_argument("--jobs", type=int, default=0, help="Worker processes (default: one per format)")
+    ap.add_argument("--force", action="store_true", help="Rebuild even if inputs are unchanged")
+    ap.add_argument("--rehash", action="store_true", help="Re-read every input instead of trusting size/mtime")
+    ap.add_argument("--delta-from", action="append", default=[], metavar="OLD",
+                    help="Also write <name>.delta-from-<OLD>.zip against an earlier release (repeatable)")
+    ap.add_argument("--apply-delta", type=str, default=None, metavar="ZIP",
+                    help="Apply a delta archive to --target instead of building")
+    ap.add_argument("--target", type=str, default=".", help="Install directory for --apply-delta (default: .)")
+    ap.add_argument("--dry-run", action="store_true", help="With --apply-delta: only show what would change")
+    return ap.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.apply_delta:
+        return apply_delta(Path(args.apply_delta), Path(args.target), args.dry_run, args.force)
+    formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in BUILDERS]
+    if unknown:
+        print(f"[ERROR] Unknown format(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
     root = Path(__file__).resolve().parent
-    name = ask_bundle_name()
+    name = args.name.replace("/", "-").replace("\\", "-") if args.name else ask_bundle_name()
     out_dir = ensure_release_dir(root)
     files = collect_files(root)
 
     # Ensure output directory excluded from inputs
     files = [p for p in files if not str(p).lower().startswith(str(out_dir).lower())]
 
-    zip_path = out_dir / f"{name}.zip"
-    seven_path = out_dir / f"{name}.7z"
-    rar_path = out_dir / f"{name}.rar"
-
-    print(f"[INFO] Building ZIP → {zip_path}")
-    build_zip(files, root, zip_path)
-
-    print(f"[INFO] Building 7Z  → {seven_path}")
-    build_7z(files, root, seven_path)
-
-    print(f"[INFO] Building RAR → {rar_path}")
-    build_rar(files, root, rar_path)
+    t0 = time.perf_counter()
+    mpath = manifest_path(out_dir, name)
+    manifest = load_manifest(mpath)
+    entries = scan_files(files, root, None if args.rehash else (manifest or latest_manifest(out_dir)))
+    digest = inputs_digest(entries)
+    print(f"[INFO] Scanned {len(entries)} files ({sum(e.size for e in entries)} bytes) in {time.perf_counter() - t0:.2f}s")
+
+    files = [e.path for e in entries]
+    store = [e.path for e in entries if e.store]
+    # Archives of formats not requested this time stay valid while the inputs are the same
+    same = bool(manifest) and manifest.get("digest") == digest
+    archives: Dict[str, dict] = dict(manifest.get("archives", {})) if same else {}
+    todo: List[str] = []
+    for fmt in formats:
+        out_path = out_dir / f"{name}.{fmt}"
+        if not args.force and up_to_date(manifest, digest, fmt, out_path):
+            print(f"[SKIP] {out_path.name} is up to date")
+        else:
+            archives.pop(fmt, None)
+            todo.append(fmt)
+
+    rc = 0
+    if todo:
+        jobs = args.jobs or len(todo)
+        with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+            futures = {}
+            for fmt in todo:
+                out_path = out_dir / f"{name}.{fmt}"
+                print(f"[INFO] Building {fmt.upper():<3} → {out_path}")
+                futures[fmt] = pool.submit(build_one, fmt, files, root, out_path, store)
+            for fmt, fut in futures.items():
+                try:
+                    rec = fut.result()
+                except Exception as e:
+                    print(f"[ERROR] {fmt.upper()} build failed: {e}", file=sys.stderr)
+                    rc = 1
+                    continue
+                if rec is not None:
+                    archives[fmt] = rec
+                    print(f"[INFO] {fmt.upper():<3} done in {rec['seconds']}s ({rec['size']} bytes)")
+
+    write_manifest(mpath, name, entries, archives)
+
+    for old_name in args.delta_from:
+        old = load_manifest(manifest_path(out_dir, old_name))
+        if old is None:
+            print(f"[ERROR] No manifest for release '{old_name}' in {out_dir}", file=sys.stderr)
+            rc = 1
+            continue
+        out_path = out_dir / f"{name}.delta-from-{old_name}.zip"
+        n_changed, n_removed = build_delta(old, name, entries, out_path)
+        print(f"[INFO] Delta {old_name} → {name}: {n_changed} changed/added, {n_removed} removed → {out_path}")
 
     print("[DONE] Artifacts in:", out_dir)
-    return 0
+    return rc
 
 
 if __name__ == "__main__":
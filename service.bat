@@ -190,43 +190,24 @@ if not defined selectedFile (
 >>"%DEBUG_LOG%" echo Selected: !selectedFile!
 rem Selected file: !selectedFile!
 
-:: Args that should be followed by value
-set "args_with_value=sni host altorder"
-
-:: Parsing args (mergeargs: 2=start param|3=arg with value|1=params args|0=default)
+rem The .bat is a thin wrapper: take the compiled winws command line from the launcher
 set "args="
-set "capture=0"
-set "mergeargs=0"
-set QUOTE="
-
-for /f "tokens=*" %%a in ('type "!selectedFile!"') do (
-    set "line=%%a"
-    call set "line=%%line:^!=EXCL_MARK%%"
-    >>"%DEBUG_LOG%" echo LINE: !line!
-
-    echo !line! | findstr /i "%BIN%winws.exe" >nul
-    if not errorlevel 1 (
-        set "capture=1"
-    )
-
-    if !capture!==1 (
-        if not defined args (
-            set "line=!line:*%BIN%winws.exe"=!"
-        )
-        rem Normalize and collect only option lines
-        set "line=!line:^=!"
-        set "line=!line:%%BIN%%=%BIN_PATH%!"
-        set "line=!line:%%LISTS%%=%LISTS_PATH%!"
-        for /f "tokens=* delims= " %%s in ("!line!") do set "line=%%s"
-        if defined line if /i "!line:~0,2!"=="--" set "args=!args! !line!"
-    )
-)
+for %%f in ("!selectedFile!") do set "profileName=%%~nf"
+for /f "usebackq delims=" %%a in (`python "%~dp0Debug\tools\launcher.py" run "!profileName!" --dry-run`) do set "args=%%a"
+if not defined args (
+    echo Could not compile profile "!profileName!", is Python 3 installed?
+    >>"%DEBUG_LOG%" echo ERROR: launcher failed for !profileName!
+    pause
+    goto menu
+)
+rem Keep only the arguments: drop the winws.exe path and the quote or space after it
+set "args=!args:*winws.exe=!"
+set "args=!args:~1!"
 
 :: Creating service with parsed args
 call :tcp_enable
 
-set ARGS=%args%
-call set "ARGS=%%ARGS:EXCL_MARK=^!%%"
+set "ARGS=!args!"
 echo Final args: !ARGS!
 >>"%DEBUG_LOG%" echo ARGS: !ARGS!
 set SRVCNAME=zapret